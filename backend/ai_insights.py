@@ -0,0 +1,178 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from date_ranges import add_months, month_range, trailing_months
+from forecast_batch import stored_forecasts_plan
+from forecasting import HISTORY_DAYS, fill_daily, forecast_series, model_name
+from insight_store import new_insights_plan, stored_insights_plan
+
+# AI-insights computations as query plans (see query_plans.py), shared by the
+# sync endpoints in main.py and the async ones in async_endpoints.py.
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def daily_history_plan(org_id: int, today: date):
+    """
+    Daily emissions and energy for the last FORECAST_HISTORY_DAYS days through today
+    Returns (first day, {"emissions": array, "energy": array}); the last element is today
+    """
+    start = today - timedelta(days=HISTORY_DAYS)
+    end = today + timedelta(days=1)
+    rows = yield """
+        SELECT record_date, SUM(co2_total) as co2, SUM(energy_total) as energy
+        FROM DailyEmissionRollup
+        WHERE org_id = %s
+        AND record_date >= %s AND record_date < %s
+        GROUP BY record_date
+    """, (org_id, start, end)
+    return start, {
+        "emissions": fill_daily([(row['record_date'], row['co2']) for row in rows], start, end),
+        "energy": fill_daily([(row['record_date'], row['energy']) for row in rows], start, end),
+    }
+
+
+def forecasts_plan(org_id: int, today: date, start: date, series: dict, horizon: int):
+    """
+    {metric: (Forecast, fitted)} for each series, fitted through yesterday
+    Precomputed forecasts (see forecast_batch.py) are used when current;
+    otherwise the model is fitted here on demand
+    """
+    stored = yield from stored_forecasts_plan(org_id, today, start)
+    forecasts = {}
+    for metric, y in series.items():
+        forecast, fitted = stored.get(metric) or forecast_series(y[:-1], horizon)
+        forecasts[metric] = (forecast, fitted)
+    return forecasts
+
+
+def _monthly_outlook(y, forecast, month_start_index: int, split: int, horizon: int) -> dict:
+    """
+    Next month's total with its confidence interval, compared with this month's
+    actuals so far plus the forecast for the rest of it
+    Today is partial, so the forecast is fitted through yesterday and starts today
+    """
+    current = float(y[month_start_index:-1].sum()) + forecast.total(0, split)[0]
+    value, lower, upper = forecast.total(split, horizon)
+    change = round(((value - current) / current * 100) if current > 0 else 0, 2)
+    return {
+        "value": round(value, 2),
+        "lower": round(lower, 2),
+        "upper": round(upper, 2),
+        "change": change,
+        "trend": "down" if change < 0 else "up"
+    }
+
+
+def predictions_plan(org_id: int):
+    """
+    Next month's emissions and energy (forecast with a 95% interval), and the top risk sources
+    """
+    today = date.today()
+    start, series = yield from daily_history_plan(org_id, today)
+
+    # Forecast from today through the end of next month
+    month_start, next_month = month_range(today)
+    split = (next_month - today).days
+    horizon = (add_months(next_month, 1) - today).days
+    month_start_index = (month_start - start).days
+    forecasts = yield from forecasts_plan(org_id, today, start, series, horizon)
+
+    # Get top risk sources (categories with highest emissions)
+    top_rows = yield """
+        SELECT
+            COALESCE(ec.name, 'Unknown') as category_name,
+            COALESCE(SUM(de.co2_total), 0) as total_emissions
+        FROM DailyEmissionRollup de
+        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
+        WHERE de.org_id = %s
+        AND de.record_date >= %s
+        GROUP BY ec.category_id, ec.name
+        ORDER BY total_emissions DESC
+        LIMIT 3
+    """, (org_id, trailing_months(3)[0])
+    top_risk_sources = [row['category_name'] for row in top_rows]
+
+    return {
+        "next_month_emissions": _monthly_outlook(
+            series["emissions"], forecasts["emissions"][0], month_start_index, split, horizon
+        ),
+        "next_month_energy": _monthly_outlook(
+            series["energy"], forecasts["energy"][0], month_start_index, split, horizon
+        ),
+        "top_risk_sources": top_risk_sources,
+        "model": model_name(),
+        "confidence_level": 0.95
+    }
+
+
+def trends_plan(org_id: int, data_type: str):
+    """
+    Last 6 months of actuals (with the model's in-sample fit) plus 3 months of forecasts
+    data_type: 'emissions' or 'energy'
+    """
+    today = date.today()
+    start, series = yield from daily_history_plan(org_id, today)
+    metric = "emissions" if data_type == "emissions" else "energy"
+    y = series[metric]
+
+    month_start, _ = month_range(today)
+    horizon = (add_months(month_start, 4) - today).days
+    forecasts = yield from forecasts_plan(org_id, today, start, {metric: y}, horizon)
+    forecast, fitted = forecasts[metric]
+
+    def index(day: date) -> int:
+        return (day - start).days
+
+    # Create trend data with actual and predicted values
+    trend_data = []
+
+    # Add actual data: every month of the last 6 that has emissions
+    first_day = trailing_months(6, today)[0]
+    month = first_day.replace(day=1)
+    while month <= month_start:
+        days = slice(index(max(month, first_day)), index(min(add_months(month, 1), today + timedelta(days=1))))
+        actual = float(y[days].sum())
+        if actual > 0:
+            predicted = fitted[days]
+            trend_data.append({
+                "month": MONTH_NAMES[month.month - 1],
+                "actual": round(actual, 2),
+                "predicted": round(float(np.nansum(predicted)), 2) if np.isfinite(predicted).any() else None
+            })
+        month = add_months(month, 1)
+
+    # Add 3 months of future predictions
+    if trend_data:
+        for i in range(1, 4):
+            month = add_months(month_start, i)
+            value, lower, upper = forecast.total((month - today).days, (add_months(month, 1) - today).days)
+            trend_data.append({
+                "month": MONTH_NAMES[month.month - 1],
+                "actual": None,
+                "predicted": round(value, 2),
+                "lower": round(lower, 2),
+                "upper": round(upper, 2)
+            })
+
+    return trend_data
+
+
+def recommendations_plan(org_id: int):
+    """
+    Stored insights (see insight_store.py); read-only, generation runs from
+    generate_insight_plan and the insight_store.py batch
+    """
+    return (yield from stored_insights_plan(org_id))
+
+
+def generate_insight_plan(org_id: int):
+    """
+    Bring the stored insights up to date
+    Returns (generated, insight): how many insights were created and the newest of
+    them, (0, None) when there was nothing new. Repeated calls without new data
+    only read the store
+    """
+    insights = yield from new_insights_plan(org_id)
+    return len(insights), (insights[0] if insights else None)
@@ -0,0 +1,250 @@
+import argparse
+import math
+import os
+import warnings
+from datetime import date, timedelta
+from typing import Optional
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+# Anomaly detection over DailyEmissions.
+#
+# Each day's CO2 for a (location, category) is compared with the same weekday of
+# the previous BASELINE_WEEKS weeks (weekends look nothing like weekdays), using
+# a robust z-score: (value - median) / (1.4826 * MAD). Days with |z| at or above
+# ANOMALY_Z_THRESHOLD are stored in EmissionAnomalies, which the AI-insights
+# recommendations read. Scans are incremental: AnomalyScanState keeps the last
+# day scanned per organization and each run only scores the days after it.
+# Run from cron after the daily load, e.g.:
+#   python anomalies.py
+
+BASELINE_WEEKS = 12
+# Baseline days needed before a day is scored
+MIN_HISTORY = 6
+# MAD is floored at this fraction of the median, so a perfectly flat series does
+# not turn every small change into an anomaly
+MAD_FLOOR = 0.05
+Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", 3.5))
+# Days scored on an organization's first scan
+INITIAL_SCAN_DAYS = 90
+
+ANOMALY_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS EmissionAnomalies (
+        org_id INT NOT NULL,
+        location_id INT NOT NULL,
+        category_id INT NOT NULL,
+        record_date DATE NOT NULL,
+        value DOUBLE NOT NULL,
+        baseline DOUBLE NOT NULL,
+        scale DOUBLE NOT NULL,
+        z_score DOUBLE NOT NULL,
+        confidence DOUBLE NOT NULL,
+        history INT NOT NULL,
+        PRIMARY KEY (org_id, record_date, location_id, category_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS AnomalyScanState (
+        org_id INT NOT NULL PRIMARY KEY,
+        scanned_through DATE NOT NULL,
+        scanned_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+ANOMALY_COLUMNS = ["location_id", "category_id", "record_date", "value", "baseline", "scale",
+                   "z_score", "confidence", "history"]
+
+
+def ensure_anomaly_schema(connection):
+    """Create the anomaly tables if they do not exist yet"""
+    cursor = connection.cursor()
+    for ddl in ANOMALY_SCHEMA:
+        cursor.execute(ddl)
+    connection.commit()
+    cursor.close()
+
+
+def _normal_tail(z: float) -> float:
+    """Two-sided P(|Z| >= z) for a standard normal"""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def detect_anomalies(rows, start: date, end: date, weeks: int = BASELINE_WEEKS,
+                     threshold: float = Z_THRESHOLD, min_history: int = MIN_HISTORY) -> pd.DataFrame:
+    """
+    Score every (location, category) on each day of [start, end)
+    - rows: (location_id, category_id, record_date, value) covering `weeks` weeks before start
+    A (location, category) without a row on a day has no value that day (not 0)
+    and is left out of both the scored days and the baselines.
+    The baseline is built for all series and days at once: a (series, day) array
+    is indexed with the same-weekday lags, giving a (series, day, week) window.
+    confidence (%) is 1 - p, where p is the normal tail of z but never below
+    1 / (history + 1): with n baseline days a value cannot be shown rarer than that
+    Returns one row per anomaly with ANOMALY_COLUMNS
+    """
+    frame = pd.DataFrame(list(rows), columns=["location_id", "category_id", "record_date", "value"])
+    days = (end - start).days
+    if frame.empty or days <= 0:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    first = start - timedelta(weeks=weeks)
+    frame["day"] = (pd.to_datetime(frame["record_date"]) - pd.Timestamp(first)).dt.days
+    frame = frame[(frame["day"] >= 0) & (frame["day"] < weeks * 7 + days)]
+    series = frame.groupby(["location_id", "category_id"]).ngroup().to_numpy()
+    keys = frame[["location_id", "category_id"]].to_numpy()[np.unique(series, return_index=True)[1]]
+
+    values = np.full((len(keys), weeks * 7 + days), np.nan)
+    values[series, frame["day"].to_numpy()] = frame["value"].astype(float).to_numpy()
+
+    targets = np.arange(weeks * 7, weeks * 7 + days)
+    lags = targets[:, None] - 7 * np.arange(1, weeks + 1)[None, :]
+    window = values[:, lags]
+    current = values[:, targets]
+    with warnings.catch_warnings():
+        # All-NaN windows (no history yet) are expected and filtered below
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        median = np.nanmedian(window, axis=2)
+        mad = np.nanmedian(np.abs(window - median[:, :, None]), axis=2)
+    history = np.isfinite(window).sum(axis=2)
+    scale = np.maximum(1.4826 * mad, MAD_FLOOR * np.abs(median))
+    scored = np.isfinite(current) & (history >= min_history) & (scale > 0)
+    z = np.zeros_like(current)
+    z[scored] = (current[scored] - median[scored]) / scale[scored]
+
+    hits, day_index = np.nonzero(scored & (np.abs(z) >= threshold))
+    anomalies = pd.DataFrame({
+        "location_id": keys[hits, 0],
+        "category_id": keys[hits, 1],
+        "record_date": [start + timedelta(days=int(d)) for d in day_index],
+        "value": current[hits, day_index],
+        "baseline": median[hits, day_index],
+        "scale": scale[hits, day_index],
+        "z_score": z[hits, day_index],
+        "history": history[hits, day_index],
+    })
+    anomalies["confidence"] = [
+        round((1 - max(_normal_tail(z_score), 1 / (n + 1))) * 100, 1)
+        for z_score, n in zip(anomalies["z_score"], anomalies["history"])
+    ]
+    return anomalies[ANOMALY_COLUMNS]
+
+
+def scan_org(connection, org_id: int, through: date, start: Optional[date] = None,
+             snapshot: Optional[str] = None) -> int:
+    """
+    Score the organization's days after its last scan through `through` (inclusive)
+    and store the anomalies found; `start` forces a rescan from that day.
+    Anomalies already stored for the scanned days are replaced, and the scan state
+    advances to the last day that had data
+    - snapshot: read DailyEmissions from this Parquet snapshot (see emissions_snapshot.py)
+    Returns the number of anomalies stored
+    """
+    cursor = connection.cursor()
+    if start is None:
+        cursor.execute("SELECT scanned_through FROM AnomalyScanState WHERE org_id = %s", (org_id,))
+        row = cursor.fetchone()
+        start = row[0] + timedelta(days=1) if row else through - timedelta(days=INITIAL_SCAN_DAYS - 1)
+    end = through + timedelta(days=1)
+    if start >= end:
+        cursor.close()
+        return 0
+
+    if snapshot:
+        from emissions_snapshot import location_category_daily
+        rows = location_category_daily(snapshot, org_id, start - timedelta(weeks=BASELINE_WEEKS), end)
+    else:
+        cursor.execute("""
+            SELECT location_id, category_id, record_date, SUM(co2_emitted)
+            FROM DailyEmissions
+            WHERE org_id = %s
+            AND record_date >= %s AND record_date < %s
+            GROUP BY location_id, category_id, record_date
+        """, (org_id, start - timedelta(weeks=BASELINE_WEEKS), end))
+        rows = cursor.fetchall()
+    anomalies = detect_anomalies(rows, start, end)
+    # Only move the watermark up to the last day with data, so days that are
+    # loaded late are still scanned on a later run
+    latest = max((row[2] for row in rows if row[2] >= start), default=None)
+
+    cursor.execute(
+        "DELETE FROM EmissionAnomalies WHERE org_id = %s AND record_date >= %s AND record_date < %s",
+        (org_id, start, end)
+    )
+    if len(anomalies):
+        cursor.executemany(f"""
+            INSERT INTO EmissionAnomalies (org_id, {", ".join(ANOMALY_COLUMNS)})
+            VALUES (%s, {", ".join(["%s"] * len(ANOMALY_COLUMNS))})
+        """, [
+            (org_id, int(row.location_id), int(row.category_id), row.record_date, float(row.value),
+             float(row.baseline), float(row.scale), float(row.z_score), float(row.confidence), int(row.history))
+            for row in anomalies.itertuples(index=False)
+        ])
+    if latest is not None:
+        cursor.execute("""
+            INSERT INTO AnomalyScanState (org_id, scanned_through) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE scanned_through = GREATEST(scanned_through, VALUES(scanned_through))
+        """, (org_id, latest))
+    connection.commit()
+    cursor.close()
+    return len(anomalies)
+
+
+def scan_all(connection, through: Optional[date] = None, rescan_days: int = 0,
+             snapshot: Optional[str] = None) -> dict:
+    """
+    Incremental scan of every organization through `through` (default yesterday,
+    since today is still being loaded); rescan_days > 0 rescores that many recent days
+    Returns {org_id: anomalies stored}
+    """
+    through = through or date.today() - timedelta(days=1)
+    start = through - timedelta(days=rescan_days - 1) if rescan_days > 0 else None
+    cursor = connection.cursor()
+    cursor.execute("SELECT org_id FROM Organizations")
+    org_ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return {org_id: scan_org(connection, org_id, through, start, snapshot) for org_id in org_ids}
+
+
+def recent_anomalies_plan(org_id: int, since: date, limit: int = 3):
+    """
+    Query plan (see query_plans.py) for the organization's strongest anomalies since a day
+    Rows carry location_name and category_name, strongest |z| first
+    """
+    rows = yield """
+        SELECT
+            a.record_date, a.location_id, a.category_id, a.value, a.baseline, a.z_score, a.confidence,
+            COALESCE(l.name, 'Unknown') as location_name,
+            COALESCE(ec.name, 'Unknown') as category_name
+        FROM EmissionAnomalies a
+        LEFT JOIN Locations l ON a.location_id = l.location_id
+        LEFT JOIN EmissionCategories ec ON a.category_id = ec.category_id
+        WHERE a.org_id = %s
+        AND a.record_date >= %s
+        ORDER BY ABS(a.z_score) DESC
+        LIMIT %s
+    """, (org_id, since, limit)
+    return rows
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Detect emission anomalies per location, category and weekday")
+    parser.add_argument("--rescan-days", type=int, default=0, help="rescore this many recent days")
+    parser.add_argument("--snapshot", default=None, help="read DailyEmissions from this Parquet snapshot directory")
+    args = parser.parse_args()
+
+    db = mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+    ensure_anomaly_schema(db)
+    found = scan_all(db, rescan_days=args.rescan_days, snapshot=args.snapshot)
+    print(f"✅ Scanned {len(found)} organizations, {sum(found.values())} anomalies stored")
+    db.close()
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import re
+from typing import Optional
+
+import aiomysql
+
+from identity import IdentityCache
+
+# Non-blocking MySQL access for the async API (API_MODE=async, see async_endpoints.py).
+# The async endpoints run the same query plans as the sync ones (see query_plans.py)
+# on an aiomysql pool, so a request waiting on MySQL does not hold a worker thread.
+
+_PARAM_MARKERS = re.compile(r"%%|%s|%")
+
+
+def to_pyformat(sql: str) -> str:
+    """
+    Escape literal % signs (e.g. in DATE_FORMAT) for PyMySQL, which applies
+    Python %-formatting to the whole statement; mysql.connector only replaces %s
+    """
+    return _PARAM_MARKERS.sub(lambda match: "%%" if match.group() == "%" else match.group(), sql)
+
+
+def _advance(plan, rows):
+    """Run a plan up to its next statement: (True, (sql, params)), or (False, result) when it is done"""
+    try:
+        return True, plan.send(rows)
+    except StopIteration as done:
+        return False, done.value
+
+
+async def run_plan_async(cursor, plan):
+    """
+    Execute a query plan on an aiomysql DictCursor and return its result
+    The plan's own steps (forecast fitting, the pandas rules engine, ...) run in a
+    worker thread, so a CPU-heavy cache miss does not stall the event loop
+    """
+    pending, step = await asyncio.to_thread(_advance, plan, None)
+    while pending:
+        sql, params = step
+        await cursor.execute(to_pyformat(sql), params)
+        pending, step = await asyncio.to_thread(_advance, plan, list(await cursor.fetchall()))
+    return step
+
+
+_pool: Optional[aiomysql.Pool] = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_async_pool() -> aiomysql.Pool:
+    """
+    Return the process-wide aiomysql pool, creating it on first use
+    Uses the same DB_* variables as db_pool.get_pool, plus
+    - DB_ASYNC_POOL_SIZE: maximum open connections (default 20)
+    """
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await aiomysql.create_pool(
+                    minsize=1,
+                    maxsize=int(os.getenv("DB_ASYNC_POOL_SIZE", 20)),
+                    host=os.getenv("DB_HOST"),
+                    port=int(os.getenv("DB_PORT", 3306)),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    db=os.getenv("DB_NAME"),
+                    # Read-only requests must not keep a REPEATABLE READ snapshot open
+                    # on a pooled connection, or later requests would see stale data
+                    autocommit=True,
+                )
+    return _pool
+
+
+async def close_async_pool():
+    """Close the process-wide aiomysql pool (used on application shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+async def run_query_plan(plan):
+    """Run a query plan on its own pooled connection"""
+    pool = await get_async_pool()
+    async with pool.acquire() as connection:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            return await run_plan_async(cursor, plan)
+
+
+async def resolve_identity_async(cache: IdentityCache, user_id: int) -> Optional[dict]:
+    """
+    Async counterpart of identity.resolve_identity: cache hits do no I/O at all
+    Returns None if the user does not exist (misses are not cached)
+    """
+    identity = cache.get(user_id)
+    if identity is not None:
+        return identity
+
+    generation = cache.generation(user_id)
+    pool = await get_async_pool()
+    async with pool.acquire() as connection:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute("SELECT user_id, org_id, role, status FROM Users WHERE user_id = %s", (user_id,))
+            identity = await cursor.fetchone()
+
+    if identity is not None:
+        cache.put(user_id, identity, generation)
+    return identity
@@ -0,0 +1,313 @@
+import asyncio
+from typing import Callable
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+
+from ai_insights import generate_insight_plan, predictions_plan, recommendations_plan, trends_plan
+from async_db import get_async_pool, resolve_identity_async, run_query_plan
+from dashboard import (
+    EMPTY_STATS, dashboard_stats_plan, emission_breakdown_plan, emissions_over_time_plan,
+    top_categories_plan
+)
+from emission_records import default_date_range, emission_records_plan, parse_id_list
+from identity import IdentityCache
+from result_cache import ResultCache
+
+# async def versions of the read-heavy endpoints (dashboard, emission records and
+# AI insights), served on an aiomysql pool instead of the blocking thread pool.
+# main.py mounts this router in place of the sync routes when API_MODE=async.
+# The SQL lives in the shared query plans, so both modes return identical payloads.
+
+
+def create_async_router(
+    identity_cache: IdentityCache,
+    result_cache: ResultCache,
+    result_cache_key: Callable,
+    result_cache_versions_due: Callable,
+    log_action: Callable,
+) -> APIRouter:
+    """
+    Build the async router around the caches and audit logger owned by main.py
+    """
+    router = APIRouter()
+
+    async def sync_result_cache():
+        # Same RollupVersions poll as main.sync_result_cache, without blocking the loop
+        if not result_cache_versions_due():
+            return
+        try:
+            pool = await get_async_pool()
+            async with pool.acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute("SELECT org_id, version FROM RollupVersions")
+                    versions = dict(await cursor.fetchall())
+            result_cache.sync_versions(versions)
+        except Exception as e:
+            print(f"Failed to sync result cache versions: {e}")
+
+    async def cached_result(endpoint: str, org_id: int, plan_factory: Callable, *parts):
+        """Return a cached aggregate, running the query plan on a miss"""
+        await sync_result_cache()
+        key = result_cache_key(endpoint, org_id, *parts)
+        value = result_cache.get(key)
+        if value is None:
+            value = await run_query_plan(plan_factory())
+            result_cache.set(key, value)
+        return value
+
+    async def get_org_id(user_id: int):
+        user = await resolve_identity_async(identity_cache, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user['org_id']
+
+    async def audit(user_id: int, action: str, details: str):
+        # The writer queue may block under the "block" overflow policy
+        await run_in_threadpool(log_action, user_id, action, details)
+
+    @router.get("/api/dashboard/bundle")
+    async def get_dashboard_bundle(user_id: int = Query(...), filter: str = Query("monthly")):
+        """
+        Get stats, emissions over time, breakdown and top categories in one call
+        The four aggregations run concurrently on the async pool
+        """
+        try:
+            org_id = await get_org_id(user_id)
+
+            if org_id is None:
+                return {
+                    "success": True,
+                    "stats": dict(EMPTY_STATS),
+                    "emissions_over_time": [],
+                    "breakdown": [],
+                    "top_categories": []
+                }
+
+            stats, emissions_over_time, breakdown, top_categories = await asyncio.gather(
+                cached_result("dashboard.stats", org_id, lambda: dashboard_stats_plan(org_id)),
+                cached_result("dashboard.emissions_over_time", org_id,
+                              lambda: emissions_over_time_plan(org_id, filter), filter),
+                cached_result("dashboard.breakdown", org_id, lambda: emission_breakdown_plan(org_id, filter), filter),
+                cached_result("dashboard.top_categories", org_id, lambda: top_categories_plan(org_id, filter), filter),
+            )
+
+            await audit(user_id, "SELECT_DASHBOARD_STATS", f"User retrieved dashboard bundle (filter: {filter})")
+
+            return {
+                "success": True,
+                "stats": stats,
+                "emissions_over_time": emissions_over_time,
+                "breakdown": breakdown,
+                "top_categories": top_categories
+            }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    @router.get("/api/dashboard/stats")
+    async def get_dashboard_stats(user_id: int = Query(...)):
+        """
+        Get dashboard statistics for user's organization (current month to date)
+        """
+        try:
+            org_id = await get_org_id(user_id)
+
+            if org_id is None:
+                return {"success": True, "stats": dict(EMPTY_STATS)}
+
+            stats = await cached_result("dashboard.stats", org_id, lambda: dashboard_stats_plan(org_id))
+
+            await audit(user_id, "SELECT_DASHBOARD_STATS", "User retrieved dashboard statistics")
+
+            return {"success": True, "stats": stats}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    @router.get("/api/dashboard/emissions-over-time")
+    async def get_emissions_over_time(user_id: int = Query(...), filter: str = Query("monthly")):
+        """
+        Get emissions data over time based on filter
+        """
+        try:
+            org_id = await get_org_id(user_id)
+
+            if org_id is None:
+                return {"success": True, "data": []}
+
+            data = await cached_result(
+                "dashboard.emissions_over_time", org_id, lambda: emissions_over_time_plan(org_id, filter), filter
+            )
+            return {"success": True, "data": data}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    @router.get("/api/dashboard/breakdown")
+    async def get_emission_breakdown(user_id: int = Query(...), filter: str = Query("monthly")):
+        """
+        Get emission breakdown by category/scope based on filter
+        """
+        try:
+            org_id = await get_org_id(user_id)
+
+            if org_id is None:
+                return {"success": True, "data": []}
+
+            data = await cached_result(
+                "dashboard.breakdown", org_id, lambda: emission_breakdown_plan(org_id, filter), filter
+            )
+            return {"success": True, "data": data}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    @router.get("/api/dashboard/top-categories")
+    async def get_top_emission_categories(user_id: int = Query(...), filter: str = Query("monthly")):
+        """
+        Get top emission categories for recommendations based on filter
+        """
+        try:
+            org_id = await get_org_id(user_id)
+
+            if org_id is None:
+                return {"success": True, "data": []}
+
+            data = await cached_result(
+                "dashboard.top_categories", org_id, lambda: top_categories_plan(org_id, filter), filter
+            )
+            return {"success": True, "data": data}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    @router.get("/api/emission-data/records")
+    async def get_emission_records(
+        user_id: int = Query(...),
+        start_date: str = Query(None),
+        end_date: str = Query(None),
+        location_ids: str = Query(None),
+        category_ids: str = Query(None)
+    ):
+        """
+        Get detailed emission records for the emission data page with advanced filtering
+        """
+        try:
+            org_id = await get_org_id(user_id)
+
+            if org_id is None:
+                return {
+                    "success": True,
+                    "summary": {},
+                    "records": [],
+                    "category_breakdown": [],
+                    "emissions_over_time": [],
+                    "locations": [],
+                    "categories": []
+                }
+
+            try:
+                start, end = default_date_range(start_date, end_date)
+                location_list = parse_id_list(location_ids)
+                category_list = parse_id_list(category_ids)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid filter: dates must be YYYY-MM-DD and IDs integers")
+
+            payload = await run_query_plan(emission_records_plan(org_id, start, end, location_list, category_list))
+
+            await audit(
+                user_id, "SELECT_EMISSION_RECORDS",
+                f"User retrieved emission records (date range: {start:%Y-%m-%d} to {end:%Y-%m-%d})"
+            )
+
+            return {"success": True, **payload}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    async def org_for_insights(user_id: int):
+        org_id = await get_org_id(user_id)
+        if org_id is None:
+            raise HTTPException(status_code=400, detail="User is not associated with an organization")
+        return org_id
+
+    @router.get("/api/ai-insights/predictions")
+    async def get_ai_predictions(user_id: int = Query(...)):
+        """
+        Get AI predictions for next month's emissions, energy, and trends
+        """
+        try:
+            org_id = await org_for_insights(user_id)
+            predictions = await cached_result("ai.predictions.data", org_id, lambda: predictions_plan(org_id))
+            return {"success": True, "predictions": predictions}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    @router.get("/api/ai-insights/trends")
+    async def get_ai_trends(user_id: int = Query(...), data_type: str = Query("emissions")):
+        """
+        Get historical and predicted trends for emissions or energy
+        """
+        try:
+            org_id = await org_for_insights(user_id)
+            trend_data = await cached_result(
+                "ai.trends.data", org_id, lambda: trends_plan(org_id, data_type), data_type
+            )
+            return {"success": True, "data_type": data_type, "trends": trend_data}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    @router.get("/api/ai-insights/recommendations")
+    async def get_ai_recommendations(user_id: int = Query(...)):
+        """
+        Get AI-generated insights and recommendations
+        """
+        try:
+            org_id = await org_for_insights(user_id)
+            insights = await cached_result("ai.recommendations.data", org_id, lambda: recommendations_plan(org_id))
+            return {"success": True, "insights": insights, "total_count": len(insights)}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    @router.post("/api/ai-insights/generate")
+    async def generate_new_insight(user_id: int = Query(...)):
+        """
+        Generate AI insights on demand (same payload as main.generate_new_insight)
+        """
+        try:
+            org_id = await org_for_insights(user_id)
+            generated, insight = await run_query_plan(generate_insight_plan(org_id))
+            result_cache.invalidate(result_cache_key("ai.recommendations.data", org_id))
+
+            await audit(user_id, "GENERATE_AI_INSIGHT", f"User generated AI insights ({generated} new)")
+
+            return {"success": True, "generated": generated, "insight": insight}
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+    return router
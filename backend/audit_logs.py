@@ -0,0 +1,293 @@
+import argparse
+import base64
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import mysql.connector
+from dotenv import load_dotenv
+
+# Schema and queries for /api/admin/audit-logs.
+#
+# AuditLogs rows carry the org_id of the acting user, stamped when the row is
+# written, so listing an organization's logs is an index range scan instead of a
+# user_id IN (SELECT ... FROM Users) filter. Pages are fetched with keyset
+# pagination on (timestamp, log_id): the cursor handed to the client encodes the
+# last row of the previous page, so deep pages cost the same as the first one.
+
+AUDIT_INDEXES = [
+    ("AuditLogs", "idx_al_org_ts", "(org_id, timestamp, log_id)"),
+    ("AuditLogs", "idx_al_ts", "(timestamp, log_id)"),
+]
+
+BACKFILL_BATCH_SIZE = 50000
+
+# Per (organization, action, day) row counts, kept up to date by
+# audit_writer.write_audit_rows in the same transaction as the rows themselves,
+# so action statistics are read from O(actions x days) counters instead of a
+# GROUP BY over the log. org_id is 0 for rows without an organization and
+# is_system marks rows without a user (visible to every admin). count is the
+# number of AuditLogs rows; events also includes occurrences the audit policy
+# counted without logging (see audit_policy.py).
+ACTION_COUNTS_DDL = """
+CREATE TABLE IF NOT EXISTS AuditActionCounts (
+    org_id INT NOT NULL,
+    is_system TINYINT(1) NOT NULL,
+    action VARCHAR(100) NOT NULL,
+    day DATE NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    events BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (org_id, is_system, action, day)
+)
+"""
+
+
+def ensure_audit_schema(connection):
+    """
+    Add AuditLogs.org_id, its indexes and AuditActionCounts if missing
+    When the column is first added, existing rows are backfilled from Users;
+    an empty AuditActionCounts is rebuilt from the log
+    """
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'AuditLogs' AND column_name = 'org_id'
+    """)
+    added = cursor.fetchone()[0] == 0
+    cursor.execute(ACTION_COUNTS_DDL)
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'AuditActionCounts' AND column_name = 'events'
+    """)
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("ALTER TABLE AuditActionCounts ADD COLUMN events BIGINT NOT NULL DEFAULT 0")
+        cursor.execute("UPDATE AuditActionCounts SET events = count")
+    cursor.execute("SELECT COUNT(*) FROM AuditActionCounts")
+    counters_empty = cursor.fetchone()[0] == 0
+    if added:
+        cursor.execute("ALTER TABLE AuditLogs ADD COLUMN org_id INT NULL AFTER user_id")
+    for table, name, columns in AUDIT_INDEXES:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (table, name))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"CREATE INDEX {name} ON {table} {columns}")
+    connection.commit()
+    cursor.close()
+    if added:
+        backfill_org_ids(connection)
+    if counters_empty:
+        rebuild_action_counts(connection)
+
+
+def backfill_org_ids(connection, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Stamp org_id on existing rows from the user's current organization
+    Runs in log_id ranges, committing each, so it can be interrupted and rerun
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT COALESCE(MIN(log_id), 0), COALESCE(MAX(log_id), 0) FROM AuditLogs")
+    low, high = cursor.fetchone()
+    updated = 0
+    for first in range(low, high + 1, batch_size):
+        cursor.execute("""
+            UPDATE AuditLogs al
+            JOIN Users u ON al.user_id = u.user_id
+            SET al.org_id = u.org_id
+            WHERE al.log_id >= %s AND al.log_id < %s
+            AND al.org_id IS NULL AND u.org_id IS NOT NULL
+        """, (first, first + batch_size))
+        updated += cursor.rowcount
+        connection.commit()
+    cursor.close()
+    return updated
+
+
+def rebuild_action_counts(connection):
+    """
+    Recompute AuditActionCounts from AuditLogs in one transaction
+    Entries written while the rebuild runs may be counted twice or not at all,
+    so run it while the API is idle (it is a backfill / repair tool). Events that
+    were only counted have no row to rebuild from, so events falls back to count
+    """
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM AuditActionCounts")
+    cursor.execute("""
+        INSERT INTO AuditActionCounts (org_id, is_system, action, day, count, events)
+        SELECT COALESCE(org_id, 0), user_id IS NULL, action, DATE(timestamp), COUNT(*), COUNT(*)
+        FROM AuditLogs
+        GROUP BY COALESCE(org_id, 0), user_id IS NULL, action, DATE(timestamp)
+    """)
+    connection.commit()
+    cursor.close()
+
+
+def encode_cursor(row: dict) -> str:
+    """Opaque page cursor for the position after `row`"""
+    payload = json.dumps({"ts": str(row['timestamp']), "id": row['log_id']})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(timestamp, log_id) from a cursor; raises ValueError if it is malformed"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload["ts"]), int(payload["id"])
+    except (KeyError, TypeError, json.JSONDecodeError, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def build_log_filters(action_filter: Optional[str], user_filter: Optional[int],
+                      since: Optional[date] = None, until: Optional[date] = None) -> Tuple[List[str], list]:
+    """
+    Conditions and parameters for the optional action / user / date filters (alias al)
+    since and until are inclusive days; as a range on al.timestamp they let MySQL
+    prune AuditLogs to the monthly partitions they cover (see audit_retention.py)
+    """
+    conditions, params = [], []
+    if since:
+        conditions.append("al.timestamp >= %s")
+        params.append(since)
+    if until:
+        conditions.append("al.timestamp < %s")
+        params.append(until + timedelta(days=1))
+    if action_filter:
+        conditions.append("al.action LIKE %s")
+        params.append(f"%{action_filter}%")
+    if user_filter:
+        conditions.append("al.user_id = %s")
+        params.append(user_filter)
+    return conditions, params
+
+
+def scopes(org_id: Optional[int]) -> List[Tuple[str, list]]:
+    """
+    Row sets visible to an admin, each servable from one index in timestamp order:
+    their organization's rows plus system rows (no user); everything if no organization
+    """
+    if org_id is None:
+        return [("1=1", [])]
+    return [("al.org_id = %s", [org_id]), ("al.org_id IS NULL AND al.user_id IS NULL", [])]
+
+
+def audit_page_query(org_id: Optional[int], filters: Tuple[List[str], list], after: Optional[Tuple[datetime, int]],
+                     limit: int, offset: int = 0) -> Tuple[str, list]:
+    """
+    SQL and parameters for one page, newest first
+    - after: (timestamp, log_id) of the last row already shown (keyset), or None for the first page
+    - offset: legacy OFFSET paging, only used when there is no keyset position
+    Each scope is read in index order with its own LIMIT and the results merged
+    """
+    conditions, filter_params = filters
+    branches, params = [], []
+    for scope_condition, scope_params in scopes(org_id):
+        where = [scope_condition] + conditions
+        branch_params = scope_params + filter_params
+        if after is not None:
+            where.append("(al.timestamp < %s OR (al.timestamp = %s AND al.log_id < %s))")
+            branch_params += [after[0], after[0], after[1]]
+        branches.append(f"""
+            (SELECT al.log_id, al.user_id, al.action, al.details, al.timestamp
+             FROM AuditLogs al
+             WHERE {" AND ".join(where)}
+             ORDER BY al.timestamp DESC, al.log_id DESC
+             LIMIT %s)
+        """)
+        params += branch_params + [limit + offset]
+
+    sql = f"""
+        SELECT
+            page.log_id,
+            page.user_id,
+            u.name as user_name,
+            u.email as user_email,
+            page.action,
+            page.details,
+            page.timestamp
+        FROM ({" UNION ALL ".join(branches)}) page
+        LEFT JOIN Users u ON page.user_id = u.user_id
+        ORDER BY page.timestamp DESC, page.log_id DESC
+        LIMIT %s OFFSET %s
+    """
+    return sql, params + [limit, offset]
+
+
+def audit_totals_plan(org_id: Optional[int], filters: Tuple[List[str], list]):
+    """
+    Query plan (see query_plans.py) for the total row count and per-action counts
+    Returns (total_count, action_stats)
+    """
+    conditions, filter_params = filters
+    counts = {}
+    for scope_condition, scope_params in scopes(org_id):
+        rows = yield f"""
+            SELECT al.action, COUNT(*) as count
+            FROM AuditLogs al
+            WHERE {" AND ".join([scope_condition] + conditions)}
+            GROUP BY al.action
+        """, scope_params + filter_params
+        for row in rows:
+            counts[row['action']] = counts.get(row['action'], 0) + row['count']
+    action_stats = [
+        {"action": action, "count": count}
+        for action, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    ]
+    return sum(counts.values()), action_stats
+
+
+def action_counts_plan(org_id: Optional[int], action_filter: Optional[str],
+                       since: Optional[date] = None, until: Optional[date] = None):
+    """
+    Query plan for (total_count, action_stats) read from AuditActionCounts
+    Same visibility as scopes(): the organization's rows plus system rows,
+    or everything for an admin without an organization
+    """
+    conditions, params = [], []
+    if org_id is not None:
+        conditions.append("((org_id = %s AND is_system = 0) OR is_system = 1)")
+        params.append(org_id)
+    if since:
+        conditions.append("day >= %s")
+        params.append(since)
+    if until:
+        conditions.append("day <= %s")
+        params.append(until)
+    if action_filter:
+        conditions.append("action LIKE %s")
+        params.append(f"%{action_filter}%")
+    rows = yield f"""
+        SELECT action, SUM(count) as count, SUM(events) as events
+        FROM AuditActionCounts
+        WHERE {" AND ".join(conditions) if conditions else "1=1"}
+        GROUP BY action
+        ORDER BY count DESC
+    """, params
+    action_stats = [
+        {"action": row['action'], "count": int(row['count']), "events": int(row['events'])} for row in rows
+    ]
+    return sum(row['count'] for row in action_stats), action_stats
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Maintain the AuditLogs org_id column and action counters")
+    parser.add_argument("--backfill", action="store_true", help="stamp org_id on rows that do not have one yet")
+    parser.add_argument("--rebuild-counts", action="store_true", help="recompute AuditActionCounts from the log")
+    args = parser.parse_args()
+
+    db = mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+    ensure_audit_schema(db)
+    if args.backfill:
+        print(f"✅ Backfilled org_id on {backfill_org_ids(db)} audit log rows")
+    if args.rebuild_counts:
+        rebuild_action_counts(db)
+        print("✅ Audit action counts rebuilt")
+    db.close()
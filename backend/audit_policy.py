@@ -0,0 +1,119 @@
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Audit policy: how each action reaches AuditLogs.
+#
+# Tiers (per action, see DEFAULT_POLICY and AUDIT_POLICY in main.py):
+#   sync            written synchronously before the request returns
+#   log             queued for the background audit writer (the default)
+#   sample:<rate>   a random <rate> fraction is logged (e.g. sample:0.1)
+#   coalesce:<sec>  at most one row per user and action every <sec> seconds
+#   count           no row; only the per-day action counters are bumped
+# Every event is counted in AuditActionCounts.events whatever the tier, so action
+# statistics still reflect real activity when read events are not all logged.
+
+SYNC = "sync"
+LOG = "log"
+COUNT = "count"
+
+# Security-relevant actions are always written synchronously; high-volume read
+# events are coalesced per user
+DEFAULT_POLICY = {
+    "LOGIN": "sync",
+    "LOGIN_FAILED": "sync",
+    "REGISTER": "sync",
+    "UPDATE_USER_STATUS": "sync",
+    "UPDATE_USER_ROLE": "sync",
+    "DELETE_USER": "sync",
+    "EXPORT_EMISSION_RECORDS": "sync",
+    "SELECT_DASHBOARD_STATS": "coalesce:300",
+    "SELECT_EMISSION_RECORDS": "coalesce:300",
+    "VIEW_AUDIT_LOGS": "coalesce:300",
+    "VIEW_USERS": "coalesce:300",
+    "VIEW_LOCATION_ANALYTICS": "coalesce:300",
+    "VIEW_BENCHMARKS": "coalesce:300",
+}
+
+
+def parse_policy(text: Optional[str]) -> Dict[str, Tuple[str, float]]:
+    """
+    Parse "ACTION=tier,ACTION=tier" overrides into {action: (tier, argument)}
+    Raises ValueError for unknown tiers or bad arguments
+    """
+    policy = {}
+    for item in (text or "").split(","):
+        if not item.strip():
+            continue
+        action, _, spec = item.partition("=")
+        policy[action.strip()] = parse_tier(spec.strip())
+    return policy
+
+
+def parse_tier(spec: str) -> Tuple[str, float]:
+    tier, _, argument = spec.partition(":")
+    if tier in (SYNC, LOG, COUNT) and not argument:
+        return tier, 0.0
+    if tier == "sample" and 0 <= float(argument) <= 1:
+        return tier, float(argument)
+    if tier == "coalesce" and float(argument) > 0:
+        return tier, float(argument)
+    raise ValueError(f"Invalid audit policy tier: {spec}")
+
+
+class AuditPolicy:
+    """
+    Decides per event whether to write it synchronously (SYNC), queue it (LOG)
+    or only count it (COUNT)
+    - overrides: {action: (tier, argument)} merged over DEFAULT_POLICY
+    - default_tier: tier for actions without a rule
+    """
+
+    def __init__(self, overrides: Optional[Dict[str, Tuple[str, float]]] = None,
+                 default_tier: Tuple[str, float] = (LOG, 0.0), max_coalesce_keys: int = 100000):
+        self.rules = {action: parse_tier(spec) for action, spec in DEFAULT_POLICY.items()}
+        self.rules.update(overrides or {})
+        self.default_tier = default_tier
+        self.max_coalesce_keys = max_coalesce_keys
+        self._last_logged = {}
+        self._lock = threading.Lock()
+        self._metrics = {SYNC: 0, LOG: 0, COUNT: 0}
+
+    def decide(self, user_id: Optional[int], action: str) -> str:
+        tier, argument = self.rules.get(action, self.default_tier)
+        if tier == "sample":
+            decision = LOG if random.random() < argument else COUNT
+        elif tier == "coalesce":
+            decision = self._coalesce(user_id, action, argument)
+        else:
+            decision = tier
+        with self._lock:
+            self._metrics[decision] += 1
+        return decision
+
+    def _coalesce(self, user_id: Optional[int], action: str, window: float) -> str:
+        now = time.monotonic()
+        key = (user_id, action)
+        with self._lock:
+            last = self._last_logged.get(key)
+            if last is not None and now - last < window:
+                return COUNT
+            if len(self._last_logged) >= self.max_coalesce_keys:
+                # Forget windows that have already closed, then everything if still full
+                self._last_logged = {
+                    k: t for k, t in self._last_logged.items()
+                    if now - t < self.rules.get(k[1], self.default_tier)[1]
+                }
+                if len(self._last_logged) >= self.max_coalesce_keys:
+                    self._last_logged.clear()
+            self._last_logged[key] = now
+            return LOG
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "decisions": dict(self._metrics),
+                "rules": {action: f"{tier}:{argument:g}" if argument else tier
+                          for action, (tier, argument) in sorted(self.rules.items())},
+            }
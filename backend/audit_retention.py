@@ -0,0 +1,230 @@
+import argparse
+import gzip
+import os
+from datetime import date, datetime
+from typing import Callable, List, Optional, Tuple
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from date_ranges import add_months
+from exports import encode_csv, stream_query
+
+# Monthly range partitions and retention for AuditLogs.
+#
+# AuditLogs is partitioned by month of `timestamp` (partitions named pYYYYMM, plus
+# pmax for anything beyond the last month created), so queries with a timestamp
+# range (see audit_logs.build_log_filters) only read the months they cover, and
+# expiring old entries is a metadata-only DROP PARTITION instead of a huge DELETE.
+# Before a partition is dropped its rows are archived to a gzip'd CSV on local disk.
+#
+# Run from cron, e.g. nightly:
+#   python audit_retention.py --maintain
+# The one-off conversion of an existing table is `python audit_retention.py --partition`.
+
+PARTITION_MONTHS_AHEAD = 3
+
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """First day of the month a pYYYYMM partition holds, None for pmax / unknown names"""
+    if len(name) == 7 and name.startswith("p") and name[1:].isdigit():
+        return date(int(name[1:5]), int(name[5:7]), 1)
+    return None
+
+
+def _bound_expression(column_type: str) -> Tuple[str, str]:
+    """Partitioning expression and bound template for a DATETIME or TIMESTAMP column"""
+    if column_type == "timestamp":
+        return "UNIX_TIMESTAMP(timestamp)", "UNIX_TIMESTAMP('{:%Y-%m-%d} 00:00:00')"
+    return "TO_DAYS(timestamp)", "TO_DAYS('{:%Y-%m-%d}')"
+
+
+def _timestamp_type(cursor) -> str:
+    cursor.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'AuditLogs' AND column_name = 'timestamp'
+    """)
+    return cursor.fetchone()[0].lower()
+
+
+def list_partitions(connection) -> List[str]:
+    """Partition names of AuditLogs in order (empty if it is not partitioned)"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT partition_name FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = 'AuditLogs' AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """)
+    names = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return names
+
+
+def _partition_definitions(months: List[date], column_type: str) -> str:
+    _, bound = _bound_expression(column_type)
+    return ", ".join(
+        f"PARTITION {partition_name(month)} VALUES LESS THAN ({bound.format(add_months(month, 1))})"
+        for month in months
+    )
+
+
+def partition_audit_logs(connection, today: Optional[date] = None):
+    """
+    Convert AuditLogs to monthly range partitions (no-op if already partitioned)
+    MySQL requires the partitioning column in every unique key and does not allow
+    foreign keys on partitioned tables, so the primary key becomes (log_id, timestamp)
+    and any foreign keys on AuditLogs are dropped. The primary key makes timestamp
+    NOT NULL, so rows without one are first stamped with the start of the oldest
+    month (they land in the first partition). This rewrites the table; run it off-peak.
+    """
+    if list_partitions(connection):
+        return
+    cursor = connection.cursor()
+    column_type = _timestamp_type(cursor)
+
+    cursor.execute("""
+        SELECT constraint_name FROM information_schema.referential_constraints
+        WHERE constraint_schema = DATABASE() AND table_name = 'AuditLogs'
+    """)
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE AuditLogs DROP FOREIGN KEY {constraint}")
+
+    cursor.execute("SELECT MIN(timestamp) FROM AuditLogs")
+    oldest = cursor.fetchone()[0]
+    current = (today or date.today()).replace(day=1)
+    first = oldest.date().replace(day=1) if oldest else current
+    months = [first]
+    while months[-1] < add_months(current, PARTITION_MONTHS_AHEAD):
+        months.append(add_months(months[-1], 1))
+
+    cursor.execute(
+        "UPDATE AuditLogs SET timestamp = %s WHERE timestamp IS NULL", (datetime.combine(first, datetime.min.time()),)
+    )
+    connection.commit()
+
+    expression, _ = _bound_expression(column_type)
+    cursor.execute("ALTER TABLE AuditLogs DROP PRIMARY KEY, ADD PRIMARY KEY (log_id, timestamp)")
+    cursor.execute(f"""
+        ALTER TABLE AuditLogs PARTITION BY RANGE ({expression}) (
+            {_partition_definitions(months, column_type)},
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+    """)
+    cursor.close()
+
+
+def ensure_future_partitions(connection, months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None):
+    """Split pmax so monthly partitions exist up to `months_ahead` months from now"""
+    existing = [month for month in map(partition_month, list_partitions(connection)) if month]
+    if not existing:
+        return
+    target = add_months((today or date.today()).replace(day=1), months_ahead)
+    months = []
+    month = add_months(max(existing), 1)
+    while month <= target:
+        months.append(month)
+        month = add_months(month, 1)
+    if not months:
+        return
+    cursor = connection.cursor()
+    column_type = _timestamp_type(cursor)
+    cursor.execute(f"""
+        ALTER TABLE AuditLogs REORGANIZE PARTITION pmax INTO (
+            {_partition_definitions(months, column_type)},
+            PARTITION pmax VALUES LESS THAN MAXVALUE
+        )
+    """)
+    cursor.close()
+
+
+def archive_partition(connection_factory: Callable, name: str, archive_dir: str) -> Tuple[str, int]:
+    """
+    Write every row of one partition to <archive_dir>/AuditLogs_<name>.csv.gz
+    The file is written under a temporary name and renamed once complete
+    Returns (path, row count)
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"AuditLogs_{name}.csv.gz")
+    partial = path + ".part"
+    rows = 0
+
+    def counted(chunks):
+        nonlocal rows
+        yield next(chunks)
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    chunks = stream_query(connection_factory(), f"SELECT * FROM AuditLogs PARTITION ({name}) ORDER BY log_id", ())
+    with gzip.open(partial, "wt", newline="") as archive:
+        for piece in encode_csv(counted(chunks)):
+            archive.write(piece)
+    os.replace(partial, path)
+    return path, rows
+
+
+def apply_retention(connection_factory: Callable, retention_months: int, archive_dir: str,
+                    today: Optional[date] = None) -> List[Tuple[str, str, int]]:
+    """
+    Archive and drop every monthly partition entirely older than `retention_months`
+    The matching AuditActionCounts days are deleted so statistics cover retained rows only
+    A partition is only dropped if its archive holds as many rows as it does
+    Returns (partition, archive path, rows) for each dropped partition
+    """
+    cutoff = add_months((today or date.today()).replace(day=1), -retention_months)
+    connection = connection_factory()
+    dropped = []
+    try:
+        cursor = connection.cursor()
+        for name in list_partitions(connection):
+            month = partition_month(name)
+            if month is None or add_months(month, 1) > cutoff:
+                continue
+            cursor.execute(f"SELECT COUNT(*) FROM AuditLogs PARTITION ({name})")
+            expected = cursor.fetchone()[0]
+            path, rows = archive_partition(connection_factory, name, archive_dir)
+            if rows != expected:
+                raise RuntimeError(f"Archive of {name} has {rows} rows, expected {expected}; partition kept")
+            cursor.execute(f"ALTER TABLE AuditLogs DROP PARTITION {name}")
+            cursor.execute("DELETE FROM AuditActionCounts WHERE day < %s", (add_months(month, 1),))
+            connection.commit()
+            dropped.append((name, path, rows))
+        cursor.close()
+    finally:
+        connection.close()
+    return dropped
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Partition AuditLogs by month and expire old partitions")
+    parser.add_argument("--partition", action="store_true", help="convert AuditLogs to monthly partitions (one-off)")
+    parser.add_argument("--maintain", action="store_true", help="create upcoming partitions and apply retention")
+    parser.add_argument("--retention-months", type=int, default=int(os.getenv("AUDIT_RETENTION_MONTHS", 12)))
+    parser.add_argument("--archive-dir", default=os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive"))
+    args = parser.parse_args()
+
+    def connect():
+        return mysql.connector.connect(
+            host=os.getenv("DB_HOST"),
+            port=int(os.getenv("DB_PORT", 3306)),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            database=os.getenv("DB_NAME"),
+        )
+
+    db = connect()
+    if args.partition:
+        partition_audit_logs(db)
+        print(f"✅ AuditLogs partitions: {', '.join(list_partitions(db))}")
+    if args.maintain:
+        ensure_future_partitions(db)
+        for name, path, rows in apply_retention(connect, args.retention_months, args.archive_dir):
+            print(f"✅ Archived {rows} rows of {name} to {path} and dropped the partition")
+    if not (args.partition or args.maintain):
+        parser.print_help()
+    db.close()
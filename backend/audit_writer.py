@@ -0,0 +1,222 @@
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest", "sync")
+
+_STOP = object()
+
+
+def write_audit_rows(connection, rows: List[Tuple], events: Sequence[Tuple] = ()):
+    """
+    Insert audit rows with a single multi-row INSERT, bump AuditActionCounts
+    (see audit_logs.py) in the same transaction, and commit
+    Each row is (user_id, org_id, action, details, timestamp)
+    events are (user_id, org_id, action, timestamp) that the audit policy
+    chose not to log: they are counted as events but get no row
+    """
+    if not rows and not events:
+        return
+    counts = Counter()
+    for user_id, org_id, action, details, timestamp in rows:
+        counts[(org_id or 0, user_id is None, action, timestamp.date())] += 1
+    logged = dict(counts)
+    for user_id, org_id, action, timestamp in events:
+        counts[(org_id or 0, user_id is None, action, timestamp.date())] += 1
+    count_placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(counts))
+    count_params = [value for key, total in counts.items() for value in (*key, logged.get(key, 0), total)]
+
+    cursor = connection.cursor()
+    try:
+        if rows:
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+            cursor.execute(
+                f"INSERT INTO AuditLogs (user_id, org_id, action, details, timestamp) VALUES {placeholders}",
+                [value for row in rows for value in row]
+            )
+        cursor.execute(
+            f"""INSERT INTO AuditActionCounts (org_id, is_system, action, day, count, events) VALUES {count_placeholders}
+            ON DUPLICATE KEY UPDATE count = count + VALUES(count), events = events + VALUES(events)""",
+            count_params
+        )
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+class AuditWriter:
+    """
+    Background writer that batches AuditLogs inserts off the request path
+    - connection_factory: callable returning a DB connection (closed after each flush)
+    - max_queue: bound on pending entries
+    - batch_size: flush as soon as this many entries are pending
+    - flush_interval: flush pending entries at least this often (seconds)
+    - overflow_policy: what submit() does when the queue is full
+        block       wait for room (up to flush_interval), then drop
+        drop_newest discard the entry being submitted
+        drop_oldest discard the oldest pending entry to make room
+        sync        write the entry synchronously on the caller's thread
+    """
+
+    def __init__(
+        self,
+        connection_factory: Callable,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        overflow_policy: str = "drop_oldest"
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow_policy}")
+        self.connection_factory = connection_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._metrics = {"submitted": 0, "written": 0, "counted": 0, "dropped": 0, "sync_writes": 0, "failed": 0, "flushes": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._metrics[key] += amount
+
+    def start(self):
+        """Start the background flush thread (no-op if already running)"""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """
+        Drain pending entries and stop the flush thread
+        If the thread has died, or does not finish within `timeout` (queue full and
+        the thread stuck), what is still queued is flushed on the caller's thread
+        """
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        if self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(max(deadline - time.monotonic(), 0))
+        if self._thread.is_alive() or self._queue.qsize():
+            print(f"Audit writer not drained after {timeout}s; flushing {self._queue.qsize()} entries synchronously")
+            self._drain()
+        self._thread = None
+
+    def submit(self, user_id: Optional[int], action: str, details: str, org_id: Optional[int] = None,
+               logged: bool = True) -> bool:
+        """
+        Queue an audit entry; returns False if the writer is not running
+        The timestamp is taken now so batching does not shift it
+        - logged: False to only count the event (see audit_policy.py)
+        """
+        if not self.running:
+            return False
+        row = (user_id, org_id, action, details, datetime.now(), logged)
+        self._count("submitted")
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow_policy == "block":
+            try:
+                self._queue.put(row, timeout=self.flush_interval)
+            except queue.Full:
+                self._count("dropped")
+        elif self.overflow_policy == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+                self._count("dropped")
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self._count("dropped")
+        elif self.overflow_policy == "sync":
+            self._flush([row])
+            self._count("sync_writes")
+        else:
+            self._count("dropped")
+        return True
+
+    def _flush(self, items: List[Tuple]):
+        if not items:
+            return
+        rows = [item[:5] for item in items if item[5]]
+        events = [(user_id, org_id, action, timestamp) for user_id, org_id, action, _, timestamp, logged in items if not logged]
+        try:
+            connection = self.connection_factory()
+            try:
+                write_audit_rows(connection, rows, events)
+            finally:
+                connection.close()
+            self._count("written", len(rows))
+            self._count("counted", len(events))
+            self._count("flushes")
+        except Exception as e:
+            # Don't let a logging failure kill the writer
+            self._count("failed", len(items))
+            print(f"Failed to flush {len(items)} audit log entries: {e}")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+        self._drain()
+
+    def _drain(self):
+        """Flush whatever is still queued"""
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+
+    def stats(self) -> dict:
+        """Queue depth and write counters"""
+        with self._lock:
+            return {"pending": self._queue.qsize(), "policy": self.overflow_policy, **self._metrics}
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+from datetime import date
+from typing import Optional
+
+import mysql.connector
+import numpy as np
+from dotenv import load_dotenv
+
+from date_ranges import add_months
+
+# Industry benchmarks for /api/benchmarks.
+#
+# A periodic job reads every organization's monthly emissions and energy from
+# MonthlyEmissionRollup in one query and stores, per (industry, month, metric),
+# the percentile grid p0..p100 across the industry's organizations. Serving "you
+# are in the Nth percentile" is then a primary-key lookup of one grid plus an
+# interpolation of the organization's own total, whatever the number of peers.
+# Industries with fewer than BENCHMARK_MIN_ORGS reporting organizations are not
+# served, so the grid never singles out a particular peer's figures.
+# Run from cron, e.g. nightly:
+#   python benchmarks.py
+
+METRICS = {"emissions": "co2_total", "energy": "energy_total"}
+PERCENTILES = np.arange(101)
+MIN_ORGS = int(os.getenv("BENCHMARK_MIN_ORGS", 5))
+
+BENCHMARK_DDL = """
+CREATE TABLE IF NOT EXISTS IndustryBenchmarks (
+    industry VARCHAR(100) NOT NULL,
+    month_start DATE NOT NULL,
+    metric VARCHAR(20) NOT NULL,
+    org_count INT NOT NULL,
+    p10 DOUBLE NOT NULL,
+    p50 DOUBLE NOT NULL,
+    p90 DOUBLE NOT NULL,
+    percentiles TEXT NOT NULL,
+    computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (industry, month_start, metric)
+)
+"""
+
+
+def ensure_benchmark_schema(connection):
+    """Create IndustryBenchmarks if it does not exist yet"""
+    cursor = connection.cursor()
+    cursor.execute(BENCHMARK_DDL)
+    connection.commit()
+    cursor.close()
+
+
+def compute_benchmarks(connection, months: int = 12, today: Optional[date] = None,
+                       snapshot: Optional[str] = None) -> int:
+    """
+    Recompute the percentile grids for the last `months` calendar months including
+    the current one (partial, but equally partial for every organization)
+    - snapshot: read monthly totals from this Parquet snapshot (see emissions_snapshot.py)
+      instead of MonthlyEmissionRollup
+    Returns the number of (industry, month, metric) grids stored
+    """
+    current = (today or date.today()).replace(day=1)
+    start = add_months(current, 1 - months)
+    cursor = connection.cursor()
+    if snapshot:
+        from emissions_snapshot import monthly_org_totals
+        cursor.execute("SELECT org_id, industry FROM Organizations WHERE industry IS NOT NULL AND industry <> ''")
+        industries = dict(cursor.fetchall())
+        rows = [
+            (industries[org_id], month_start, org_id, co2, energy)
+            for org_id, month_start, co2, energy in monthly_org_totals(snapshot, start, add_months(current, 1))
+            if org_id in industries
+        ]
+    else:
+        cursor.execute("""
+            SELECT o.industry, r.month_start, r.org_id, SUM(r.co2_total), SUM(r.energy_total)
+            FROM MonthlyEmissionRollup r
+            JOIN Organizations o ON r.org_id = o.org_id
+            WHERE o.industry IS NOT NULL AND o.industry <> ''
+            AND r.month_start >= %s AND r.month_start < %s
+            GROUP BY o.industry, r.month_start, r.org_id
+        """, (start, add_months(current, 1)))
+        rows = cursor.fetchall()
+    groups = {}
+    for industry, month_start, _, co2, energy in rows:
+        groups.setdefault((industry, month_start), []).append((float(co2), float(energy)))
+
+    rows = []
+    for (industry, month_start), values in groups.items():
+        totals = np.array(values)
+        for column, metric in enumerate(METRICS):
+            grid = np.percentile(totals[:, column], PERCENTILES)
+            rows.append((industry, month_start, metric, len(totals), float(grid[10]), float(grid[50]),
+                         float(grid[90]), json.dumps([round(float(v), 4) for v in grid])))
+    cursor.execute("DELETE FROM IndustryBenchmarks WHERE month_start >= %s", (start,))
+    if rows:
+        cursor.executemany("""
+            INSERT INTO IndustryBenchmarks
+                (industry, month_start, metric, org_count, p10, p50, p90, percentiles)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+    connection.commit()
+    cursor.close()
+    return len(rows)
+
+
+def percentile_rank(value: float, grid: list) -> float:
+    """Percentile (0-100) of a value within a p0..p100 grid, interpolated between grid points"""
+    grid = np.asarray(grid, dtype=float)
+    if value < grid[0]:
+        return 0.0
+    if value > grid[-1]:
+        return 100.0
+    # Ties (flat stretches of the grid) resolve to the middle of the stretch
+    low = np.searchsorted(grid, value, side="left")
+    high = np.searchsorted(grid, value, side="right")
+    if high > low:
+        return float(PERCENTILES[low:high].mean())
+    return float(np.interp(value, grid, PERCENTILES))
+
+
+def benchmark_plan(org_id: int, month_start: date):
+    """
+    Query plan (see query_plans.py) for the organization's position in its industry for one month
+    Returns None if the organization has no industry; metrics are None when it
+    reported nothing that month (the grids only cover reporting organizations) or
+    its industry has no stored benchmark for the month or too few organizations
+    """
+    org = yield """
+        SELECT o.industry,
+               SUM(r.co2_total) as emissions,
+               SUM(r.energy_total) as energy
+        FROM Organizations o
+        LEFT JOIN MonthlyEmissionRollup r ON r.org_id = o.org_id AND r.month_start = %s
+        WHERE o.org_id = %s
+        GROUP BY o.industry
+    """, (month_start, org_id)
+    if not org or not org[0]['industry']:
+        return None
+    org = org[0]
+    rows = yield """
+        SELECT metric, org_count, p10, p50, p90, percentiles
+        FROM IndustryBenchmarks
+        WHERE industry = %s AND month_start = %s
+    """, (org['industry'], month_start)
+    grids = {row['metric']: row for row in rows}
+
+    metrics = {}
+    for metric in METRICS:
+        row = grids.get(metric)
+        if org[metric] is None or row is None or row['org_count'] < MIN_ORGS:
+            metrics[metric] = None
+            continue
+        value = float(org[metric])
+        metrics[metric] = {
+            "value": round(value, 2),
+            "percentile": round(percentile_rank(value, json.loads(row['percentiles'])), 1),
+            "p10": round(float(row['p10']), 2),
+            "p50": round(float(row['p50']), 2),
+            "p90": round(float(row['p90']), 2),
+            "organizations": row['org_count']
+        }
+    return {"industry": org['industry'], "month": f"{month_start:%Y-%m}", "metrics": metrics}
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Recompute the per-industry percentile benchmarks")
+    parser.add_argument("--months", type=int, default=12, help="calendar months to recompute, including the current one")
+    parser.add_argument("--snapshot", default=None, help="read monthly totals from this Parquet snapshot directory")
+    args = parser.parse_args()
+
+    db = mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+    ensure_benchmark_schema(db)
+    print(f"✅ Stored {compute_benchmarks(db, args.months, snapshot=args.snapshot)} benchmark grids")
+    db.close()
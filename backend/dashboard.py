@@ -0,0 +1,166 @@
+from date_ranges import (
+    fill_buckets, month_range, month_to_date, period_range, previous_month_to_date,
+    range_condition, time_axis
+)
+from query_plans import first_row, run_plan
+
+# Dashboard aggregations shared by the individual /api/dashboard/* endpoints and
+# the combined /api/dashboard/bundle endpoint. Each *_plan is a query plan (see
+# query_plans.py) so the sync and async endpoints run the same SQL; the
+# compute_* wrappers run a plan on an open dictionary cursor.
+
+EMPTY_STATS = {
+    "total_emissions": 0,
+    "emission_reduction": 0,
+    "energy_usage": 0,
+    "offset_achieved": 0
+}
+
+
+def _period_rollup(filter: str):
+    """Rollup table, date condition and parameters for a daily / weekly / monthly filter"""
+    if filter in ("daily", "weekly"):
+        date_condition, date_params = range_condition("de.record_date", period_range(filter))
+        return "DailyEmissionRollup", date_condition, date_params
+    # monthly
+    date_condition, date_params = range_condition("de.month_start", month_range())
+    return "MonthlyEmissionRollup", date_condition, date_params
+
+
+def dashboard_stats_plan(org_id: int):
+    """
+    Current month-to-date totals, compared with the same days of last month
+    """
+    # Get current month's emissions (from 1st to today)
+    date_condition, date_params = range_condition("record_date", month_to_date())
+    current_month = first_row((yield f"""
+        SELECT COALESCE(SUM(co2_total), 0) as total_emissions,
+               COALESCE(SUM(energy_total), 0) as total_energy
+        FROM DailyEmissionRollup
+        WHERE org_id = %s
+        AND {date_condition}
+    """, [org_id] + date_params))
+
+    # Get last month's emissions for the same number of days
+    # For example, if today is Oct 29, compare with Sep 1-29
+    date_condition, date_params = range_condition("record_date", previous_month_to_date())
+    last_month = first_row((yield f"""
+        SELECT COALESCE(SUM(co2_total), 0) as total_emissions
+        FROM DailyEmissionRollup
+        WHERE org_id = %s
+        AND {date_condition}
+    """, [org_id] + date_params))
+
+    # Calculate reduction percentage
+    emission_reduction = 0
+    if last_month['total_emissions'] > 0:
+        emission_reduction = ((last_month['total_emissions'] - current_month['total_emissions'])
+                              / last_month['total_emissions'] * 100)
+
+    # Calculate offset (simplified - 10% of emissions for demo)
+    offset_achieved = current_month['total_emissions'] * 0.10
+
+    return {
+        "total_emissions": round(current_month['total_emissions'], 2),
+        "emission_reduction": round(emission_reduction, 2),
+        "energy_usage": round(current_month['total_energy'], 2),
+        "offset_achieved": round(offset_achieved, 2)
+    }
+
+
+def emissions_over_time_plan(org_id: int, filter: str):
+    """
+    Chart series for the filter: daily (last 30 days), weekly (last 10 weeks), monthly (this year)
+    """
+    # One indexed range scan over the rollups; empty buckets are filled in Python
+    bounds, buckets = time_axis(filter)
+    if filter in ("daily", "weekly"):
+        query = """
+        SELECT record_date as day, SUM(co2_total) as emissions
+        FROM DailyEmissionRollup
+        WHERE org_id = %s AND record_date >= %s AND record_date < %s
+        GROUP BY record_date
+        """
+    else:  # monthly
+        query = """
+        SELECT month_start as day, SUM(co2_total) as emissions
+        FROM MonthlyEmissionRollup
+        WHERE org_id = %s AND month_start >= %s AND month_start < %s
+        GROUP BY month_start
+        """
+    data = yield query, [org_id] + list(bounds)
+
+    return fill_buckets(filter, buckets, [(row['day'], row['emissions']) for row in data])
+
+
+def emission_breakdown_plan(org_id: int, filter: str):
+    """
+    Emissions per category for the current day / week / month, with percentages
+    """
+    rollup_table, date_condition, date_params = _period_rollup(filter)
+
+    # Get breakdown by category for current period
+    data = yield f"""
+        SELECT
+            COALESCE(ec.name, 'Unknown') as scope,
+            COALESCE(SUM(de.co2_total), 0) as total_emissions
+        FROM {rollup_table} de
+        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
+        WHERE de.org_id = %s
+        AND {date_condition}
+        GROUP BY ec.name
+        ORDER BY total_emissions DESC
+    """, [org_id] + date_params
+
+    # Calculate total for percentages
+    total = sum(row['total_emissions'] for row in data)
+
+    result = []
+    for row in data:
+        percentage = (row['total_emissions'] / total * 100) if total > 0 else 0
+        result.append({
+            "scope": row['scope'],
+            "emissions": round(row['total_emissions'], 2),
+            "percentage": round(percentage, 2)
+        })
+    return result
+
+
+def top_categories_plan(org_id: int, filter: str):
+    """
+    Top 3 categories for the current day / week / month
+    location_count is exact for a single day or month bucket; for the weekly
+    filter it is the most locations that reported on any one day of the week
+    """
+    rollup_table, date_condition, date_params = _period_rollup(filter)
+
+    data = yield f"""
+        SELECT
+            COALESCE(ec.name, 'Unknown') as category_name,
+            COALESCE(SUM(de.co2_total), 0) as total_emissions,
+            MAX(de.location_count) as location_count
+        FROM {rollup_table} de
+        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
+        WHERE de.org_id = %s
+        AND {date_condition}
+        GROUP BY ec.category_id, ec.name
+        ORDER BY total_emissions DESC
+        LIMIT 3
+    """, [org_id] + date_params
+    return data
+
+
+def compute_dashboard_stats(cursor, org_id: int) -> dict:
+    return run_plan(cursor, dashboard_stats_plan(org_id))
+
+
+def compute_emissions_over_time(cursor, org_id: int, filter: str) -> list:
+    return run_plan(cursor, emissions_over_time_plan(org_id, filter))
+
+
+def compute_emission_breakdown(cursor, org_id: int, filter: str) -> list:
+    return run_plan(cursor, emission_breakdown_plan(org_id, filter))
+
+
+def compute_top_categories(cursor, org_id: int, filter: str) -> list:
+    return run_plan(cursor, top_categories_plan(org_id, filter))
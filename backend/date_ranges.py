@@ -0,0 +1,160 @@
+import calendar
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+# Half-open [start, end) date bounds for DailyEmissions-style queries.
+# Filtering with "record_date >= start AND record_date < end" keeps the column
+# bare, so MySQL can range-scan an index on (org_id, record_date, ...) instead of
+# evaluating MONTH()/YEARWEEK()/DATE() on every row.
+
+DateRange = Tuple[date, date]
+
+# Composite indexes the range predicates are written against
+RECOMMENDED_INDEXES = [
+    ("DailyEmissions", "idx_de_org_date_cat", "(org_id, record_date, category_id)"),
+    ("DailyEmissions", "idx_de_org_loc_date", "(org_id, location_id, record_date)"),
+]
+
+
+def _today(today: Optional[date]) -> date:
+    return today or date.today()
+
+
+def add_months(day: date, months: int) -> date:
+    """Shift a date by whole months, clamping the day like MySQL's DATE_ADD/DATE_SUB"""
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    month += 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def day_range(today: Optional[date] = None) -> DateRange:
+    """Today only"""
+    today = _today(today)
+    return today, today + timedelta(days=1)
+
+
+def week_range(today: Optional[date] = None) -> DateRange:
+    """Current ISO week (Monday to Sunday), same as YEARWEEK(..., 1)"""
+    today = _today(today)
+    start = today - timedelta(days=today.weekday())
+    return start, start + timedelta(days=7)
+
+
+def month_range(today: Optional[date] = None) -> DateRange:
+    """Current calendar month"""
+    today = _today(today)
+    start = today.replace(day=1)
+    return start, add_months(start, 1)
+
+
+def month_to_date(today: Optional[date] = None) -> DateRange:
+    """From the 1st of the current month through today"""
+    today = _today(today)
+    return today.replace(day=1), today + timedelta(days=1)
+
+
+def previous_month_to_date(today: Optional[date] = None) -> DateRange:
+    """
+    Same days of last month as month_to_date covers this month
+    (e.g. on Oct 29 this is Sep 1-29; on Mar 31 it stops at the end of February)
+    """
+    today = _today(today)
+    this_month = today.replace(day=1)
+    start = add_months(this_month, -1)
+    return start, min(start + timedelta(days=today.day), this_month)
+
+
+def year_range(today: Optional[date] = None) -> DateRange:
+    """Current calendar year"""
+    today = _today(today)
+    return date(today.year, 1, 1), date(today.year + 1, 1, 1)
+
+
+def trailing_days(days: int, today: Optional[date] = None) -> DateRange:
+    """The last `days` days up to and including today (DATE_SUB(CURDATE(), INTERVAL n DAY) onwards)"""
+    today = _today(today)
+    return today - timedelta(days=days), today + timedelta(days=1)
+
+
+def trailing_months(months: int, today: Optional[date] = None) -> DateRange:
+    """Everything since the same day `months` months ago, up to and including today"""
+    today = _today(today)
+    return add_months(today, -months), today + timedelta(days=1)
+
+
+def period_range(filter: str, today: Optional[date] = None) -> DateRange:
+    """Map a dashboard filter (daily / weekly / monthly) to its current period"""
+    if filter == "daily":
+        return day_range(today)
+    if filter == "weekly":
+        return week_range(today)
+    return month_range(today)
+
+
+def range_condition(column: str, bounds: DateRange) -> Tuple[str, List[date]]:
+    """SQL fragment and parameters for a half-open range on `column`"""
+    return f"{column} >= %s AND {column} < %s", [bounds[0], bounds[1]]
+
+
+def ensure_recommended_indexes(connection):
+    """Create any of RECOMMENDED_INDEXES that do not exist yet"""
+    cursor = connection.cursor()
+    for table, name, columns in RECOMMENDED_INDEXES:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (table, name))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"CREATE INDEX {name} ON {table} {columns}")
+    connection.commit()
+    cursor.close()
+
+
+def _mysql_week_label(day: date) -> int:
+    """WEEK(day, 1): ISO week number, but 0 for days before week 1 and 53 for days after the last week"""
+    iso_year, iso_week, _ = day.isocalendar()
+    if iso_year < day.year:
+        return 0
+    if iso_year > day.year:
+        return 53
+    return iso_week
+
+
+def bucket_start(filter: str, day: date) -> date:
+    """First day of the daily / weekly (ISO) / monthly bucket containing `day`"""
+    if filter == "daily":
+        return day
+    if filter == "weekly":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def time_axis(filter: str, today: Optional[date] = None) -> Tuple[DateRange, List[Tuple[date, str]]]:
+    """
+    Buckets for the emissions-over-time chart, as (bounds, [(bucket_start, label), ...])
+    - daily: the last 30 days, labelled "05 Oct"
+    - weekly: the last 10 ISO weeks, labelled "W42"
+    - monthly: the 12 months of the current year, labelled "Oct"
+    """
+    today = _today(today)
+    if filter == "daily":
+        days = [today - timedelta(days=offset) for offset in range(29, -1, -1)]
+        buckets = [(day, day.strftime('%d %b')) for day in days]
+        return (days[0], today + timedelta(days=1)), buckets
+    if filter == "weekly":
+        days = [today - timedelta(weeks=offset) for offset in range(9, -1, -1)]
+        buckets = [(bucket_start("weekly", day), f"W{_mysql_week_label(day)}") for day in days]
+        return (buckets[0][0], buckets[-1][0] + timedelta(days=7)), buckets
+    months = [date(today.year, month, 1) for month in range(1, 13)]
+    return year_range(today), [(month, month.strftime('%b')) for month in months]
+
+
+def fill_buckets(filter: str, buckets: List[Tuple[date, str]], rows) -> List[dict]:
+    """
+    Sum sparse (day, value) rows into the axis from time_axis, filling empty buckets with 0
+    """
+    totals = {}
+    for day, value in rows:
+        start = bucket_start(filter, day)
+        totals[start] = totals.get(start, 0) + value
+    return [{"month": label, "emissions": round(totals.get(start, 0), 2)} for start, label in buckets]
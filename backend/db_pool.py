@@ -0,0 +1,269 @@
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+import mysql.connector
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+# Put on the idle queue when a connection is discarded, so a checkout waiting for
+# an idle connection wakes up and opens a replacement in the freed slot
+_SLOT_FREED = (None, 0.0)
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a mysql.connector connection checked out from a ConnectionPool
+    Behaves like the raw connection, except close() hands it back to the pool
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise mysql.connector.errors.OperationalError("Connection already returned to the pool")
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def __del__(self):
+        # Handlers that return early without close() still give the connection back
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of MySQL connections
+    - size: maximum number of open connections
+    - checkout_timeout: seconds to wait for a free connection before PoolExhaustedError
+    - health_check_interval: connections idle longer than this are pinged before reuse
+    - connect_args: keyword arguments passed to mysql.connector.connect
+    """
+
+    def __init__(self, size: int, checkout_timeout: float, health_check_interval: float, **connect_args):
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._connect_args = connect_args
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._metrics = {
+            "checkouts": 0,
+            "connections_opened": 0,
+            "connections_discarded": 0,
+            "health_check_failures": 0,
+            "exhausted": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    def _open(self):
+        raw = mysql.connector.connect(**self._connect_args)
+        with self._lock:
+            self._metrics["connections_opened"] += 1
+        return raw
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+            self._metrics["connections_discarded"] += 1
+
+    def _is_healthy(self, raw, idle_since: float) -> bool:
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._lock:
+                self._metrics["health_check_failures"] += 1
+            return False
+
+    def acquire(self) -> PooledConnection:
+        """
+        Check out a connection, opening a new one while the pool is below its size
+        Blocks up to checkout_timeout seconds when every connection is in use
+        """
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+
+        while True:
+            try:
+                raw, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                raw = None
+                with self._lock:
+                    can_open = self._created < self.size
+                    if can_open:
+                        self._created += 1
+                if can_open:
+                    try:
+                        raw = self._open()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    idle_since = time.monotonic()
+                else:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining <= 0:
+                            raise queue.Empty
+                        raw, idle_since = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        with self._lock:
+                            self._metrics["exhausted"] += 1
+                        raise PoolExhaustedError(
+                            f"No database connection available after {self.checkout_timeout}s "
+                            f"(pool size {self.size})"
+                        )
+
+            if raw is None:
+                # A discarded connection freed its slot; open a replacement (or take an idle one)
+                continue
+
+            if not self._is_healthy(raw, idle_since):
+                self._discard(raw)
+                continue
+
+            waited_ms = (time.monotonic() - started) * 1000
+            with self._lock:
+                self._in_use += 1
+                self._metrics["checkouts"] += 1
+                self._metrics["total_wait_ms"] += waited_ms
+                self._metrics["max_wait_ms"] = max(self._metrics["max_wait_ms"], waited_ms)
+            return PooledConnection(self, raw)
+
+    def release(self, raw):
+        """
+        Return a connection to the pool
+        Any open transaction is rolled back so the next user starts from a clean snapshot
+        """
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if raw.unread_result or raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            self._idle.put(_SLOT_FREED)
+            return
+        self._idle.put((raw, time.monotonic()))
+
+    def stats(self) -> dict:
+        """Snapshot of pool occupancy and checkout metrics"""
+        with self._lock:
+            checkouts = self._metrics["checkouts"]
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                **self._metrics,
+                "avg_wait_ms": round(self._metrics["total_wait_ms"] / checkouts, 3) if checkouts else 0.0,
+                "total_wait_ms": round(self._metrics["total_wait_ms"], 3),
+                "max_wait_ms": round(self._metrics["max_wait_ms"], 3),
+            }
+
+    def close_all(self):
+        """Close every idle connection (checked-out connections are closed on release)"""
+        while True:
+            try:
+                raw, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if raw is not None:
+                self._discard(raw)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process-wide pool, creating it from environment variables on first use
+    - DB_POOL_SIZE: maximum open connections (default 10)
+    - DB_POOL_TIMEOUT: checkout timeout in seconds (default 5)
+    - DB_POOL_HEALTHCHECK_INTERVAL: idle seconds before a connection is pinged (default 30)
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    size=int(os.getenv("DB_POOL_SIZE", 10)),
+                    checkout_timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+                    health_check_interval=float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", 30)),
+                    host=os.getenv("DB_HOST"),
+                    port=int(os.getenv("DB_PORT", 3306)),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    database=os.getenv("DB_NAME"),
+                )
+    return _pool
+
+
+_export_pool: Optional[ConnectionPool] = None
+
+
+def get_export_pool() -> ConnectionPool:
+    """
+    Return the pool for streaming exports, creating it on first use
+    An export holds its connection for the whole download, so exports get their
+    own small pool and can never starve the request pool
+    - EXPORT_MAX_CONCURRENT: exports streaming at once (default 4)
+    - EXPORT_POOL_TIMEOUT: seconds to wait for a free export slot (default 1)
+    """
+    global _export_pool
+    if _export_pool is None:
+        with _pool_lock:
+            if _export_pool is None:
+                _export_pool = ConnectionPool(
+                    size=int(os.getenv("EXPORT_MAX_CONCURRENT", 4)),
+                    checkout_timeout=float(os.getenv("EXPORT_POOL_TIMEOUT", 1)),
+                    health_check_interval=float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", 30)),
+                    host=os.getenv("DB_HOST"),
+                    port=int(os.getenv("DB_PORT", 3306)),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    database=os.getenv("DB_NAME"),
+                )
+    return _export_pool
+
+
+def close_pool():
+    """Close the process-wide pools (used on application shutdown)"""
+    global _pool, _export_pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+        if _export_pool is not None:
+            _export_pool.close_all()
+            _export_pool = None
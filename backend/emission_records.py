@@ -0,0 +1,211 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from date_ranges import range_condition
+
+# Helpers for /api/emission-data/records: the filtered DailyEmissions rows are
+# aggregated once per (day, category) and every view of them (summary,
+# time series, category breakdown) is derived from that single result in Python.
+
+
+def parse_date(value: str) -> date:
+    """Parse a YYYY-MM-DD query parameter"""
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_id_list(value: Optional[str]) -> List[int]:
+    """Parse a comma-separated list of IDs, ignoring blanks"""
+    if not value:
+        return []
+    return [int(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def default_date_range(start_date: Optional[str], end_date: Optional[str], today: Optional[date] = None) -> Tuple[date, date]:
+    """Resolve the requested range, defaulting to the last 30 days"""
+    today = today or date.today()
+    start = parse_date(start_date) if start_date else today - timedelta(days=30)
+    end = parse_date(end_date) if end_date else today
+    return start, end
+
+
+def previous_period(start: date, end: date) -> Tuple[date, date]:
+    """Half-open range of the same length immediately before [start, end]"""
+    return start - timedelta(days=(end - start).days + 1), start
+
+
+def build_record_filters(org_id: int, start: date, end: date, location_list: List[int], category_list: List[int]):
+    """WHERE clause and parameters for the filtered DailyEmissions row set (alias de)"""
+    date_condition, date_params = range_condition("de.record_date", (start, end + timedelta(days=1)))
+    where_conditions = ["de.org_id = %s", date_condition]
+    params = [org_id] + date_params
+
+    if location_list:
+        placeholders = ','.join(['%s'] * len(location_list))
+        where_conditions.append(f"de.location_id IN ({placeholders})")
+        params.extend(location_list)
+
+    if category_list:
+        placeholders = ','.join(['%s'] * len(category_list))
+        where_conditions.append(f"de.category_id IN ({placeholders})")
+        params.extend(category_list)
+
+    return " AND ".join(where_conditions), params
+
+
+def period_aggregates_plan(org_id: int, where_clause: str, params: list, prev_range: Tuple[date, date]):
+    """
+    Single round-trip for the filtered period and the comparison period
+    Returns (rows, prev_emissions) where rows are per (day, category) sums of the
+    filtered set; the previous period covers the whole org, as it always has
+    """
+    result = yield f"""
+        SELECT 'current' as part,
+               de.record_date as date,
+               COALESCE(ec.name, 'Unknown') as category,
+               ec.category_id,
+               COALESCE(SUM(de.co2_emitted), 0) as value,
+               COUNT(*) as row_count
+        FROM DailyEmissions de
+        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
+        WHERE {where_clause}
+        GROUP BY de.record_date, ec.category_id, ec.name
+        UNION ALL
+        SELECT 'previous', NULL, NULL, NULL, COALESCE(SUM(de.co2_emitted), 0), COUNT(*)
+        FROM DailyEmissions de
+        WHERE de.org_id = %s AND de.record_date >= %s AND de.record_date < %s
+    """, list(params) + [org_id, prev_range[0], prev_range[1]]
+
+    rows = []
+    prev_emissions = 0
+    for row in result:
+        if row['part'] == 'previous':
+            prev_emissions = row['value']
+        else:
+            rows.append(row)
+    return rows, prev_emissions
+
+
+def summarize_rows(rows: list, prev_emissions) -> dict:
+    """Derive summary, per-day-per-category series and category breakdown from the aggregate rows"""
+    total_emissions = sum(row['value'] for row in rows)
+    row_count = sum(row['row_count'] for row in rows)
+    average_per_row = total_emissions / row_count if row_count else 0
+
+    change_from_last_period = 0
+    if prev_emissions > 0:
+        change_from_last_period = (total_emissions - prev_emissions) / prev_emissions * 100
+
+    series = sorted(rows, key=lambda row: (row['date'], row['category']))
+
+    breakdown = {}
+    for row in rows:
+        key = (row['category_id'], row['category'])
+        breakdown[key] = breakdown.get(key, 0) + row['value']
+
+    return {
+        "summary": {
+            "total_emissions": round(total_emissions, 2),
+            "average_per_day": round(average_per_row, 2),
+            "change_from_last_period": round(change_from_last_period, 2)
+        },
+        "emissions_over_time": [
+            {
+                "date": str(row['date']),
+                "category": row['category'],
+                "category_id": row['category_id'],
+                "value": round(row['value'], 2)
+            } for row in series
+        ],
+        "category_breakdown": [
+            {
+                "category": category,
+                "category_id": category_id,
+                "value": round(value, 2)
+            } for (category_id, category), value in sorted(breakdown.items(), key=lambda item: item[1], reverse=True)
+        ]
+    }
+
+
+def filter_options_plan(org_id: int):
+    """Locations of the organization and all emission categories, in one round-trip"""
+    result = yield """
+        SELECT 'location' as kind, location_id as id, name
+        FROM Locations
+        WHERE org_id = %s
+        UNION ALL
+        SELECT 'category', category_id, name
+        FROM EmissionCategories
+        ORDER BY kind, name ASC
+    """, (org_id,)
+    locations, categories = [], []
+    for row in result:
+        if row['kind'] == 'location':
+            locations.append({"location_id": row['id'], "name": row['name']})
+        else:
+            categories.append({"category_id": row['id'], "name": row['name']})
+    return locations, categories
+
+
+def emission_records_plan(org_id: int, start: date, end: date, location_list: List[int], category_list: List[int]):
+    """
+    Full /api/emission-data/records payload (without "success") in three round-trips
+    """
+    # Scan the filtered rows once; summary, time series and breakdown are derived from it
+    where_clause, params = build_record_filters(org_id, start, end, location_list, category_list)
+    aggregate_rows, prev_emissions = yield from period_aggregates_plan(
+        org_id, where_clause, params, previous_period(start, end)
+    )
+    payload = summarize_rows(aggregate_rows, prev_emissions)
+
+    # Get detailed emission records (Recent Emissions - NOT filtered, always show latest 50)
+    records = yield """
+        SELECT
+            de.emission_id as id,
+            DATE_FORMAT(de.record_date, '%Y-%m-%d') as date,
+            COALESCE(ec.name, 'Unknown') as category,
+            COALESCE(l.name, 'Unknown') as source,
+            de.co2_emitted as value,
+            'kg CO2' as unit
+        FROM DailyEmissions de
+        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
+        LEFT JOIN Locations l ON de.location_id = l.location_id
+        WHERE de.org_id = %s
+        ORDER BY de.record_date DESC, de.emission_id DESC
+        LIMIT 50
+    """, (org_id,)
+    payload["records"] = [
+        {
+            "id": row['id'],
+            "date": row['date'],
+            "category": row['category'],
+            "source": row['source'],
+            "value": round(row['value'], 2),
+            "unit": row['unit']
+        } for row in records
+    ]
+
+    # Get available locations for this organization (for dropdown) and all categories (for multi-select)
+    payload["locations"], payload["categories"] = yield from filter_options_plan(org_id)
+    return payload
+
+
+def export_query(org_id: int, start: date, end: date, location_list: List[int], category_list: List[int]):
+    """SQL and parameters for /api/emission-data/export: every filtered row, oldest first"""
+    where_clause, params = build_record_filters(org_id, start, end, location_list, category_list)
+    sql = f"""
+        SELECT
+            de.emission_id,
+            de.record_date,
+            de.location_id,
+            COALESCE(l.name, 'Unknown') as location,
+            de.category_id,
+            COALESCE(ec.name, 'Unknown') as category,
+            de.co2_emitted,
+            de.energy_consumed
+        FROM DailyEmissions de
+        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
+        LEFT JOIN Locations l ON de.location_id = l.location_id
+        WHERE {where_clause}
+        ORDER BY de.record_date, de.emission_id
+    """
+    return sql, params
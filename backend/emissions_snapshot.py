@@ -0,0 +1,195 @@
+import argparse
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional, Sequence
+
+import mysql.connector
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from exports import stream_query
+
+# Columnar snapshot of DailyEmissions for the batch analytics.
+#
+# DailyEmissions is exported to Parquet on local disk, one directory per day
+# (<dir>/record_date=YYYY-MM-DD/part-0.parquet), and appended to day by day:
+# each run exports the days after the newest one present, plus SNAPSHOT_REFRESH_DAYS
+# recent days again to pick up late loads. The batch jobs (forecast_batch.py,
+# anomalies.py, benchmarks.py) can read their bulk numeric data from here instead
+# of MySQL with --snapshot: the files are memory-mapped and filtered by day and
+# organization through pyarrow, and aggregated with pandas, so the OLTP database
+# only serves the small lookups (versions, industries, watermarks).
+# Run from cron before the batch jobs, e.g.:
+#   python emissions_snapshot.py
+
+SNAPSHOT_DIR = os.getenv("EMISSIONS_SNAPSHOT_DIR", "emissions_snapshot")
+SNAPSHOT_REFRESH_DAYS = int(os.getenv("SNAPSHOT_REFRESH_DAYS", 3))
+
+SCHEMA = pa.schema([
+    ("emission_id", pa.int64()),
+    ("org_id", pa.int32()),
+    ("location_id", pa.int32()),
+    ("category_id", pa.int32()),
+    ("co2_emitted", pa.float64()),
+    ("energy_consumed", pa.float64()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("record_date", pa.date32())]), flavor="hive")
+
+
+def day_directory(directory: str, day: date) -> str:
+    return os.path.join(directory, f"record_date={day.isoformat()}")
+
+
+def snapshot_days(directory: str) -> List[date]:
+    """Days present in the snapshot, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    days = []
+    for name in os.listdir(directory):
+        if name.startswith("record_date=") and os.path.exists(os.path.join(directory, name, "part-0.parquet")):
+            days.append(datetime.strptime(name.split("=", 1)[1], "%Y-%m-%d").date())
+    return sorted(days)
+
+
+def export_day(connection, directory: str, day: date, chunk_size: int = 50000) -> int:
+    """
+    Write one day of DailyEmissions to its partition, replacing any previous copy
+    The file is written under a temporary name and renamed once complete; a day
+    without rows still gets an (empty) file so it counts as exported
+    Returns the number of rows written
+    """
+    target = day_directory(directory, day)
+    os.makedirs(target, exist_ok=True)
+    path = os.path.join(target, "part-0.parquet")
+    # Dot-prefixed, so readers never pick up a half-written file
+    partial = os.path.join(target, ".part-0.parquet.tmp")
+    chunks = stream_query(connection, f"""
+        SELECT {", ".join(SCHEMA.names)}
+        FROM DailyEmissions
+        WHERE record_date = %s
+        ORDER BY org_id, location_id, category_id
+    """, (day,), chunk_size)
+    next(chunks)
+    rows = 0
+    with pq.ParquetWriter(partial, SCHEMA, compression="zstd") as writer:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, SCHEMA)], schema=SCHEMA
+            ))
+            rows += len(chunk)
+    os.replace(partial, path)
+    return rows
+
+
+def update_snapshot(connection_factory: Callable, directory: str = SNAPSHOT_DIR, through: Optional[date] = None,
+                    start: Optional[date] = None, refresh_days: int = SNAPSHOT_REFRESH_DAYS) -> dict:
+    """
+    Export the days after the newest one in the snapshot through `through` (default
+    yesterday), re-exporting the last `refresh_days` of those already present;
+    `start` forces a re-export from that day. An empty snapshot starts at the first
+    day in DailyEmissions
+    Returns {day: rows written}
+    """
+    through = through or date.today() - timedelta(days=1)
+    if start is None:
+        existing = snapshot_days(directory)
+        if existing:
+            start = existing[-1] + timedelta(days=1) - timedelta(days=refresh_days)
+        else:
+            connection = connection_factory()
+            cursor = connection.cursor()
+            cursor.execute("SELECT MIN(record_date) FROM DailyEmissions")
+            start = cursor.fetchone()[0] or through + timedelta(days=1)
+            cursor.close()
+            connection.close()
+    written = {}
+    day = start
+    while day <= through:
+        # stream_query closes the connection it is given when the day is done
+        written[day] = export_day(connection_factory(), directory, day)
+        day += timedelta(days=1)
+    return written
+
+
+def drop_days_before(directory: str, day: date) -> int:
+    """Remove snapshot partitions older than `day`; returns the number removed"""
+    removed = 0
+    for old in snapshot_days(directory):
+        if old < day:
+            shutil.rmtree(day_directory(directory, old))
+            removed += 1
+    return removed
+
+
+def read_emissions(directory: str, start: date, end: date, columns: Sequence[str],
+                   org_ids: Optional[Sequence[int]] = None) -> pd.DataFrame:
+    """
+    DailyEmissions rows with record_date in [start, end) as a DataFrame of `columns`
+    (record_date may be one of them), optionally for some organizations only
+    Only the partitions in the range are opened, memory-mapped
+    The aggregate helpers below return plain Python values, ready to use as query parameters
+    """
+    dataset = ds.dataset(directory, format="parquet", partitioning=PARTITIONING,
+                         filesystem=pafs.LocalFileSystem(use_mmap=True))
+    condition = (ds.field("record_date") >= start) & (ds.field("record_date") < end)
+    if org_ids is not None:
+        condition &= ds.field("org_id").isin(list(org_ids))
+    return dataset.to_table(columns=list(columns), filter=condition).to_pandas()
+
+
+def daily_org_totals(directory: str, start: date, end: date) -> list:
+    """(org_id, record_date, co2, energy) per organization and day, like a GROUP BY org_id, record_date"""
+    frame = read_emissions(directory, start, end, ["org_id", "record_date", "co2_emitted", "energy_consumed"])
+    totals = frame.groupby(["org_id", "record_date"], as_index=False)[["co2_emitted", "energy_consumed"]].sum()
+    return [(int(org_id), day, float(co2), float(energy)) for org_id, day, co2, energy in totals.itertuples(index=False)]
+
+
+def location_category_daily(directory: str, org_id: int, start: date, end: date) -> list:
+    """(location_id, category_id, record_date, co2) for one organization, like anomalies.scan_org's query"""
+    frame = read_emissions(directory, start, end, ["location_id", "category_id", "record_date", "co2_emitted"],
+                           org_ids=[org_id])
+    totals = frame.groupby(["location_id", "category_id", "record_date"], as_index=False)["co2_emitted"].sum()
+    return [(int(location_id), int(category_id), day, float(co2))
+            for location_id, category_id, day, co2 in totals.itertuples(index=False)]
+
+
+def monthly_org_totals(directory: str, start: date, end: date) -> list:
+    """(org_id, month_start, co2, energy) per organization and calendar month"""
+    frame = read_emissions(directory, start, end, ["org_id", "record_date", "co2_emitted", "energy_consumed"])
+    frame["month_start"] = [day.replace(day=1) for day in frame["record_date"]]
+    totals = frame.groupby(["org_id", "month_start"], as_index=False)[["co2_emitted", "energy_consumed"]].sum()
+    return [(int(org_id), month, float(co2), float(energy)) for org_id, month, co2, energy in totals.itertuples(index=False)]
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Append new days of DailyEmissions to the Parquet snapshot")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="snapshot directory (default: EMISSIONS_SNAPSHOT_DIR)")
+    parser.add_argument("--start", help="re-export from this day (YYYY-MM-DD)")
+    parser.add_argument("--refresh-days", type=int, default=SNAPSHOT_REFRESH_DAYS,
+                        help="recent days to export again for late loads")
+    parser.add_argument("--keep-days", type=int, default=None, help="drop partitions older than this many days")
+    args = parser.parse_args()
+
+    def connect():
+        return mysql.connector.connect(
+            host=os.getenv("DB_HOST"),
+            port=int(os.getenv("DB_PORT", 3306)),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            database=os.getenv("DB_NAME"),
+        )
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else None
+    written = update_snapshot(connect, args.dir, start=start, refresh_days=args.refresh_days)
+    print(f"✅ Exported {len(written)} days ({sum(written.values())} rows) to {args.dir}")
+    if args.keep_days:
+        removed = drop_days_before(args.dir, date.today() - timedelta(days=args.keep_days))
+        print(f"✅ Dropped {removed} days older than {args.keep_days} days")
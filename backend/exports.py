@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator, Sequence
+
+# Streaming exports: rows are read from an unbuffered (server-side) cursor with
+# fetchmany and encoded chunk by chunk, so an export never holds more than one
+# chunk of rows in memory however large the result is.
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def stream_query(connection, sql: str, params: Sequence, chunk_size: int = 5000) -> Iterator:
+    """
+    Execute a query now and return an iterator over its results: first the list
+    of column names, then lists of at most chunk_size rows
+    Executing up front means SQL errors surface before a response is started.
+    The connection is closed (returned to the pool) when the iterator finishes
+    or is closed, or if the query fails
+    """
+    try:
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+    except Exception:
+        connection.close()
+        raise
+
+    def chunks():
+        try:
+            yield [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                # Rows left unread (client gone, encoding failed): the connection
+                # is closed below either way, and the pool discards it
+                pass
+            finally:
+                connection.close()
+
+    return chunks()
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def encode_csv(chunks: Iterator) -> Iterator[str]:
+    """CSV text: a header line from the first chunk (column names), then one piece per chunk of rows"""
+    columns = next(chunks, None)
+    if columns is None:
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows([[_plain(value) for value in row] for row in rows])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_ndjson(chunks: Iterator) -> Iterator[str]:
+    """One JSON object per line, keyed by the column names from the first chunk"""
+    columns = next(chunks, None)
+    if columns is None:
+        return
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(columns, [_plain(value) for value in row]))) + "\n" for row in rows
+        )
+
+
+def encode_export(export_format: str, chunks: Iterator) -> Iterator[str]:
+    if export_format == "csv":
+        return encode_csv(chunks)
+    return encode_ndjson(chunks)
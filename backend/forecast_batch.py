@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+import mysql.connector
+import numpy as np
+from dotenv import load_dotenv
+
+from forecasting import HISTORY_DAYS, Forecast, fill_daily, forecast_series, model_name
+
+# Precomputed forecasts for the AI-insights endpoints.
+#
+# A nightly batch reads every organization's daily series in one query, fits the
+# forecast model for each (organization, metric) in a process pool and stores the
+# result in ForecastResults. A row is valid for the day it forecasts from
+# (forecast_start) and only while the organization's RollupVersions version is the
+# one it was fitted on, so data loaded after the run makes the endpoints fall back
+# to fitting on demand instead of serving a stale forecast. Run from cron after
+# midnight, e.g.:
+#   python forecast_batch.py
+
+# Days stored per forecast: enough for the rest of this month plus three more
+FORECAST_HORIZON_DAYS = 124
+
+METRICS = {"emissions": "co2_total", "energy": "energy_total"}
+
+FORECAST_RESULTS_DDL = """
+CREATE TABLE IF NOT EXISTS ForecastResults (
+    org_id INT NOT NULL,
+    metric VARCHAR(20) NOT NULL,
+    model VARCHAR(40) NOT NULL,
+    forecast_start DATE NOT NULL,
+    history_start DATE NOT NULL,
+    data_version BIGINT NOT NULL,
+    mean LONGTEXT NOT NULL,
+    std LONGTEXT NOT NULL,
+    fitted LONGTEXT NOT NULL,
+    computed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (org_id, metric, model)
+)
+"""
+
+
+def ensure_forecast_schema(connection):
+    """Create ForecastResults if it does not exist yet"""
+    cursor = connection.cursor()
+    cursor.execute(FORECAST_RESULTS_DDL)
+    connection.commit()
+    cursor.close()
+
+
+def _encode(values: np.ndarray) -> str:
+    """JSON list rounded to 4 decimals; NaN (no fitted value) as null"""
+    return json.dumps([None if np.isnan(v) else round(float(v), 4) for v in values])
+
+
+def _decode(text: str) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in json.loads(text)], dtype=float)
+
+
+def _fit(task: Tuple[int, str, np.ndarray, str, int]) -> Tuple[int, str, str, str, str]:
+    """Process pool worker: (org_id, metric, series, model, horizon) -> encoded forecast"""
+    org_id, metric, y, name, horizon = task
+    forecast, fitted = forecast_series(y, horizon, name)
+    return org_id, metric, _encode(forecast.mean), _encode(forecast.std), _encode(fitted)
+
+
+def refit_all(connection, today: Optional[date] = None, workers: Optional[int] = None,
+              name: Optional[str] = None, horizon: int = FORECAST_HORIZON_DAYS,
+              snapshot: Optional[str] = None) -> int:
+    """
+    Fit forecasts from `today` for every organization and metric and store them
+    The series cover the HISTORY_DAYS days before today (today itself is partial),
+    the same window the endpoints fit on demand. Versions are read before the series
+    so a refresh racing the batch leaves its rows stale rather than wrongly current
+    - snapshot: read the series from this Parquet snapshot (see emissions_snapshot.py)
+      instead of DailyEmissionRollup. The rows are stamped with the live versions, so
+      a snapshot that does not reach yesterday is not used: its missing days would be
+      zero-filled and served as current. The series are read from MySQL instead
+    Returns the number of forecasts stored
+    """
+    today = today or date.today()
+    name = model_name(name)
+    start = today - timedelta(days=HISTORY_DAYS)
+    cursor = connection.cursor()
+    cursor.execute("SELECT org_id, version FROM RollupVersions")
+    versions = dict(cursor.fetchall())
+    if snapshot:
+        from emissions_snapshot import daily_org_totals, snapshot_days
+        days = snapshot_days(snapshot)
+        if not days or days[-1] < today - timedelta(days=1):
+            print(f"Snapshot {snapshot} does not reach {today - timedelta(days=1)}; reading DailyEmissionRollup instead")
+            snapshot = None
+    if snapshot:
+        rows = daily_org_totals(snapshot, start, today)
+    else:
+        cursor.execute("""
+            SELECT org_id, record_date, SUM(co2_total), SUM(energy_total)
+            FROM DailyEmissionRollup
+            WHERE record_date >= %s AND record_date < %s
+            GROUP BY org_id, record_date
+        """, (start, today))
+        rows = cursor.fetchall()
+    series = {}
+    for org_id, day, co2, energy in rows:
+        org_series = series.setdefault(org_id, {"emissions": [], "energy": []})
+        org_series["emissions"].append((day, co2))
+        org_series["energy"].append((day, energy))
+
+    tasks = [
+        (org_id, metric, fill_daily(rows[metric], start, today), name, horizon)
+        for org_id, rows in series.items() for metric in METRICS
+    ]
+    stored = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_fit, tasks, chunksize=max(len(tasks) // ((workers or os.cpu_count() or 1) * 4), 1)))
+    for first in range(0, len(results), 500):
+        batch = results[first:first + 500]
+        cursor.executemany("""
+            INSERT INTO ForecastResults
+                (org_id, metric, model, forecast_start, history_start, data_version, mean, std, fitted)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                forecast_start = VALUES(forecast_start), history_start = VALUES(history_start),
+                data_version = VALUES(data_version), mean = VALUES(mean), std = VALUES(std),
+                fitted = VALUES(fitted)
+        """, [
+            (org_id, metric, name, today, start, versions.get(org_id, 0), mean, std, fitted)
+            for org_id, metric, mean, std, fitted in batch
+        ])
+        connection.commit()
+        stored += len(batch)
+    cursor.close()
+    return stored
+
+
+def stored_forecasts_plan(org_id: int, today: date, start: date):
+    """
+    Query plan (see query_plans.py) for the organization's precomputed forecasts
+    Returns {metric: (Forecast, fitted)} for rows fitted from `today` on the history
+    starting at `start` with the current model and data version; missing metrics
+    are left out (the caller fits them on demand)
+    """
+    rows = yield """
+        SELECT fr.metric, fr.data_version, fr.mean, fr.std, fr.fitted, COALESCE(rv.version, 0) as current_version
+        FROM ForecastResults fr
+        LEFT JOIN RollupVersions rv ON rv.org_id = fr.org_id
+        WHERE fr.org_id = %s AND fr.model = %s AND fr.forecast_start = %s AND fr.history_start = %s
+    """, (org_id, model_name(), today, start)
+    forecasts: Dict[str, Tuple[Forecast, np.ndarray]] = {}
+    for row in rows:
+        if row['data_version'] != row['current_version']:
+            continue
+        forecasts[row['metric']] = (Forecast(_decode(row['mean']), _decode(row['std'])), _decode(row['fitted']))
+    return forecasts
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Refit and store forecasts for every organization")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--model", default=None, help="model name (default: FORECAST_MODEL)")
+    parser.add_argument("--snapshot", default=None, help="read the series from this Parquet snapshot directory")
+    args = parser.parse_args()
+
+    db = mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+    ensure_forecast_schema(db)
+    started = time.perf_counter()
+    stored = refit_all(db, workers=args.workers, name=args.model, snapshot=args.snapshot)
+    print(f"✅ Stored {stored} forecasts in {time.perf_counter() - started:.1f}s")
+    db.close()
@@ -0,0 +1,281 @@
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import mysql.connector
+import numpy as np
+from dotenv import load_dotenv
+
+# Forecasting for the AI-insights endpoints. Models are fitted on a per-org daily
+# series (one value per day, missing days as 0) and forecast `horizon` days ahead
+# with a mean and a confidence interval. All models are plain NumPy and fit in a
+# few milliseconds on a year of data:
+#   seasonal_naive  same weekday last week
+#   holt_winters    additive Holt-Winters with damped trend and weekly season,
+#                   smoothing parameters chosen by a grid search vectorized over the grid
+#   linear_trend    least-squares line plus weekday offsets
+# backtest() and the CLI below compare them on rolling origins (MAPE and fit time).
+
+SEASON = 7
+# Daily history the AI-insights forecasts are fitted on
+HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", 365))
+Z_SCORES = {0.8: 1.2816, 0.9: 1.6449, 0.95: 1.9600, 0.99: 2.5758}
+
+
+class Forecast:
+    """Per-day forecast: mean, lower and upper arrays of length horizon"""
+
+    def __init__(self, mean: np.ndarray, std: np.ndarray, level: float = 0.95):
+        z = Z_SCORES.get(level, 1.96)
+        self.mean = np.maximum(mean, 0)
+        self.std = std
+        self.lower = np.maximum(mean - z * std, 0)
+        self.upper = np.maximum(mean + z * std, 0)
+        self.level = level
+
+    def total(self, start: int = 0, stop: Optional[int] = None) -> Tuple[float, float, float]:
+        """
+        (mean, lower, upper) for the sum of days [start, stop)
+        Day errors are treated as independent, so the spread grows with sqrt(days)
+        """
+        mean = float(self.mean[start:stop].sum())
+        spread = float(np.sqrt((self.std[start:stop] ** 2).sum())) * Z_SCORES.get(self.level, 1.96)
+        return mean, max(mean - spread, 0.0), mean + spread
+
+
+class SeasonalNaive:
+    """Each day repeats the same weekday of the last observed week"""
+
+    def __init__(self, season: int = SEASON):
+        self.season = season
+
+    def fit(self, y: np.ndarray):
+        self.y = np.asarray(y, dtype=float)
+        m = self.season
+        self.fitted = np.full(len(self.y), np.nan)
+        if len(self.y) > m:
+            self.fitted[m:] = self.y[:-m]
+            self.sigma = float(np.std(self.y[m:] - self.y[:-m]))
+        else:
+            self.sigma = float(np.std(self.y)) if len(self.y) else 0.0
+        return self
+
+    def forecast(self, horizon: int, level: float = 0.95) -> Forecast:
+        m = min(self.season, len(self.y))
+        if m == 0:
+            return Forecast(np.zeros(horizon), np.zeros(horizon), level)
+        steps = np.arange(horizon)
+        mean = self.y[-m:][steps % m]
+        std = self.sigma * np.sqrt(steps // m + 1)
+        return Forecast(mean, std, level)
+
+
+class LinearTrend:
+    """Least-squares fit of y = a + b*t + weekday offset"""
+
+    def __init__(self, season: int = SEASON):
+        self.season = season
+
+    def _design(self, t: np.ndarray) -> np.ndarray:
+        dummies = (t[:, None] % self.season == np.arange(1, self.season)[None, :]).astype(float)
+        return np.column_stack([np.ones(len(t)), t, dummies])
+
+    def fit(self, y: np.ndarray):
+        self.y = np.asarray(y, dtype=float)
+        n = len(self.y)
+        X = self._design(np.arange(n, dtype=float))
+        self.beta, *_ = np.linalg.lstsq(X, self.y, rcond=None)
+        self.fitted = X @ self.beta
+        dof = max(n - X.shape[1], 1)
+        self.sigma = float(np.sqrt(((self.y - self.fitted) ** 2).sum() / dof))
+        self.xtx_inv = np.linalg.pinv(X.T @ X)
+        return self
+
+    def forecast(self, horizon: int, level: float = 0.95) -> Forecast:
+        X = self._design(np.arange(len(self.y), len(self.y) + horizon, dtype=float))
+        leverage = np.einsum("ij,jk,ik->i", X, self.xtx_inv, X)
+        return Forecast(X @ self.beta, self.sigma * np.sqrt(1 + leverage), level)
+
+
+class HoltWinters:
+    """
+    Additive Holt-Winters with damped trend and weekly seasonality
+    alpha / beta / gamma are picked from a grid by one-step-ahead squared error;
+    every grid point is smoothed at once as a vector, so fitting costs one pass
+    over the series. Needs two full seasons; shorter series fall back to SeasonalNaive
+    """
+
+    ALPHAS = (0.1, 0.3, 0.5, 0.8)
+    BETAS = (0.01, 0.1, 0.3)
+    GAMMAS = (0.05, 0.2, 0.5)
+
+    def __init__(self, season: int = SEASON, phi: float = 0.98):
+        self.season = season
+        self.phi = phi
+
+    def _smooth(self, y: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: np.ndarray):
+        """Run the recursions for G parameter sets; returns final states and one-step predictions (G, n)"""
+        m, phi = self.season, self.phi
+        groups = len(alpha)
+        level = np.full(groups, y[:m].mean())
+        trend = np.full(groups, (y[m:2 * m].mean() - y[:m].mean()) / m)
+        season = np.tile(y[:m] - y[:m].mean(), (groups, 1))
+        predictions = np.full((groups, len(y)), np.nan)
+        for t in range(m, len(y)):
+            s = season[:, t % m]
+            predictions[:, t] = level + phi * trend + s
+            new_level = alpha * (y[t] - s) + (1 - alpha) * (level + phi * trend)
+            trend = beta * (new_level - level) + (1 - beta) * phi * trend
+            season[:, t % m] = gamma * (y[t] - new_level) + (1 - gamma) * s
+            level = new_level
+        return level, trend, season, predictions
+
+    def fit(self, y: np.ndarray):
+        self.y = np.asarray(y, dtype=float)
+        m = self.season
+        if len(self.y) < 2 * m:
+            self._fallback = SeasonalNaive(m).fit(self.y)
+            self.fitted = self._fallback.fitted
+            return self
+        self._fallback = None
+        grid = np.array(np.meshgrid(self.ALPHAS, self.BETAS, self.GAMMAS, indexing="ij")).reshape(3, -1)
+        level, trend, season, predictions = self._smooth(self.y, *grid)
+        errors = ((predictions[:, m:] - self.y[None, m:]) ** 2).sum(axis=1)
+        best = int(np.argmin(errors))
+        self.alpha, self.beta, self.gamma = grid[:, best]
+        self.level, self.trend, self.seasonals = level[best], trend[best], season[best]
+        self.fitted = predictions[best]
+        self.sigma = float(np.sqrt(errors[best] / max(len(self.y) - m, 1)))
+        return self
+
+    def forecast(self, horizon: int, level: float = 0.95) -> Forecast:
+        if self._fallback is not None:
+            return self._fallback.forecast(horizon, level)
+        steps = np.arange(1, horizon + 1)
+        damping = np.cumsum(self.phi ** steps)
+        n = len(self.y)
+        mean = self.level + damping * self.trend + self.seasonals[(n + steps - 1) % self.season]
+        # Approximate: one-step error grown like a random walk
+        return Forecast(mean, self.sigma * np.sqrt(steps), level)
+
+
+MODELS: Dict[str, Callable] = {
+    "seasonal_naive": SeasonalNaive,
+    "holt_winters": HoltWinters,
+    "linear_trend": LinearTrend,
+}
+
+
+def model_name(name: Optional[str] = None) -> str:
+    """The given model name, or FORECAST_MODEL (default holt_winters)"""
+    return name or os.getenv("FORECAST_MODEL", "holt_winters")
+
+
+def get_model(name: Optional[str] = None):
+    """New model instance by name; defaults to model_name()"""
+    name = model_name(name)
+    if name not in MODELS:
+        raise ValueError(f"Unknown forecast model: {name}")
+    return MODELS[name]()
+
+
+def forecast_series(y: np.ndarray, horizon: int, model_name: Optional[str] = None,
+                    level: float = 0.95) -> Tuple[Forecast, np.ndarray]:
+    """
+    Fit a model on a daily series and forecast the `horizon` days after it
+    Leading zero days (before the organization reported anything) are ignored.
+    Returns the forecast and the in-sample one-step fitted values aligned with y
+    (NaN where the model has none)
+    """
+    y = np.asarray(y, dtype=float)
+    fitted = np.full(len(y), np.nan)
+    nonzero = np.flatnonzero(y)
+    if len(nonzero) == 0:
+        return Forecast(np.zeros(horizon), np.zeros(horizon), level), fitted
+    first = nonzero[0]
+    model = get_model(model_name).fit(y[first:])
+    fitted[first:] = model.fitted
+    return model.forecast(horizon, level), fitted
+
+
+def fill_daily(rows: List[Tuple[date, float]], start: date, end: date) -> np.ndarray:
+    """Dense daily array for [start, end) from (day, value) rows; missing days are 0"""
+    values = np.zeros((end - start).days)
+    for day, value in rows:
+        index = (day - start).days
+        if 0 <= index < len(values):
+            values[index] = float(value or 0)
+    return values
+
+
+def mape(actual: np.ndarray, predicted: np.ndarray) -> float:
+    """Mean absolute percentage error over days with a non-zero actual"""
+    mask = actual != 0
+    if not mask.any():
+        return float("nan")
+    return float(np.mean(np.abs((actual[mask] - predicted[mask]) / actual[mask])) * 100)
+
+
+def backtest(y: np.ndarray, model_name: str, horizon: int = 30, folds: int = 3) -> dict:
+    """
+    Rolling-origin evaluation: fit on all but the last k*horizon days, score the next horizon
+    Returns mean MAPE (%) and mean fit time (ms) across folds
+    """
+    scores, fit_times = [], []
+    for fold in range(folds, 0, -1):
+        cutoff = len(y) - fold * horizon
+        if cutoff < 2 * SEASON:
+            continue
+        started = time.perf_counter()
+        model = get_model(model_name).fit(y[:cutoff])
+        fit_times.append((time.perf_counter() - started) * 1000)
+        scores.append(mape(y[cutoff:cutoff + horizon], model.forecast(horizon).mean))
+    return {
+        "model": model_name,
+        "folds": len(scores),
+        "mape": float(np.nanmean(scores)) if scores else float("nan"),
+        "fit_ms": float(np.mean(fit_times)) if fit_times else float("nan"),
+    }
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Backtest the forecast models on each organization's daily emissions")
+    parser.add_argument("--days", type=int, default=HISTORY_DAYS, help="history to load per organization")
+    parser.add_argument("--horizon", type=int, default=30)
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--column", choices=("co2_total", "energy_total"), default="co2_total")
+    args = parser.parse_args()
+
+    db = mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+    cursor = db.cursor()
+    end = date.today()
+    start = end - timedelta(days=args.days)
+    cursor.execute(f"""
+        SELECT org_id, record_date, SUM({args.column})
+        FROM DailyEmissionRollup
+        WHERE record_date >= %s AND record_date < %s
+        GROUP BY org_id, record_date
+    """, (start, end))
+    series = {}
+    for org_id, day, value in cursor.fetchall():
+        series.setdefault(org_id, []).append((day, value))
+    cursor.close()
+    db.close()
+
+    print(f"{'model':<16}{'orgs':>6}{'MAPE %':>10}{'fit ms':>10}")
+    for name in MODELS:
+        results = [backtest(fill_daily(rows, start, end), name, args.horizon, args.folds) for rows in series.values()]
+        results = [result for result in results if result["folds"]]
+        if not results:
+            continue
+        print(f"{name:<16}{len(results):>6}"
+              f"{np.nanmean([r['mape'] for r in results]):>10.1f}{np.mean([r['fit_ms'] for r in results]):>10.2f}")
@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class IdentityCache:
+    """
+    Short-lived cache of user_id -> {"user_id", "org_id", "role", "status"}
+    - ttl: seconds before a cached identity is looked up again
+    Handlers that change a user's role or status (or delete them) must call
+    invalidate() so access checks never act on a stale identity in this process.
+    invalidate() also bumps the user's generation: a lookup that read Users before
+    the change passes the generation it started with to put(), which then drops
+    the stale row instead of caching it
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._metrics["hits"] += 1
+                return entry[0]
+            self._entries.pop(user_id, None)
+            self._metrics["misses"] += 1
+            return None
+
+    def generation(self, user_id: int) -> int:
+        """Invalidation counter for a user; read it before looking the user up"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, user_id: int, identity: dict, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and self._generations.get(user_id, 0) != generation:
+                # Invalidated while the row was being read
+                return
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, then everything if still full
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user_id] = (identity, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._entries.pop(user_id, None) is not None:
+                self._metrics["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "ttl": self.ttl, **self._metrics}
+
+
+def resolve_identity(cache: IdentityCache, connection_factory: Callable, user_id: int) -> Optional[dict]:
+    """
+    Return (org_id, role, status) for a user, from the cache or a single Users lookup
+    Returns None if the user does not exist (misses are not cached)
+    """
+    identity = cache.get(user_id)
+    if identity is not None:
+        return identity
+
+    generation = cache.generation(user_id)
+    connection = connection_factory()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT user_id, org_id, role, status FROM Users WHERE user_id = %s", (user_id,))
+        identity = cursor.fetchone()
+        cursor.close()
+    finally:
+        connection.close()
+
+    if identity is not None:
+        cache.put(user_id, identity, generation)
+    return identity
@@ -0,0 +1,195 @@
+import csv
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from itertools import islice
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# Bulk ingestion of DailyEmissions rows for the data generators in this folder.
+# Rows are (org_id, location_id, category_id, record_date, co2_emitted, energy_consumed).
+# They are written in batches, either as one multi-row INSERT per batch or via
+# LOAD DATA LOCAL INFILE from a temporary CSV. Commits are cut on day boundaries
+# (rows arrive ordered by record_date): an interrupted backfill keeps every day it
+# committed in full and nothing of the day it was on, so it can be resumed from the
+# day after the last one reported. Loading does not
+# touch the dashboard rollups: callers must run rollups.refresh_rollups() for the
+# loaded days afterwards (see trail1.py).
+
+COLUMNS = ("org_id", "location_id", "category_id", "record_date", "co2_emitted", "energy_consumed")
+METHODS = ("insert", "infile")
+
+
+def insert_emission_rows(connection, rows: List[Tuple]):
+    """Insert rows with a single multi-row INSERT (no commit)"""
+    if not rows:
+        return
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    params = [value for row in rows for value in row]
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"INSERT INTO DailyEmissions ({', '.join(COLUMNS)}) VALUES {placeholders}", params)
+    finally:
+        cursor.close()
+
+
+def load_emission_rows_infile(connection, rows: List[Tuple]):
+    """
+    Load rows with LOAD DATA LOCAL INFILE from a temporary CSV (no commit)
+    The connection must be opened with allow_local_infile=True and the server
+    must have local_infile enabled
+    """
+    if not rows:
+        return
+    handle, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(handle, "w", newline="") as csv_file:
+            csv.writer(csv_file).writerows(rows)
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE DailyEmissions "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                f"LINES TERMINATED BY '\\r\\n' ({', '.join(COLUMNS)})",
+                (path,)
+            )
+        finally:
+            cursor.close()
+    finally:
+        os.remove(path)
+
+
+def batched(rows: Iterable, batch_size: int):
+    """Split an iterable of rows into lists of at most batch_size rows"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def day_batches(rows: Iterable[Tuple], batch_size: int):
+    """
+    Split rows ordered by record_date into lists of whole days of at most batch_size
+    rows; a single day with more rows than that becomes a list of its own
+    """
+    batch, day_rows, current = [], [], None
+    for row in rows:
+        if row[3] != current:
+            if batch and len(batch) + len(day_rows) > batch_size:
+                yield batch
+                batch = []
+            batch.extend(day_rows)
+            day_rows, current = [], row[3]
+        day_rows.append(row)
+    if batch and len(batch) + len(day_rows) > batch_size:
+        yield batch
+        batch = []
+    batch.extend(day_rows)
+    if batch:
+        yield batch
+
+
+def date_partitions(start: date, end: date, parts: int) -> List[Tuple[date, date]]:
+    """Split [start, end] (inclusive) into at most `parts` contiguous inclusive ranges"""
+    days = (end - start).days + 1
+    if days <= 0:
+        return []
+    parts = max(1, min(parts, days))
+    size, extra = divmod(days, parts)
+    partitions, first = [], start
+    for index in range(parts):
+        last = first + timedelta(days=size + (1 if index < extra else 0) - 1)
+        partitions.append((first, last))
+        first = last + timedelta(days=1)
+    return partitions
+
+
+class LoadStats:
+    """Thread-safe row counter with a rows/sec report"""
+
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, rows: int):
+        with self._lock:
+            self.rows += rows
+            self.batches += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return f"{self.rows} rows in {self.batches} batches, {self.elapsed:.1f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def load_rows(
+    connection,
+    rows: Iterable[Tuple],
+    batch_size: int = 5000,
+    method: str = "insert",
+    stats: Optional[LoadStats] = None,
+    on_batch: Optional[Callable[[List[Tuple], LoadStats], None]] = None,
+) -> LoadStats:
+    """
+    Write rows (ordered by record_date) in batches, committing after each batch
+    - batch_size: rows per INSERT / CSV file; each commit holds whole days of up to
+      batch_size rows (more if a single day is larger, written in several INSERTs)
+    - method: 'insert' (multi-row VALUES) or 'infile' (LOAD DATA LOCAL INFILE)
+    - on_batch: called after each commit with the committed rows, e.g. to print a
+      checkpoint; the last row's record_date is then fully loaded
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown load method: {method}")
+    write = insert_emission_rows if method == "insert" else load_emission_rows_infile
+    stats = stats or LoadStats()
+    for batch in day_batches(rows, batch_size):
+        for piece in batched(batch, batch_size):
+            write(connection, piece)
+        connection.commit()
+        stats.add(len(batch))
+        if on_batch:
+            on_batch(batch, stats)
+    return stats
+
+
+def parallel_load(
+    connection_factory: Callable,
+    generate_rows: Callable[[date, date], Iterable[Tuple]],
+    start: date,
+    end: date,
+    workers: int = 1,
+    batch_size: int = 5000,
+    method: str = "insert",
+    on_batch: Optional[Callable[[List[Tuple], LoadStats], None]] = None,
+) -> LoadStats:
+    """
+    Generate and load [start, end] split into date partitions, one per worker
+    - connection_factory: callable returning a new DB connection (one per worker)
+    - generate_rows: callable (first_day, last_day) -> iterable of rows for that range
+    """
+    stats = LoadStats()
+
+    def load_partition(partition: Tuple[date, date]):
+        connection = connection_factory()
+        try:
+            load_rows(connection, generate_rows(*partition), batch_size, method, stats, on_batch)
+        finally:
+            connection.close()
+
+    partitions = date_partitions(start, end, workers)
+    with ThreadPoolExecutor(max_workers=max(1, len(partitions)), thread_name_prefix="bulk-load") as executor:
+        # list() re-raises the first worker error
+        list(executor.map(load_partition, partitions))
+    return stats
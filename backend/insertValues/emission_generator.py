@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Vectorized synthetic DailyEmissions data. The date x location x category grid
+# is built as arrays and the location, category and weekday factors are applied by
+# broadcasting, instead of drawing random numbers row by row.
+#
+# Every day draws from its own random stream seeded with (seed, day), so a given
+# seed produces the same rows however the range is chunked or split across
+# bulk_loader workers.
+
+# co2 range per location type (kg), for unknown types DEFAULT_RANGE
+BASE_RANGES = {
+    "factory": (200, 800),
+    "office": (30, 120),
+    "warehouse": (80, 300),
+    "plant": (150, 600),
+    "lab": (60, 200)
+}
+DEFAULT_RANGE = (50, 200)
+
+# Multiplier per category name, 1.0 for unknown categories
+CATEGORY_FACTORS = {
+    "Transport": 1.2,
+    "Electricity/Energy": 1.5,
+    "Industrial Processes": 1.8,
+    "Waste Management": 0.9,
+    "Raw Materials": 1.4,
+    "Packaging & Shipping": 1.3,
+    "Office Operations": 0.8
+}
+
+# Multiplier per weekday (0=Monday): Saturday at half, Sunday at a fifth
+WEEKDAY_FACTORS = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 0.5, 0.2])
+
+# energy_consumed is this fraction of co2_emitted (uniform)
+ENERGY_RATIO = (0.3, 0.6)
+
+
+def _day_draws(seed: Optional[int], day: date, shape: Tuple[int, int]):
+    """Uniform [0, 1) draws for one day's co2 and energy ratio, from the day's own stream"""
+    rng = np.random.default_rng(None if seed is None else [seed, day.toordinal()])
+    return rng.random((2,) + shape)
+
+
+def generate_emission_chunks(
+    locations: Sequence[Tuple],
+    categories: Sequence[Tuple],
+    start: date,
+    end: date,
+    seed: Optional[int] = None,
+    chunk_days: int = 7,
+) -> Iterator[List[Tuple]]:
+    """
+    Yield DailyEmissions rows for [start, end] (inclusive), chunk_days days at a time
+    - locations: (org_id, location_id, location_type) rows from Locations
+    - categories: (category_id, name) rows from EmissionCategories
+    - seed: makes the output reproducible; None draws fresh randomness
+    Rows are (org_id, location_id, category_id, record_date, co2_emitted, energy_consumed)
+    with plain Python values, ready for bulk_loader
+    """
+    if chunk_days < 1:
+        raise ValueError(f"chunk_days must be at least 1, got {chunk_days}")
+    if not locations or not categories:
+        return
+
+    org_ids = np.array([row[0] for row in locations])
+    location_ids = np.array([row[1] for row in locations])
+    ranges = np.array([BASE_RANGES.get(row[2], DEFAULT_RANGE) for row in locations], dtype=float)
+    low, span = ranges[:, 0], ranges[:, 1] - ranges[:, 0]
+    category_ids = np.array([row[0] for row in categories])
+    category_factors = np.array([CATEGORY_FACTORS.get(row[1], 1.0) for row in categories])
+    shape = (len(locations), len(categories))
+
+    first = start
+    while first <= end:
+        days = [first + timedelta(days=offset) for offset in range(min(chunk_days, (end - first).days + 1))]
+        draws = np.stack([_day_draws(seed, day, shape) for day in days])  # (days, 2, locations, categories)
+        weekday_factors = WEEKDAY_FACTORS[[day.weekday() for day in days]][:, None, None]
+
+        # (days, locations, categories) by broadcasting the per-axis factors
+        co2 = (low[None, :, None] + span[None, :, None] * draws[:, 0]) * category_factors[None, None, :]
+        energy = co2 * (ENERGY_RATIO[0] + (ENERGY_RATIO[1] - ENERGY_RATIO[0]) * draws[:, 1])
+        co2 = np.round(co2 * weekday_factors, 2)
+        energy = np.round(energy * weekday_factors, 2)
+
+        grid = (len(days),) + shape
+        yield list(zip(
+            np.broadcast_to(org_ids[None, :, None], grid).ravel().tolist(),
+            np.broadcast_to(location_ids[None, :, None], grid).ravel().tolist(),
+            np.broadcast_to(category_ids[None, None, :], grid).ravel().tolist(),
+            np.repeat(np.array(days, dtype=object), shape[0] * shape[1]).tolist(),
+            co2.ravel().tolist(),
+            energy.ravel().tolist(),
+        ))
+        first = days[-1] + timedelta(days=1)
+
+
+def generate_emission_rows(locations, categories, start: date, end: date, seed: Optional[int] = None,
+                           chunk_days: int = 7) -> Iterator[Tuple]:
+    """Same rows as generate_emission_chunks, one at a time (for bulk_loader.parallel_load)"""
+    for chunk in generate_emission_chunks(locations, categories, start, end, seed, chunk_days):
+        yield from chunk
@@ -1,19 +1,45 @@
+# python trail1.py --start 2025-01-01 --end 2025-12-31 --workers 4 --batch-size 5000
+import argparse
 import mysql.connector
-import random
-from datetime import datetime, timedelta
+import os
+import sys
+from datetime import datetime
 
-# ---------- DB CONFIG ----------
-db = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="Ukit@2104",
-    database="SmartCarbonDB"
-)
-cursor = db.cursor()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rollups import ensure_rollup_schema, refresh_rollups
+from bulk_loader import METHODS, parallel_load
+from emission_generator import generate_emission_rows
 
 # ---------- PARAMETERS ----------
-start_date = datetime(2025, 10, 28)
-end_date = datetime(2025, 10, 28)
+parser = argparse.ArgumentParser(description="Generate random DailyEmissions rows and bulk load them")
+parser.add_argument("--start", default="2025-10-28", help="first day (YYYY-MM-DD)")
+parser.add_argument("--end", help="last day (YYYY-MM-DD, default: --start)")
+parser.add_argument("--batch-size", type=int, default=5000, help="rows per INSERT; commits hold whole days")
+parser.add_argument("--workers", type=int, default=1, help="parallel loaders, each taking a slice of the date range")
+parser.add_argument("--method", choices=METHODS, default="insert",
+                    help="multi-row INSERT or LOAD DATA LOCAL INFILE (needs local_infile on the server)")
+parser.add_argument("--seed", type=int, help="random seed for reproducible data")
+parser.add_argument("--chunk-days", type=int, default=7, help="days generated per vectorized chunk")
+parser.add_argument("--verbose", action="store_true", help="print a checkpoint after every committed batch")
+args = parser.parse_args()
+if args.chunk_days < 1:
+    parser.error("--chunk-days must be at least 1")
+
+start_date = datetime.strptime(args.start, "%Y-%m-%d")
+end_date = datetime.strptime(args.end, "%Y-%m-%d") if args.end else start_date
+
+# ---------- DB CONFIG ----------
+def connect():
+    return mysql.connector.connect(
+        host="localhost",
+        user="root",
+        password="Ukit@2104",
+        database="SmartCarbonDB",
+        allow_local_infile=(args.method == "infile")
+    )
+
+db = connect()
+cursor = db.cursor()
 
 # Get existing orgs, locations, and categories
 cursor.execute("SELECT org_id, location_id, type FROM Locations;")
@@ -22,61 +48,33 @@ locations = cursor.fetchall()
 cursor.execute("SELECT category_id, name FROM EmissionCategories;")
 categories = cursor.fetchall()
 
-# ---------- EMISSION RANGES ----------
-def generate_emission(location_type, category_name):
-    base = {
-        "factory": (200, 800),
-        "office": (30, 120),
-        "warehouse": (80, 300),
-        "plant": (150, 600),
-        "lab": (60, 200)
-    }
-
-    factor = {
-        "Transport": 1.2,
-        "Electricity/Energy": 1.5,
-        "Industrial Processes": 1.8,
-        "Waste Management": 0.9,
-        "Raw Materials": 1.4,
-        "Packaging & Shipping": 1.3,
-        "Office Operations": 0.8
-    }
+# ---------- ROW GENERATOR ----------
+# Vectorized and seedable (see emission_generator.py); one date partition per loader worker
+def generate_rows(first_day, last_day):
+    return generate_emission_rows(locations, categories, first_day, last_day, seed=args.seed, chunk_days=args.chunk_days)
 
-    min_val, max_val = base.get(location_type, (50, 200))
-    co2 = random.uniform(min_val, max_val) * factor.get(category_name, 1.0)
-    energy = co2 * random.uniform(0.3, 0.6)  # approximate ratio
-    return round(co2, 2), round(energy, 2)
+def print_checkpoint(batch, stats):
+    # Commits hold whole days, so every day up to the one reported is fully loaded and
+    # nothing after it is; with one worker a failed run can be resumed with --start
+    # set to the day after the last one reported
+    print(f"  committed through {batch[-1][3]} - {stats.rows} rows, {stats.rows_per_second:,.0f} rows/s")
 
 # ---------- INSERT DATA ----------
-insert_query = """
-INSERT INTO DailyEmissions (org_id, location_id, category_id, record_date, co2_emitted, energy_consumed)
-VALUES (%s, %s, %s, %s, %s, %s)
-"""
-
-current_date = start_date
-while current_date <= end_date:
-    # Get day of week (0=Monday, 5=Saturday, 6=Sunday)
-    day_of_week = current_date.weekday()
-    
-    for (org_id, location_id, location_type) in locations:
-        for (category_id, category_name) in categories:
-            co2, energy = generate_emission(location_type, category_name)
-            
-            # Apply weekend reduction factors
-            if day_of_week == 5:  # Saturday
-                co2 *= 0.5
-                energy *= 0.5
-            elif day_of_week == 6:  # Sunday
-                co2 *= 0.2  # 1/5th
-                energy *= 0.2
-            
-            co2 = round(co2, 2)
-            energy = round(energy, 2)
-            
-            cursor.execute(insert_query, (org_id, location_id, category_id, current_date.date(), co2, energy))
-    current_date += timedelta(days=1)
+stats = parallel_load(
+    connect,
+    generate_rows,
+    start_date.date(),
+    end_date.date(),
+    workers=args.workers,
+    batch_size=args.batch_size,
+    method=args.method,
+    on_batch=print_checkpoint if args.verbose else None,
+)
+print(f"Loaded {stats.summary()}")
 
-db.commit()
+# Keep the dashboard rollups in step with the new rows
+ensure_rollup_schema(db)
+refresh_rollups(db, start_date.date(), end_date.date())
 cursor.close()
 db.close()
 
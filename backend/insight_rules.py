@@ -0,0 +1,254 @@
+import argparse
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from query_plans import run_plan
+
+# Rule-based AI-insights recommendations.
+#
+# One aggregation query over DailyEmissions (the last 60 complete days, bucketed
+# by period and weekend) is turned into a feature vector per organization, and
+# every rule in RULES is a declarative test on those features. Rules are
+# evaluated on the feature table as a whole, so scoring one organization (the
+# endpoint) and every organization at once (the CLI) is the same code.
+# Confidence is measured, not asserted: it is the share of expected readings
+# ((location, category) pairs x days) present in the window the rule looks at.
+# A rule's period ("month" or "week" of the last day it covers) is the unit
+# insight_store.py deduplicates stored insights by.
+#
+# Features (NaN where there is nothing to compare with):
+#   total_30d, total_prev_30d, mom_change      last 30 days vs the 30 before (%)
+#   total_7d, total_prev_7d, wow_change        last 7 days vs the 7 before (%)
+#   top_category, top_category_share           largest category in the last 30 days (%)
+#   weekend_ratio                              weekend-day average as % of weekday average
+#   intensity, worst_location,
+#   worst_location_intensity, intensity_ratio  kg CO2 per kWh; worst location vs the organization
+#   location_count
+#   coverage_14d, coverage_30d, coverage_60d   share of expected readings present
+
+RULES = [
+    {
+        "name": "dominant_category",
+        "type": "alert",
+        "severity": "high",
+        "when": lambda f: f.top_category_share >= 40,
+        "title": "{top_category} Emissions Dominant",
+        "message": "Your {top_category} emissions account for {top_category_share:.1f}% of total emissions. "
+                   "Consider targeted reduction strategies for this category.",
+        "coverage": "coverage_30d",
+        "window": "Last 30 days",
+        "period": "month",
+    },
+    {
+        "name": "emissions_increasing",
+        "type": "warning",
+        "severity": "medium",
+        "when": lambda f: f.mom_change > 10,
+        "title": "Emissions Increasing",
+        "message": "Your emissions have increased by {mom_change:.1f}% compared to the previous 30 days. "
+                   "Review recent activities and consider implementing reduction measures.",
+        "coverage": "coverage_60d",
+        "window": "Last 60 days",
+        "period": "month",
+    },
+    {
+        "name": "emissions_decreasing",
+        "type": "success",
+        "severity": "low",
+        "when": lambda f: f.mom_change < -10,
+        "title": "Great Progress!",
+        "message": "Excellent work! Your emissions have decreased by {mom_change_abs:.1f}% compared to the "
+                   "previous 30 days. Keep up the sustainable practices.",
+        "coverage": "coverage_60d",
+        "window": "Last 60 days",
+        "period": "month",
+    },
+    {
+        "name": "weekly_jump",
+        "type": "warning",
+        "severity": "medium",
+        "when": lambda f: f.wow_change > 20,
+        "title": "Sharp Weekly Increase",
+        "message": "Emissions over the last 7 days were {wow_change:.1f}% higher than the week before.",
+        "coverage": "coverage_14d",
+        "window": "Last 14 days",
+        "period": "week",
+    },
+    {
+        "name": "weekend_baseload",
+        "type": "opportunity",
+        "severity": "medium",
+        "when": lambda f: f.weekend_ratio >= 50,
+        "title": "High Weekend Baseload",
+        "message": "A weekend day emits {weekend_ratio:.0f}% of a typical weekday. "
+                   "Shutting down idle equipment outside operating hours could cut this baseload.",
+        "coverage": "coverage_30d",
+        "window": "Last 30 days",
+        "period": "month",
+    },
+    {
+        "name": "intensity_outlier",
+        "type": "opportunity",
+        "severity": "medium",
+        "when": lambda f: (f.location_count >= 2) & (f.intensity_ratio >= 1.5),
+        "title": "Carbon Intensity Outlier: {worst_location}",
+        "message": "{worst_location} emits {worst_location_intensity:.3f} kg CO2 per kWh, "
+                   "{intensity_ratio:.1f}x your organization's average of {intensity:.3f}. "
+                   "Cleaner supply or efficiency upgrades there would have the largest effect.",
+        "coverage": "coverage_30d",
+        "window": "Last 30 days",
+        "period": "month",
+    },
+]
+
+
+def rule_period(rule: dict, day: date) -> str:
+    """Dedup key of a rule firing on data through `day`: 2025-10 or 2025-W43"""
+    if rule["period"] == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{day:%Y-%m}"
+
+
+def insight_features_plan(org_id: Optional[int] = None, today: Optional[date] = None):
+    """
+    Query plan (see query_plans.py) for the feature table: one row per organization
+    (index org_id), for one organization or all of them. Windows end yesterday so
+    a partially loaded today does not skew the comparisons
+    """
+    end = today or date.today()
+    org_clause, org_params = ("AND de.org_id = %s", [org_id]) if org_id is not None else ("", [])
+    rows = yield f"""
+        SELECT
+            de.org_id,
+            de.location_id,
+            COALESCE(l.name, 'Unknown') as location_name,
+            COALESCE(ec.name, 'Unknown') as category_name,
+            de.category_id,
+            CASE
+                WHEN de.record_date >= %s THEN 0
+                WHEN de.record_date >= %s THEN 1
+                WHEN de.record_date >= %s THEN 2
+                ELSE 3
+            END as period,
+            DAYOFWEEK(de.record_date) IN (1, 7) as weekend,
+            COALESCE(SUM(de.co2_emitted), 0) as co2,
+            COALESCE(SUM(de.energy_consumed), 0) as energy,
+            COUNT(*) as records
+        FROM DailyEmissions de
+        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
+        LEFT JOIN Locations l ON de.location_id = l.location_id
+        WHERE de.record_date >= %s AND de.record_date < %s
+        {org_clause}
+        GROUP BY de.org_id, de.location_id, l.name, de.category_id, ec.name, period, weekend
+    """, [end - timedelta(days=7), end - timedelta(days=14), end - timedelta(days=30),
+          end - timedelta(days=60), end] + org_params
+    return build_features(rows, end)
+
+
+def build_features(rows: List[dict], end: date) -> pd.DataFrame:
+    """Feature table from the bucketed rows of insight_features_plan (periods 0-2 are the last 30 days)"""
+    frame = pd.DataFrame(list(rows), columns=["org_id", "location_id", "location_name", "category_name",
+                                              "category_id", "period", "weekend", "co2", "energy", "records"])
+    frame[["co2", "energy"]] = frame[["co2", "energy"]].astype(float)
+    orgs = pd.Index(frame["org_id"].unique(), name="org_id")
+    last_30, last_14, last_7 = frame[frame.period <= 2], frame[frame.period <= 1], frame[frame.period == 0]
+
+    def total(rows: pd.DataFrame, column: str = "co2") -> pd.Series:
+        return rows.groupby("org_id")[column].sum().reindex(orgs, fill_value=0.0)
+
+    def change(current: pd.Series, previous: pd.Series) -> pd.Series:
+        return ((current - previous) / previous * 100).where(previous > 0)
+
+    features = pd.DataFrame(index=orgs)
+    features["total_30d"] = total(last_30)
+    features["total_prev_30d"] = total(frame[frame.period == 3])
+    features["mom_change"] = change(features.total_30d, features.total_prev_30d)
+    features["mom_change_abs"] = features.mom_change.abs()
+    features["total_7d"] = total(last_7)
+    features["total_prev_7d"] = total(frame[frame.period == 1])
+    features["wow_change"] = change(features.total_7d, features.total_prev_7d)
+
+    categories = last_30.groupby(["org_id", "category_name"])["co2"].sum()
+    top = categories.loc[categories.groupby(level="org_id").idxmax()] if len(categories) else categories
+    features["top_category"] = top.reset_index(level="category_name")["category_name"].reindex(orgs)
+    features["top_category_share"] = (top.droplevel("category_name") / features.total_30d * 100).where(
+        features.total_30d > 0)
+
+    days = pd.date_range(end - timedelta(days=30), end - timedelta(days=1))
+    weekend_days = int((days.dayofweek >= 5).sum())
+    weekend = total(last_30[last_30.weekend == 1]) / weekend_days
+    weekday = total(last_30[last_30.weekend == 0]) / (len(days) - weekend_days)
+    features["weekend_ratio"] = (weekend / weekday * 100).where(weekday > 0)
+
+    locations = last_30.groupby(["org_id", "location_id", "location_name"])[["co2", "energy"]].sum()
+    locations["intensity"] = (locations.co2 / locations.energy).where(locations.energy > 0)
+    locations = locations.dropna(subset=["intensity"]).reset_index()
+    worst = locations.loc[locations.groupby("org_id")["intensity"].idxmax()].set_index("org_id")
+    features["intensity"] = (features.total_30d / total(last_30, "energy")).replace(np.inf, np.nan)
+    features["worst_location"] = worst["location_name"].reindex(orgs)
+    features["worst_location_intensity"] = worst["intensity"].reindex(orgs)
+    features["intensity_ratio"] = (features.worst_location_intensity / features.intensity).where(
+        features.intensity > 0)
+    features["location_count"] = locations.groupby("org_id").size().reindex(orgs, fill_value=0)
+
+    pairs = frame.drop_duplicates(["org_id", "location_id", "category_id"]).groupby("org_id").size().reindex(orgs)
+    for name, rows, length in (("coverage_14d", last_14, 14), ("coverage_30d", last_30, 30),
+                               ("coverage_60d", frame, 60)):
+        features[name] = (total(rows, "records") / (pairs * length)).clip(upper=1.0)
+    return features
+
+
+def evaluate_rules(features: pd.DataFrame, rules: List[dict] = RULES) -> Dict[int, List[dict]]:
+    """
+    Insights per organization: each rule's test runs once over the whole feature
+    table and only the rows it matches are formatted. Ids are numbered per
+    organization in rule order
+    """
+    insights: Dict[int, List[dict]] = {}
+    for rule in rules:
+        matched = features[rule["when"](features).fillna(False).astype(bool)]
+        for org_id, row in matched.iterrows():
+            values = row.to_dict()
+            org_insights = insights.setdefault(org_id, [])
+            org_insights.append({
+                "id": len(org_insights) + 1,
+                "rule": rule["name"],
+                "type": rule["type"],
+                "title": rule["title"].format(**values),
+                "message": rule["message"].format(**values),
+                "confidence": round(float(values[rule["coverage"]]) * 100, 1),
+                "timestamp": rule["window"],
+                "severity": rule["severity"]
+            })
+    return insights
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Evaluate the insight rules for every organization")
+    parser.add_argument("--org-id", type=int, default=None, help="only this organization")
+    args = parser.parse_args()
+
+    db = mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+    cursor = db.cursor(dictionary=True)
+    features = run_plan(cursor, insight_features_plan(args.org_id))
+    cursor.close()
+    db.close()
+    insights = evaluate_rules(features)
+    for rule in RULES:
+        fired = sum(1 for org_insights in insights.values() for insight in org_insights if insight["rule"] == rule["name"])
+        print(f"{rule['name']:<22}{fired:>6} / {len(features)} organizations")
+    print(f"✅ {sum(len(org_insights) for org_insights in insights.values())} insights")
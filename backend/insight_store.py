@@ -0,0 +1,222 @@
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from anomalies import recent_anomalies_plan
+from insight_rules import RULES, evaluate_rules, insight_features_plan, rule_period
+from query_plans import first_row, run_plan
+
+# Persisted AI insights.
+#
+# Generated insights are stored in Insights with a real id and creation time and
+# deduplicated on (org_id, rule, period): a rule that keeps firing updates its row
+# for the current period (see insight_rules.rule_period) instead of adding one per
+# request, and an anomaly is keyed by its day, location and category.
+# InsightGenerations is the per-organization watermark: the last complete day
+# the insights cover and the RollupVersions version they were built from.
+# Generation only reads DailyEmissions when there is data newer than the
+# watermark (a new day, or a refresh that bumped the version). It runs from
+# POST /api/ai-insights/generate and from the batch below; GET
+# /api/ai-insights/recommendations only reads the store. Run the batch from cron
+# after the daily load and anomaly scan, e.g.:
+#   python insight_store.py
+
+ANOMALY_RULE = "anomaly"
+ANOMALY_INSIGHTS = 3
+
+INSIGHT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS Insights (
+        insight_id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        org_id INT NOT NULL,
+        rule VARCHAR(60) NOT NULL,
+        period VARCHAR(60) NOT NULL,
+        type VARCHAR(20) NOT NULL,
+        severity VARCHAR(10) NOT NULL,
+        title VARCHAR(255) NOT NULL,
+        message TEXT NOT NULL,
+        confidence DOUBLE NOT NULL,
+        observed_on DATE NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_insights_org_rule_period (org_id, rule, period),
+        KEY idx_insights_org_observed (org_id, observed_on)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS InsightGenerations (
+        org_id INT NOT NULL PRIMARY KEY,
+        generated_through DATE NOT NULL,
+        data_version BIGINT NOT NULL,
+        generated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+RULES_BY_NAME = {rule["name"]: rule for rule in RULES}
+
+
+def ensure_insight_schema(connection):
+    """Create the insight tables if they do not exist yet"""
+    cursor = connection.cursor()
+    for ddl in INSIGHT_SCHEMA:
+        cursor.execute(ddl)
+    connection.commit()
+    cursor.close()
+
+
+def _anomaly_insight(anomaly: dict) -> dict:
+    spike = anomaly['z_score'] > 0
+    ratio = round(anomaly['value'] / anomaly['baseline'], 1) if anomaly['baseline'] > 0 else None
+    compared = f"{ratio}x" if ratio is not None else "far from"
+    return {
+        "rule": ANOMALY_RULE,
+        "period": f"{anomaly['record_date']}:{anomaly['location_id']}:{anomaly['category_id']}",
+        "observed_on": anomaly['record_date'],
+        "type": "warning" if spike else "opportunity",
+        "title": f"Unusual {'Spike' if spike else 'Drop'} at {anomaly['location_name']}",
+        "message": f"{anomaly['category_name']} emissions at {anomaly['location_name']} were "
+                   f"{round(anomaly['value'], 2)} kg CO2 on {anomaly['record_date']:%A, %b %d}, "
+                   f"{compared} the usual {round(anomaly['baseline'], 2)} kg for that weekday. "
+                   + ("Check for equipment faults or unplanned activity." if spike else
+                      "If this reflects a real change, consider applying it at other sites; "
+                      "otherwise check for missing readings."),
+        "confidence": float(anomaly['confidence']),
+        "severity": "high" if spike and abs(anomaly['z_score']) >= 6 else "medium" if spike else "low"
+    }
+
+
+def generate_insights_plan(org_id: int, today: Optional[date] = None):
+    """
+    Query plan (see query_plans.py) that brings the organization's stored insights
+    up to date with data through yesterday
+    Returns the number of insights written, 0 if the watermark was already current
+    """
+    through = (today or date.today()) - timedelta(days=1)
+    state = first_row((yield """
+        SELECT
+            (SELECT generated_through FROM InsightGenerations WHERE org_id = %s) as generated_through,
+            (SELECT data_version FROM InsightGenerations WHERE org_id = %s) as data_version,
+            (SELECT COALESCE(MAX(version), 0) FROM RollupVersions WHERE org_id = %s) as current_version
+    """, (org_id, org_id, org_id)))
+    if state['generated_through'] == through and state['data_version'] == state['current_version']:
+        return 0
+
+    features = yield from insight_features_plan(org_id, through + timedelta(days=1))
+    insights = []
+    for insight in evaluate_rules(features).get(org_id, []):
+        insight.update(period=rule_period(RULES_BY_NAME[insight['rule']], through), observed_on=through)
+        insights.append(insight)
+    anomalies = yield from recent_anomalies_plan(org_id, through - timedelta(days=29), ANOMALY_INSIGHTS)
+    insights += [_anomaly_insight(anomaly) for anomaly in anomalies]
+
+    if insights:
+        columns = ["rule", "period", "type", "severity", "title", "message", "confidence", "observed_on"]
+        yield f"""
+            INSERT INTO Insights (org_id, {", ".join(columns)})
+            VALUES {", ".join(["(" + ", ".join(["%s"] * (len(columns) + 1)) + ")"] * len(insights))}
+            ON DUPLICATE KEY UPDATE
+                type = VALUES(type), severity = VALUES(severity), title = VALUES(title),
+                message = VALUES(message), confidence = VALUES(confidence),
+                observed_on = GREATEST(observed_on, VALUES(observed_on))
+        """, [value for insight in insights for value in [org_id] + [insight[column] for column in columns]]
+    yield """
+        INSERT INTO InsightGenerations (org_id, generated_through, data_version) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE generated_through = VALUES(generated_through), data_version = VALUES(data_version)
+    """, (org_id, through, state['current_version'])
+    yield "COMMIT", ()
+    return len(insights)
+
+
+def _time_ago(moment: datetime) -> str:
+    seconds = max((datetime.now() - moment).total_seconds(), 0)
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'s' if count > 1 else ''} ago"
+    return "Just now"
+
+
+def _serialize(row: dict) -> dict:
+    return {
+        "id": row['insight_id'],
+        "rule": row['rule'],
+        "type": row['type'],
+        "title": row['title'],
+        "message": row['message'],
+        "confidence": row['confidence'],
+        "timestamp": _time_ago(row['created_at']),
+        "created_at": row['created_at'].isoformat(),
+        "severity": row['severity']
+    }
+
+
+def stored_insights_plan(org_id: int, today: Optional[date] = None) -> List[dict]:
+    """
+    Query plan for the insights to show: rules that fired in the latest generation,
+    then the newest anomaly insights of the last 30 days
+    """
+    through = (today or date.today()) - timedelta(days=1)
+    rules = yield """
+        SELECT i.insight_id, i.rule, i.type, i.severity, i.title, i.message, i.confidence, i.created_at
+        FROM Insights i
+        JOIN InsightGenerations g ON g.org_id = i.org_id
+        WHERE i.org_id = %s AND i.rule <> %s AND i.observed_on = g.generated_through
+        ORDER BY i.insight_id
+    """, (org_id, ANOMALY_RULE)
+    anomalies = yield """
+        SELECT insight_id, rule, type, severity, title, message, confidence, created_at
+        FROM Insights
+        WHERE org_id = %s AND rule = %s AND observed_on >= %s
+        ORDER BY observed_on DESC, insight_id DESC
+        LIMIT %s
+    """, (org_id, ANOMALY_RULE, through - timedelta(days=29), ANOMALY_INSIGHTS)
+    order = {name: index for index, name in enumerate(RULES_BY_NAME)}
+    rules = sorted(rules, key=lambda row: order.get(row['rule'], len(order)))
+    return [_serialize(row) for row in rules + list(anomalies)]
+
+
+def new_insights_plan(org_id: int, today: Optional[date] = None) -> List[dict]:
+    """
+    Query plan that brings the stored insights up to date (generate_insights_plan)
+    and returns the insights it created, newest first
+    A rule that keeps firing updates its existing row, so it is not returned again;
+    without newer data nothing is generated and the result is empty
+    """
+    last_id = first_row((yield """
+        SELECT COALESCE(MAX(insight_id), 0) as last_id FROM Insights WHERE org_id = %s
+    """, (org_id,)))['last_id']
+    if not (yield from generate_insights_plan(org_id, today)):
+        return []
+    rows = yield """
+        SELECT insight_id, rule, type, severity, title, message, confidence, created_at
+        FROM Insights
+        WHERE org_id = %s AND insight_id > %s
+        ORDER BY insight_id DESC
+    """, (org_id, last_id)
+    return [_serialize(row) for row in rows]
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Bring the stored AI insights of every organization up to date")
+    args = parser.parse_args()
+
+    db = mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+    ensure_insight_schema(db)
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("SELECT org_id FROM Organizations")
+    written = {row['org_id']: run_plan(cursor, generate_insights_plan(row['org_id'])) for row in cursor.fetchall()}
+    cursor.close()
+    db.close()
+    print(f"✅ {sum(written.values())} insights written for {sum(1 for n in written.values() if n)} organizations")
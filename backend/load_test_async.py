@@ -0,0 +1,69 @@
+# Concurrency probe for the sync vs async API (API_MODE=async, see async_endpoints.py)
+# Start the server in one mode, run this, restart in the other mode and compare:
+#   API_MODE=sync  uvicorn main:app --port 8000
+#   API_MODE=async uvicorn main:app --port 8000
+#   python load_test_async.py --url http://localhost:8000 --user-id 1 --concurrency 40 200
+# The sync app tops out around the threadpool size (40) in flight; the async app
+# keeps scaling until the database or DB_ASYNC_POOL_SIZE becomes the limit.
+# Use a RESULT_CACHE_TTL=0 server to measure database-bound throughput rather than cache hits.
+# Needs httpx (pip install httpx), which the API itself does not use. The concurrency
+# claim is checked without a database by tests/test_async_endpoints.py.
+import argparse
+import asyncio
+import time
+
+import httpx
+
+ENDPOINTS = [
+    ("GET", "/api/dashboard/bundle", {"filter": "monthly"}),
+    ("GET", "/api/emission-data/records", {}),
+    ("GET", "/api/ai-insights/predictions", {}),
+    ("GET", "/api/ai-insights/trends", {"data_type": "emissions"}),
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0
+
+
+async def run_level(client, user_id, concurrency, requests_per_worker):
+    latencies, errors = [], 0
+
+    async def worker(index):
+        nonlocal errors
+        for i in range(requests_per_worker):
+            method, path, params = ENDPOINTS[(index + i) % len(ENDPOINTS)]
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, params={"user_id": user_id, **params})
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    print(f"concurrency={concurrency:4d}  requests={len(latencies):5d}  errors={errors:4d}  "
+          f"throughput={len(latencies) / elapsed:8.1f} req/s  "
+          f"p50={percentile(latencies, 50) * 1000:7.1f} ms  p95={percentile(latencies, 95) * 1000:7.1f} ms")
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        for concurrency in args.concurrency:
+            await run_level(client, args.user_id, concurrency, args.requests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure API throughput and latency at several concurrency levels")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 40, 100, 200])
+    parser.add_argument("--requests", type=int, default=20, help="requests per concurrent client")
+    parser.add_argument("--timeout", type=float, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+import os
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from date_ranges import add_months
+
+# Per-location analytics for /api/analytics/locations.
+#
+# Locations differ by type (a plant emits far more than an office by design), so
+# besides raw totals each location gets a type index: its average daily CO2 over
+# the median of same-type locations across the organization's industry peers
+# (1.0 = typical for its type). Everything is computed from LocationMonthlyRollup
+# (see rollups.py) in one query covering the organization and its peers.
+# Peer aggregates of a location type are only returned when at least
+# LOCATION_PEER_MIN_ORGS organizations have locations of that type, so they never
+# reveal a single peer's figures (same rule as BENCHMARK_MIN_ORGS in benchmarks.py).
+
+MIN_PEER_ORGS = int(os.getenv("LOCATION_PEER_MIN_ORGS", 5))
+
+
+def _round(value, digits: int = 2):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def location_analytics_plan(org_id: int, months: int, today: Optional[date] = None):
+    """
+    Query plan (see query_plans.py) for per-location analytics over the last `months`
+    calendar months including the current one
+    Peers are the organizations of the same industry (only the organization itself
+    if it has none); only aggregates of peer locations are returned, and the peer
+    fields (peer_median_daily, peer_percentile, type_index) are None for types with
+    fewer than MIN_PEER_ORGS organizations
+    """
+    current = (today or date.today()).replace(day=1)
+    start, end = add_months(current, 1 - months), add_months(current, 1)
+    rows = yield """
+        SELECT
+            r.org_id,
+            r.location_id,
+            COALESCE(l.name, 'Unknown') as name,
+            COALESCE(l.type, 'unknown') as type,
+            SUM(r.co2_total) as co2,
+            SUM(r.energy_total) as energy,
+            SUM(r.day_count) as days
+        FROM Organizations o
+        JOIN LocationMonthlyRollup r ON r.org_id = o.org_id
+        LEFT JOIN Locations l ON r.location_id = l.location_id
+        WHERE (o.org_id = %s OR o.industry = (SELECT industry FROM Organizations WHERE org_id = %s))
+        AND r.month_start >= %s AND r.month_start < %s
+        GROUP BY r.org_id, r.location_id, l.name, l.type
+    """, (org_id, org_id, start, end)
+
+    frame = pd.DataFrame(list(rows), columns=["org_id", "location_id", "name", "type", "co2", "energy", "days"])
+    frame[["co2", "energy", "days"]] = frame[["co2", "energy", "days"]].astype(float)
+    frame["daily"] = (frame.co2 / frame.days).where(frame.days > 0)
+    frame["intensity"] = (frame.co2 / frame.energy).where(frame.energy > 0)
+    by_type = frame.groupby("type")
+    shared = by_type["org_id"].transform("nunique") >= MIN_PEER_ORGS
+    frame["peer_median_daily"] = by_type["daily"].transform("median").where(shared)
+    frame["peer_locations"] = by_type["location_id"].transform("size")
+    frame["peer_percentile"] = (by_type["daily"].rank(pct=True) * 100).where(shared)
+    frame["type_index"] = (frame.daily / frame.peer_median_daily).where(frame.peer_median_daily > 0)
+
+    own = frame[frame.org_id == org_id].copy()
+    own["rank"] = own.co2.rank(ascending=False, method="min")
+    own["org_percentile"] = own.co2.rank(pct=True) * 100
+    own = own.sort_values("rank")
+
+    locations = [
+        {
+            "location_id": int(row.location_id),
+            "name": row.name,
+            "type": row.type,
+            "total_emissions": _round(row.co2),
+            "total_energy": _round(row.energy),
+            "days_reported": int(row.days),
+            "daily_emissions": _round(row.daily),
+            "intensity": _round(row.intensity, 4),
+            "type_index": _round(row.type_index, 3),
+            "rank": int(row.rank),
+            "org_percentile": _round(row.org_percentile, 1),
+            "peer_percentile": _round(row.peer_percentile, 1),
+            "peer_median_daily": _round(row.peer_median_daily),
+            "peer_locations": int(row.peer_locations)
+        } for row in own.itertuples(index=False)
+    ]
+    types = [
+        {
+            "type": location_type,
+            "locations": int(len(group)),
+            "total_emissions": _round(group.co2.sum()),
+            "daily_emissions": _round(group.daily.mean()),
+            "peer_median_daily": _round(group.peer_median_daily.iloc[0])
+        } for location_type, group in own.groupby("type")
+    ]
+    return {
+        "period": {"start": start.isoformat(), "end": (end - timedelta(days=1)).isoformat()},
+        "peer_organizations": int(frame.org_id.nunique()),
+        "locations": locations,
+        "types": sorted(types, key=lambda item: item["total_emissions"] or 0, reverse=True)
+    }
@@ -4,11 +4,40 @@ import mysql.connector
 import os
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import pandas as pd
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import date, datetime
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import threading
+import time
+from db_pool import get_pool, get_export_pool, close_pool, PoolExhaustedError
+from audit_writer import AuditWriter, write_audit_rows
+from audit_policy import COUNT, LOG, SYNC, AuditPolicy, parse_policy, parse_tier
+from audit_logs import (
+    action_counts_plan, audit_page_query, audit_totals_plan, build_log_filters, decode_cursor, encode_cursor,
+    ensure_audit_schema
+)
+from rollups import backfill_rollups, ensure_rollup_schema
+from forecast_batch import ensure_forecast_schema
+from anomalies import ensure_anomaly_schema
+from insight_store import ensure_insight_schema
+from location_analytics import location_analytics_plan
+from benchmarks import benchmark_plan, ensure_benchmark_schema
+from result_cache import ResultCache
+from identity import IdentityCache, resolve_identity
+from emission_records import default_date_range, emission_records_plan, export_query, parse_date, parse_id_list
+from exports import EXPORT_FORMATS, encode_export, stream_query
+from query_plans import run_plan
+from ai_insights import generate_insight_plan, predictions_plan, recommendations_plan, trends_plan
+from date_ranges import add_months, ensure_recommended_indexes
+from dashboard import (
+    EMPTY_STATS, compute_dashboard_stats, compute_emission_breakdown, compute_emissions_over_time,
+    compute_top_categories
+)
 
 load_dotenv()
 
@@ -48,6 +77,10 @@ class RegisterResponse(BaseModel):
 
 # Database connection
 def get_connection():
+    """
+    Check out a pooled connection (see db_pool.py)
+    Callers keep using connection.close(), which returns it to the pool
+    """
     # Check if all required environment variables are set
     required_vars = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
     missing_vars = [var for var in required_vars if not os.getenv(var)]
@@ -56,21 +89,171 @@ def get_connection():
         raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
     
     try:
-        return mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            port=int(os.getenv("DB_PORT", 3306)),  # Default to 3306 if not set
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-        )
+        return get_pool().acquire()
     except mysql.connector.Error as err:
         raise Exception(f"Failed to connect to database: {err}")
 
+# Connection pool metrics
+@app.get("/api/health/db-pool")
+def get_db_pool_stats():
+    """
+    Get connection pool occupancy and exhaustion metrics
+    """
+    return {"success": True, "pool": get_pool().stats()}
+
 # Helper function to hash password with SHA-256
 def hash_password(password: str) -> str:
     """Hash a password using SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+# Background audit writer - batches AuditLogs inserts off the request path
+audit_writer = AuditWriter(
+    get_connection,
+    max_queue=int(os.getenv("AUDIT_QUEUE_SIZE", 10000)),
+    batch_size=int(os.getenv("AUDIT_BATCH_SIZE", 200)),
+    flush_interval=float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0)),
+    overflow_policy=os.getenv("AUDIT_OVERFLOW_POLICY", "drop_oldest"),
+)
+
+# Audit policy per action; AUDIT_POLICY overrides the defaults, e.g.
+# "SELECT_DASHBOARD_STATS=sample:0.05,VIEW_USERS=count"
+audit_policy = AuditPolicy(
+    overrides=parse_policy(os.getenv("AUDIT_POLICY")),
+    default_tier=parse_tier(os.getenv("AUDIT_DEFAULT_TIER", "log"))
+)
+
+@app.on_event("startup")
+def ensure_support_tables():
+    # Tables owned by the backend itself (rollups etc.) are created on first start
+    try:
+        connection = get_connection()
+        try:
+            ensure_rollup_schema(connection)
+            ensure_recommended_indexes(connection)
+            ensure_audit_schema(connection)
+            ensure_forecast_schema(connection)
+            ensure_anomaly_schema(connection)
+            ensure_insight_schema(connection)
+            ensure_benchmark_schema(connection)
+        finally:
+            connection.close()
+    except Exception as e:
+        print(f"Failed to ensure support tables: {e}")
+
+def run_rollup_backfill():
+    # An existing database gets its rollups built once (see rollups.backfill_rollups);
+    # until then the dashboards show only what has been built so far
+    try:
+        connection = get_connection()
+        try:
+            months = backfill_rollups(connection)
+        finally:
+            connection.close()
+        if months:
+            print(f"Rollup backfill built {months} months")
+    except Exception as e:
+        print(f"Rollup backfill failed, it resumes on the next start: {e}")
+
+@app.on_event("startup")
+def start_background_workers():
+    audit_writer.start()
+    threading.Thread(target=run_rollup_backfill, name="rollup-backfill", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    # Drain queued audit entries before the pool goes away
+    audit_writer.stop()
+    close_pool()
+
+# Audit writer metrics
+@app.get("/api/health/audit-writer")
+def get_audit_writer_stats():
+    """
+    Get audit writer queue depth and flush counters
+    """
+    return {"success": True, "audit_writer": audit_writer.stats(), "audit_policy": audit_policy.stats()}
+
+# Identity cache - user_id -> org_id/role/status, shared by every handler
+identity_cache = IdentityCache(ttl=float(os.getenv("IDENTITY_CACHE_TTL", 30)))
+
+def get_user_identity(user_id: int) -> Optional[dict]:
+    """
+    Get org_id, role and status for a user (None if the user does not exist)
+    Served from identity_cache; update_user_status, update_user_role and
+    delete_user invalidate the affected user
+    """
+    return resolve_identity(identity_cache, get_connection, user_id)
+
+# Result cache for org-scoped aggregates (dashboard and AI insights)
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 2048)),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", 300)),
+)
+RESULT_CACHE_VERSION_POLL = float(os.getenv("RESULT_CACHE_VERSION_POLL", 15))
+_cache_versions_checked_at = 0.0
+_cache_versions_lock = threading.Lock()
+
+def result_cache_versions_due() -> bool:
+    """Claim the next RollupVersions poll; True at most every RESULT_CACHE_VERSION_POLL seconds"""
+    global _cache_versions_checked_at
+    with _cache_versions_lock:
+        if time.monotonic() - _cache_versions_checked_at < RESULT_CACHE_VERSION_POLL:
+            return False
+        _cache_versions_checked_at = time.monotonic()
+        return True
+
+def sync_result_cache():
+    """
+    Drop cached results for organizations whose rollups were refreshed since the last check
+    RollupVersions is polled at most every RESULT_CACHE_VERSION_POLL seconds
+    """
+    if not result_cache_versions_due():
+        return
+    try:
+        connection = get_connection()
+        cursor = connection.cursor()
+        cursor.execute("SELECT org_id, version FROM RollupVersions")
+        versions = dict(cursor.fetchall())
+        cursor.close()
+        connection.close()
+        result_cache.sync_versions(versions)
+    except Exception as e:
+        print(f"Failed to sync result cache versions: {e}")
+
+def result_cache_key(endpoint: str, org_id: int, *parts):
+    """Cache key for an org-scoped result; includes today's date so entries roll over at midnight"""
+    return (endpoint, org_id, *parts, date.today().isoformat())
+
+def cached_result(endpoint: str, org_id: int, compute, *parts):
+    """
+    Return a cached aggregate, computing it with compute() on a miss
+    Call it without holding a connection: compute() checks out its own (see
+    run_pooled_plan), so a hit never touches the pool
+    """
+    sync_result_cache()
+    return result_cache.get_or_compute(result_cache_key(endpoint, org_id, *parts), compute)
+
+def run_pooled_plan(plan):
+    """Run a query plan (see query_plans.py) on its own pooled connection"""
+    connection = get_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            return run_plan(cursor, plan)
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+# Result cache metrics
+@app.get("/api/health/result-cache")
+def get_result_cache_stats():
+    """
+    Get result cache occupancy and hit/miss counters
+    """
+    return {"success": True, "result_cache": result_cache.stats(), "identity_cache": identity_cache.stats()}
+
 # Helper function to log actions to AuditLogs table
 def log_action(user_id: Optional[int], action: str, details: str):
     """
@@ -78,20 +261,35 @@ def log_action(user_id: Optional[int], action: str, details: str):
     - user_id: ID of the user performing the action (can be None for system actions)
     - action: Type of action (e.g., 'LOGIN', 'INSERT', 'UPDATE', 'DELETE', 'SELECT')
     - details: Additional details about the action
+    audit_policy (see audit_policy.py) picks the tier per action: security-relevant
+    actions are written synchronously, read events are sampled or coalesced and
+    otherwise only counted, the rest are queued for the background audit writer.
+    If the writer is not running (e.g. when imported by a script) everything is
+    written synchronously
     """
+    # Rows are stamped with the acting user's organization (see audit_logs.py)
+    org_id = None
+    if user_id is not None:
+        try:
+            identity = get_user_identity(user_id)
+            org_id = identity['org_id'] if identity else None
+        except Exception as e:
+            print(f"Failed to resolve organization for audit entry: {e}")
+    
+    # The audit policy decides whether the entry is written now, queued, or only counted
+    decision = audit_policy.decide(user_id, action)
+    if decision != SYNC and audit_writer.submit(user_id, action, details, org_id, logged=(decision == LOG)):
+        return
+    
     try:
         connection = get_connection()
-        cursor = connection.cursor()
-        
-        insert_query = """
-        INSERT INTO AuditLogs (user_id, action, details, timestamp)
-        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
-        """
-        cursor.execute(insert_query, (user_id, action, details))
-        connection.commit()
-        
-        cursor.close()
-        connection.close()
+        try:
+            if decision == COUNT:
+                write_audit_rows(connection, [], [(user_id, org_id, action, datetime.now())])
+            else:
+                write_audit_rows(connection, [(user_id, org_id, action, details, datetime.now())])
+        finally:
+            connection.close()
     except Exception as e:
         # Don't fail the main operation if logging fails
         print(f"Failed to log action: {e}")
@@ -296,18 +494,17 @@ def get_all_users(admin_id: int = Query(...)):
     Get all users from the same organization (admin only)
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Verify admin role and get admin's org_id
-        cursor.execute("SELECT role, org_id FROM Users WHERE user_id = %s", (admin_id,))
-        admin = cursor.fetchone()
+        admin = get_user_identity(admin_id)
         
         if not admin or admin['role'] != 'admin':
             raise HTTPException(status_code=403, detail="Access denied. Admin privileges required.")
         
         admin_org_id = admin['org_id']
         
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
         # Get users from the same organization only
         # If admin has no org (org_id is NULL), show only users with NULL org_id
         if admin_org_id is None:
@@ -357,13 +554,10 @@ def update_user_status(status_data: UserStatusUpdate, admin_id: int = Query(...)
     """
     Update user status (admin only, same organization)
     """
+    connection = None
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Verify admin role and get admin's org_id
-        cursor.execute("SELECT role, org_id FROM Users WHERE user_id = %s", (admin_id,))
-        admin = cursor.fetchone()
+        admin = get_user_identity(admin_id)
         
         if not admin or admin['role'] != 'admin':
             raise HTTPException(status_code=403, detail="Access denied. Admin privileges required.")
@@ -371,8 +565,7 @@ def update_user_status(status_data: UserStatusUpdate, admin_id: int = Query(...)
         admin_org_id = admin['org_id']
         
         # Verify target user is in the same organization
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (status_data.user_id,))
-        target_user = cursor.fetchone()
+        target_user = get_user_identity(status_data.user_id)
         
         if not target_user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -381,17 +574,21 @@ def update_user_status(status_data: UserStatusUpdate, admin_id: int = Query(...)
         if admin_org_id != target_user['org_id']:
             raise HTTPException(status_code=403, detail="Access denied. Can only manage users from your organization.")
         
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
         # Update user status
         update_query = "UPDATE Users SET status = %s WHERE user_id = %s"
         cursor.execute(update_query, (status_data.status, status_data.user_id))
         connection.commit()
-        
-        # Log the action
-        log_action(admin_id, "UPDATE_USER_STATUS", f"Admin updated user {status_data.user_id} status to {status_data.status}")
+        identity_cache.invalidate(status_data.user_id)
         
         cursor.close()
         connection.close()
         
+        # Log the action
+        log_action(admin_id, "UPDATE_USER_STATUS", f"Admin updated user {status_data.user_id} status to {status_data.status}")
+        
         return {"success": True, "message": "User status updated successfully"}
         
     except HTTPException:
@@ -407,13 +604,10 @@ def update_user_role(role_data: UserRoleUpdate, admin_id: int = Query(...)):
     """
     Update user role (admin only, same organization)
     """
+    connection = None
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Verify admin role and get admin's org_id
-        cursor.execute("SELECT role, org_id FROM Users WHERE user_id = %s", (admin_id,))
-        admin = cursor.fetchone()
+        admin = get_user_identity(admin_id)
         
         if not admin or admin['role'] != 'admin':
             raise HTTPException(status_code=403, detail="Access denied. Admin privileges required.")
@@ -421,8 +615,7 @@ def update_user_role(role_data: UserRoleUpdate, admin_id: int = Query(...)):
         admin_org_id = admin['org_id']
         
         # Verify target user is in the same organization
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (role_data.user_id,))
-        target_user = cursor.fetchone()
+        target_user = get_user_identity(role_data.user_id)
         
         if not target_user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -431,17 +624,21 @@ def update_user_role(role_data: UserRoleUpdate, admin_id: int = Query(...)):
         if admin_org_id != target_user['org_id']:
             raise HTTPException(status_code=403, detail="Access denied. Can only manage users from your organization.")
         
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
         # Update user role
         update_query = "UPDATE Users SET role = %s WHERE user_id = %s"
         cursor.execute(update_query, (role_data.role, role_data.user_id))
         connection.commit()
-        
-        # Log the action
-        log_action(admin_id, "UPDATE_USER_ROLE", f"Admin updated user {role_data.user_id} role to {role_data.role}")
+        identity_cache.invalidate(role_data.user_id)
         
         cursor.close()
         connection.close()
         
+        # Log the action
+        log_action(admin_id, "UPDATE_USER_ROLE", f"Admin updated user {role_data.user_id} role to {role_data.role}")
+        
         return {"success": True, "message": "User role updated successfully"}
         
     except HTTPException:
@@ -457,13 +654,10 @@ def delete_user(user_id: int, admin_id: int = Query(...)):
     """
     Delete user (admin only, same organization)
     """
+    connection = None
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Verify admin role and get admin's org_id
-        cursor.execute("SELECT role, org_id FROM Users WHERE user_id = %s", (admin_id,))
-        admin = cursor.fetchone()
+        admin = get_user_identity(admin_id)
         
         if not admin or admin['role'] != 'admin':
             raise HTTPException(status_code=403, detail="Access denied. Admin privileges required.")
@@ -475,8 +669,7 @@ def delete_user(user_id: int, admin_id: int = Query(...)):
         admin_org_id = admin['org_id']
         
         # Verify target user is in the same organization
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        target_user = cursor.fetchone()
+        target_user = get_user_identity(user_id)
         
         if not target_user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -485,17 +678,21 @@ def delete_user(user_id: int, admin_id: int = Query(...)):
         if admin_org_id != target_user['org_id']:
             raise HTTPException(status_code=403, detail="Access denied. Can only manage users from your organization.")
         
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
         # Delete user
         delete_query = "DELETE FROM Users WHERE user_id = %s"
         cursor.execute(delete_query, (user_id,))
         connection.commit()
-        
-        # Log the action
-        log_action(admin_id, "DELETE_USER", f"Admin deleted user {user_id}")
+        identity_cache.invalidate(user_id)
         
         cursor.close()
         connection.close()
         
+        # Log the action
+        log_action(admin_id, "DELETE_USER", f"Admin deleted user {user_id}")
+        
         return {"success": True, "message": "User deleted successfully"}
         
     except HTTPException:
@@ -508,20 +705,36 @@ def delete_user(user_id: int, admin_id: int = Query(...)):
 
 # Dashboard endpoints
 
-@app.get("/api/dashboard/stats")
-def get_dashboard_stats(user_id: int = Query(...)):
+def run_dashboard_query(compute, org_id: int, *args):
     """
-    Get dashboard statistics for user's organization
-    Always shows current month data (not affected by filters)
-    Comparison uses same number of days from last month
+    Run one dashboard aggregation on its own pooled connection
+    Used by the bundle endpoint to execute the aggregations concurrently
     """
+    connection = get_connection()
     try:
-        connection = get_connection()
         cursor = connection.cursor(dictionary=True)
-        
+        try:
+            return compute(cursor, org_id, *args)
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+dashboard_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DASHBOARD_WORKERS", 8)),
+    thread_name_prefix="dashboard"
+)
+
+@app.get("/api/dashboard/bundle")
+def get_dashboard_bundle(user_id: int = Query(...), filter: str = Query("monthly")):
+    """
+    Get stats, emissions over time, breakdown and top categories in one call
+    The user is resolved once and the four aggregations run concurrently
+    Filter applies to everything except stats (same as the individual endpoints)
+    """
+    try:
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -529,67 +742,74 @@ def get_dashboard_stats(user_id: int = Query(...)):
         org_id = user['org_id']
         
         if org_id is None:
-            # Individual user - return empty/default stats
             return {
                 "success": True,
-                "stats": {
-                    "total_emissions": 0,
-                    "emission_reduction": 0,
-                    "energy_usage": 0,
-                    "offset_achieved": 0
-                }
+                "stats": dict(EMPTY_STATS),
+                "emissions_over_time": [],
+                "breakdown": [],
+                "top_categories": []
             }
         
-        # Get current month's emissions (from 1st to today)
-        query_current = """
-        SELECT COALESCE(SUM(co2_emitted), 0) as total_emissions,
-               COALESCE(SUM(energy_consumed), 0) as total_energy
-        FROM DailyEmissions
-        WHERE org_id = %s 
-        AND MONTH(record_date) = MONTH(CURRENT_DATE()) 
-        AND YEAR(record_date) = YEAR(CURRENT_DATE())
-        AND DAY(record_date) <= DAY(CURRENT_DATE())
-        """
-        cursor.execute(query_current, (org_id,))
-        current_month = cursor.fetchone()
-        
-        # Get last month's emissions for the same number of days
-        # For example, if today is Oct 29, compare with Sep 1-29
-        query_last_month = """
-        SELECT COALESCE(SUM(co2_emitted), 0) as total_emissions
-        FROM DailyEmissions
-        WHERE org_id = %s 
-        AND MONTH(record_date) = MONTH(DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH))
-        AND YEAR(record_date) = YEAR(DATE_SUB(CURRENT_DATE(), INTERVAL 1 MONTH))
-        AND DAY(record_date) <= DAY(CURRENT_DATE())
-        """
-        cursor.execute(query_last_month, (org_id,))
-        last_month = cursor.fetchone()
+        # Cached parts are returned straight away; misses run on their own pooled connection
+        futures = {
+            "stats": dashboard_executor.submit(
+                cached_result, "dashboard.stats", org_id,
+                partial(run_dashboard_query, compute_dashboard_stats, org_id)
+            ),
+            "emissions_over_time": dashboard_executor.submit(
+                cached_result, "dashboard.emissions_over_time", org_id,
+                partial(run_dashboard_query, compute_emissions_over_time, org_id, filter), filter
+            ),
+            "breakdown": dashboard_executor.submit(
+                cached_result, "dashboard.breakdown", org_id,
+                partial(run_dashboard_query, compute_emission_breakdown, org_id, filter), filter
+            ),
+            "top_categories": dashboard_executor.submit(
+                cached_result, "dashboard.top_categories", org_id,
+                partial(run_dashboard_query, compute_top_categories, org_id, filter), filter
+            ),
+        }
+        result = {key: future.result() for key, future in futures.items()}
         
-        # Calculate reduction percentage
-        emission_reduction = 0
-        if last_month['total_emissions'] > 0:
-            emission_reduction = ((last_month['total_emissions'] - current_month['total_emissions']) 
-                                / last_month['total_emissions'] * 100)
+        # Log the data retrieval
+        log_action(user_id, "SELECT_DASHBOARD_STATS", f"User retrieved dashboard bundle (filter: {filter})")
         
-        # Calculate offset (simplified - 10% of emissions for demo)
-        offset_achieved = current_month['total_emissions'] * 0.10
+        return {"success": True, **result}
         
-        cursor.close()
-        connection.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@app.get("/api/dashboard/stats")
+def get_dashboard_stats(user_id: int = Query(...)):
+    """
+    Get dashboard statistics for user's organization
+    Always shows current month data (not affected by filters)
+    Comparison uses same number of days from last month
+    """
+    try:
+        # Get user's org_id
+        user = get_user_identity(user_id)
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        org_id = user['org_id']
+        
+        if org_id is None:
+            # Individual user - return empty/default stats
+            return {"success": True, "stats": dict(EMPTY_STATS)}
+        
+        stats = cached_result(
+            "dashboard.stats", org_id, partial(run_dashboard_query, compute_dashboard_stats, org_id)
+        )
         
         # Log the data retrieval
         log_action(user_id, "SELECT_DASHBOARD_STATS", f"User retrieved dashboard statistics")
         
-        return {
-            "success": True,
-            "stats": {
-                "total_emissions": round(current_month['total_emissions'], 2),
-                "emission_reduction": round(emission_reduction, 2),
-                "energy_usage": round(current_month['total_energy'], 2),
-                "offset_achieved": round(offset_achieved, 2)
-            }
-        }
+        return {"success": True, "stats": stats}
         
     except HTTPException:
         raise
@@ -601,15 +821,11 @@ def get_dashboard_stats(user_id: int = Query(...)):
 def get_emissions_over_time(user_id: int = Query(...), filter: str = Query("monthly")):
     """
     Get emissions data over time based on filter
-    Filter: daily (last 30 days), weekly (last 12 weeks), monthly (all 12 months of current year)
+    Filter: daily (last 30 days), weekly (last 10 weeks), monthly (all 12 months of current year)
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -619,82 +835,12 @@ def get_emissions_over_time(user_id: int = Query(...), filter: str = Query("mont
         if org_id is None:
             return {"success": True, "data": []}
         
-        # Build query based on filter
-        if filter == "daily":
-            # Last 30 days with recursive CTE to ensure all days show up
-            query = """
-            WITH RECURSIVE date_range AS (
-                SELECT DATE_SUB(CURDATE(), INTERVAL 29 DAY) as date
-                UNION ALL
-                SELECT DATE_ADD(date, INTERVAL 1 DAY)
-                FROM date_range
-                WHERE date < CURDATE()
-            )
-            SELECT 
-                DATE_FORMAT(dr.date, '%d %b') as month,
-                COALESCE(SUM(de.co2_emitted), 0) as emissions
-            FROM date_range dr
-            LEFT JOIN DailyEmissions de ON DATE(de.record_date) = dr.date AND de.org_id = %s
-            GROUP BY dr.date, DATE_FORMAT(dr.date, '%d %b')
-            ORDER BY dr.date ASC
-            """
-            cursor.execute(query, (org_id,))
-        elif filter == "weekly":
-            # Last 10 weeks with actual week numbers
-            query = """
-            WITH RECURSIVE week_range AS (
-                SELECT 
-                    DATE_SUB(CURDATE(), INTERVAL 9 WEEK) as week_start,
-                    WEEK(DATE_SUB(CURDATE(), INTERVAL 9 WEEK), 1) as week_num
-                UNION ALL
-                SELECT 
-                    DATE_ADD(week_start, INTERVAL 7 DAY),
-                    WEEK(DATE_ADD(week_start, INTERVAL 7 DAY), 1)
-                FROM week_range
-                WHERE DATE_ADD(week_start, INTERVAL 7 DAY) <= CURDATE()
-            )
-            SELECT 
-                CONCAT('W', wr.week_num) as month,
-                COALESCE(SUM(de.co2_emitted), 0) as emissions
-            FROM week_range wr
-            LEFT JOIN DailyEmissions de ON 
-                YEARWEEK(de.record_date, 1) = YEARWEEK(wr.week_start, 1)
-                AND de.org_id = %s
-            GROUP BY wr.week_num, wr.week_start
-            ORDER BY wr.week_start ASC
-            """
-            cursor.execute(query, (org_id,))
-        else:  # monthly - all 12 months of current year
-            query = """
-            WITH RECURSIVE month_range AS (
-                SELECT 1 as month_num
-                UNION ALL
-                SELECT month_num + 1
-                FROM month_range
-                WHERE month_num < 12
-            )
-            SELECT 
-                DATE_FORMAT(DATE(CONCAT(YEAR(CURDATE()), '-', LPAD(mr.month_num, 2, '0'), '-01')), '%b') as month,
-                COALESCE(SUM(de.co2_emitted), 0) as emissions
-            FROM month_range mr
-            LEFT JOIN DailyEmissions de ON 
-                MONTH(de.record_date) = mr.month_num 
-                AND YEAR(de.record_date) = YEAR(CURDATE())
-                AND de.org_id = %s
-            GROUP BY mr.month_num
-            ORDER BY mr.month_num ASC
-            """
-            cursor.execute(query, (org_id,))
-        
-        data = cursor.fetchall()
-        
-        # Format data
-        result = [{"month": row['month'], "emissions": round(row['emissions'], 2)} for row in data]
-        
-        cursor.close()
-        connection.close()
+        data = cached_result(
+            "dashboard.emissions_over_time", org_id,
+            partial(run_dashboard_query, compute_emissions_over_time, org_id, filter), filter
+        )
         
-        return {"success": True, "data": result}
+        return {"success": True, "data": data}
         
     except HTTPException:
         raise
@@ -709,12 +855,8 @@ def get_emission_breakdown(user_id: int = Query(...), filter: str = Query("month
     Filter: daily (today), weekly (this week), monthly (this month)
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -724,45 +866,12 @@ def get_emission_breakdown(user_id: int = Query(...), filter: str = Query("month
         if org_id is None:
             return {"success": True, "data": []}
         
-        # Determine date range based on filter
-        if filter == "daily":
-            date_condition = "DATE(de.record_date) = CURDATE()"
-        elif filter == "weekly":
-            date_condition = "YEARWEEK(de.record_date, 1) = YEARWEEK(CURDATE(), 1)"
-        else:  # monthly
-            date_condition = "MONTH(de.record_date) = MONTH(CURRENT_DATE()) AND YEAR(de.record_date) = YEAR(CURRENT_DATE())"
-        
-        # Get breakdown by category for current period
-        query = f"""
-        SELECT 
-            COALESCE(ec.name, 'Unknown') as scope,
-            COALESCE(SUM(de.co2_emitted), 0) as total_emissions
-        FROM DailyEmissions de
-        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
-        WHERE de.org_id = %s 
-        AND {date_condition}
-        GROUP BY ec.name
-        ORDER BY total_emissions DESC
-        """
-        cursor.execute(query, (org_id,))
-        data = cursor.fetchall()
-        
-        # Calculate total for percentages
-        total = sum(row['total_emissions'] for row in data)
-        
-        result = []
-        for row in data:
-            percentage = (row['total_emissions'] / total * 100) if total > 0 else 0
-            result.append({
-                "scope": row['scope'],
-                "emissions": round(row['total_emissions'], 2),
-                "percentage": round(percentage, 2)
-            })
-        
-        cursor.close()
-        connection.close()
+        data = cached_result(
+            "dashboard.breakdown", org_id,
+            partial(run_dashboard_query, compute_emission_breakdown, org_id, filter), filter
+        )
         
-        return {"success": True, "data": result}
+        return {"success": True, "data": data}
         
     except HTTPException:
         raise
@@ -777,12 +886,8 @@ def get_top_emission_categories(user_id: int = Query(...), filter: str = Query("
     Filter: daily (today), weekly (this week), monthly (this month)
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -792,33 +897,10 @@ def get_top_emission_categories(user_id: int = Query(...), filter: str = Query("
         if org_id is None:
             return {"success": True, "data": []}
         
-        # Determine date range based on filter
-        if filter == "daily":
-            date_condition = "DATE(de.record_date) = CURDATE()"
-        elif filter == "weekly":
-            date_condition = "YEARWEEK(de.record_date, 1) = YEARWEEK(CURDATE(), 1)"
-        else:  # monthly
-            date_condition = "MONTH(de.record_date) = MONTH(CURRENT_DATE()) AND YEAR(de.record_date) = YEAR(CURRENT_DATE())"
-        
-        # Get top 3 categories
-        query = f"""
-        SELECT 
-            COALESCE(ec.name, 'Unknown') as category_name,
-            COALESCE(SUM(de.co2_emitted), 0) as total_emissions,
-            COUNT(DISTINCT de.location_id) as location_count
-        FROM DailyEmissions de
-        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
-        WHERE de.org_id = %s 
-        AND {date_condition}
-        GROUP BY ec.category_id, ec.name
-        ORDER BY total_emissions DESC
-        LIMIT 3
-        """
-        cursor.execute(query, (org_id,))
-        data = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
+        data = cached_result(
+            "dashboard.top_categories", org_id,
+            partial(run_dashboard_query, compute_top_categories, org_id, filter), filter
+        )
         
         return {"success": True, "data": data}
         
@@ -828,6 +910,85 @@ def get_top_emission_categories(user_id: int = Query(...), filter: str = Query("
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
 
+@app.get("/api/analytics/locations")
+def get_location_analytics(user_id: int = Query(...), months: int = Query(3)):
+    """
+    Per-location totals, type-normalized intensity, rank within the organization
+    and comparison with same-type locations of industry peers
+    - months: calendar months to cover, including the current one (1-24)
+    """
+    try:
+        # Get user's org_id
+        user = get_user_identity(user_id)
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        org_id = user['org_id']
+        
+        if org_id is None:
+            raise HTTPException(status_code=400, detail="User is not associated with an organization")
+        
+        if not 1 <= months <= 24:
+            raise HTTPException(status_code=400, detail="months must be between 1 and 24")
+        
+        data = cached_result(
+            "analytics.locations", org_id, lambda: run_pooled_plan(location_analytics_plan(org_id, months)), months
+        )
+        
+        log_action(user_id, "VIEW_LOCATION_ANALYTICS", f"User retrieved location analytics ({months} months)")
+        
+        return {"success": True, **data}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@app.get("/api/benchmarks")
+def get_industry_benchmark(user_id: int = Query(...), month: str = Query(None)):
+    """
+    The organization's percentile among organizations of its industry (see benchmarks.py)
+    - month: YYYY-MM (default: last month, the latest complete one)
+    """
+    try:
+        # Get user's org_id
+        user = get_user_identity(user_id)
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        org_id = user['org_id']
+        
+        if org_id is None:
+            raise HTTPException(status_code=400, detail="User is not associated with an organization")
+        
+        if month:
+            try:
+                month_start = datetime.strptime(month, "%Y-%m").date()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="month must be in YYYY-MM format")
+        else:
+            month_start = add_months(date.today().replace(day=1), -1)
+        
+        data = cached_result(
+            "benchmarks", org_id, lambda: run_pooled_plan(benchmark_plan(org_id, month_start)), month_start
+        )
+        
+        if data is None:
+            raise HTTPException(status_code=404, detail="Organization has no industry to benchmark against")
+        
+        log_action(user_id, "VIEW_BENCHMARKS", f"User retrieved industry benchmarks ({month_start:%Y-%m})")
+        
+        return {"success": True, **data}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
 @app.get("/api/emission-data/records")
 def get_emission_records(
     user_id: int = Query(...), 
@@ -844,12 +1005,8 @@ def get_emission_records(
     - category_ids: Comma-separated category IDs
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -867,134 +1024,19 @@ def get_emission_records(
                 "categories": []
             }
         
-        # Default date range to last 30 days if not provided
-        if not start_date:
-            cursor.execute("SELECT DATE_SUB(CURDATE(), INTERVAL 30 DAY) as default_start")
-            start_date = cursor.fetchone()['default_start'].strftime('%Y-%m-%d')
-        
-        if not end_date:
-            cursor.execute("SELECT CURDATE() as default_end")
-            end_date = cursor.fetchone()['default_end'].strftime('%Y-%m-%d')
-        
-        # Build WHERE clause dynamically
-        where_conditions = ["de.org_id = %s", "de.record_date >= %s", "de.record_date <= %s"]
-        params = [org_id, start_date, end_date]
-        
-        if location_ids:
-            location_list = [int(loc_id.strip()) for loc_id in location_ids.split(',') if loc_id.strip()]
-            if location_list:
-                placeholders = ','.join(['%s'] * len(location_list))
-                where_conditions.append(f"de.location_id IN ({placeholders})")
-                params.extend(location_list)
-        
-        if category_ids:
-            category_list = [int(cat_id.strip()) for cat_id in category_ids.split(',') if cat_id.strip()]
-            if category_list:
-                placeholders = ','.join(['%s'] * len(category_list))
-                where_conditions.append(f"de.category_id IN ({placeholders})")
-                params.extend(category_list)
-        
-        where_clause = " AND ".join(where_conditions)
-        
-        # Get summary stats
-        summary_query = f"""
-        SELECT 
-            COALESCE(SUM(co2_emitted), 0) as total_emissions,
-            COALESCE(AVG(co2_emitted), 0) as average_per_day,
-            COUNT(DISTINCT record_date) as days_count
-        FROM DailyEmissions de
-        WHERE {where_clause}
-        """
-        cursor.execute(summary_query, params)
-        summary = cursor.fetchone()
-
-        # Calculate previous period for comparison (same length as current period)
-        cursor.execute("SELECT DATEDIFF(%s, %s) as days_diff", (end_date, start_date))
-        days_diff = cursor.fetchone()['days_diff']
-        
-        prev_period_query = f"""
-        SELECT COALESCE(SUM(co2_emitted), 0) as prev_emissions
-        FROM DailyEmissions de
-        WHERE de.org_id = %s 
-        AND de.record_date >= DATE_SUB(%s, INTERVAL {days_diff + 1} DAY)
-        AND de.record_date < %s
-        """
-        cursor.execute(prev_period_query, (org_id, start_date, start_date))
-        prev_period = cursor.fetchone()
-        
-        # Calculate change percentage
-        change_from_last_period = 0
-        if prev_period['prev_emissions'] > 0:
-            change_from_last_period = ((summary['total_emissions'] - prev_period['prev_emissions']) / prev_period['prev_emissions'] * 100)
-        
-        # Get emissions over time grouped by date AND category (for multi-line chart)
-        emissions_time_query = f"""
-        SELECT 
-            DATE(de.record_date) as date,
-            COALESCE(ec.name, 'Unknown') as category,
-            ec.category_id,
-            COALESCE(SUM(de.co2_emitted), 0) as value
-        FROM DailyEmissions de
-        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
-        WHERE {where_clause}
-        GROUP BY DATE(de.record_date), ec.category_id, ec.name
-        ORDER BY DATE(de.record_date) ASC, ec.name ASC
-        """
-        cursor.execute(emissions_time_query, params)
-        emissions_over_time = cursor.fetchall()
-        
-        # Get category breakdown
-        category_query = f"""
-        SELECT 
-            COALESCE(ec.name, 'Unknown') as category,
-            ec.category_id,
-            COALESCE(SUM(de.co2_emitted), 0) as value
-        FROM DailyEmissions de
-        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
-        WHERE {where_clause}
-        GROUP BY ec.category_id, ec.name
-        ORDER BY value DESC
-        """
-        cursor.execute(category_query, params)
-        category_breakdown = cursor.fetchall()
-        
-        # Get detailed emission records (Recent Emissions - NOT filtered, always show latest 50)
-        records_query = """
-        SELECT 
-            de.emission_id as id,
-            DATE_FORMAT(de.record_date, '%Y-%m-%d') as date,
-            COALESCE(ec.name, 'Unknown') as category,
-            COALESCE(l.name, 'Unknown') as source,
-            de.co2_emitted as value,
-            'kg CO2' as unit
-        FROM DailyEmissions de
-        LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
-        LEFT JOIN Locations l ON de.location_id = l.location_id
-        WHERE de.org_id = %s 
-        ORDER BY de.record_date DESC, de.emission_id DESC
-        LIMIT 50
-        """
-        cursor.execute(records_query, (org_id,))
-        records = cursor.fetchall()
-        
-        # Get available locations for this organization (for dropdown)
-        locations_query = """
-        SELECT location_id, name
-        FROM Locations
-        WHERE org_id = %s
-        ORDER BY name ASC
-        """
-        cursor.execute(locations_query, (org_id,))
-        locations = cursor.fetchall()
+        # Resolve the date range and comparison period in Python (no SQL round-trips)
+        try:
+            start, end = default_date_range(start_date, end_date)
+            location_list = parse_id_list(location_ids)
+            category_list = parse_id_list(category_ids)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid filter: dates must be YYYY-MM-DD and IDs integers")
+        start_date, end_date = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
         
-        # Get all emission categories (for multi-select)
-        categories_query = """
-        SELECT category_id, name
-        FROM EmissionCategories
-        ORDER BY name ASC
-        """
-        cursor.execute(categories_query)
-        categories = cursor.fetchall()
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
+        payload = run_plan(cursor, emission_records_plan(org_id, start, end, location_list, category_list))
         
         cursor.close()
         connection.close()
@@ -1002,41 +1044,71 @@ def get_emission_records(
         # Log the data retrieval
         log_action(user_id, "SELECT_EMISSION_RECORDS", f"User retrieved emission records (date range: {start_date} to {end_date})")
         
-        return {
-            "success": True,
-            "summary": {
-                "total_emissions": round(summary['total_emissions'], 2),
-                "average_per_day": round(summary['average_per_day'], 2),
-                "change_from_last_period": round(change_from_last_period, 2)
-            },
-            "emissions_over_time": [
-                {
-                    "date": str(row['date']), 
-                    "category": row['category'],
-                    "category_id": row['category_id'],
-                    "value": round(row['value'], 2)
-                } for row in emissions_over_time
-            ],
-            "category_breakdown": [
-                {
-                    "category": row['category'], 
-                    "category_id": row['category_id'],
-                    "value": round(row['value'], 2)
-                } for row in category_breakdown
-            ],
-            "records": [
-                {
-                    "id": row['id'], 
-                    "date": row['date'], 
-                    "category": row['category'], 
-                    "source": row['source'], 
-                    "value": round(row['value'], 2), 
-                    "unit": row['unit']
-                } for row in records
-            ],
-            "locations": [{"location_id": loc['location_id'], "name": loc['name']} for loc in locations],
-            "categories": [{"category_id": cat['category_id'], "name": cat['name']} for cat in categories]
-        }
+        return {"success": True, **payload}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@app.get("/api/emission-data/export")
+def export_emission_records(
+    user_id: int = Query(...),
+    format: str = Query("csv"),
+    start_date: str = Query(None),
+    end_date: str = Query(None),
+    location_ids: str = Query(None),
+    category_ids: str = Query(None)
+):
+    """
+    Export every emission record matching the filters as CSV or NDJSON
+    - format: 'csv' or 'ndjson'
+    - start_date, end_date, location_ids, category_ids: same as /api/emission-data/records
+    Rows are streamed from a server-side cursor in chunks of EXPORT_CHUNK_SIZE,
+    so memory use does not grow with the size of the export
+    """
+    try:
+        if format not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid format: must be one of {', '.join(EXPORT_FORMATS)}")
+        
+        # Get user's org_id
+        user = get_user_identity(user_id)
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        org_id = user['org_id']
+        
+        if org_id is None:
+            raise HTTPException(status_code=400, detail="User is not associated with an organization")
+        
+        try:
+            start, end = default_date_range(start_date, end_date)
+            location_list = parse_id_list(location_ids)
+            category_list = parse_id_list(category_ids)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid filter: dates must be YYYY-MM-DD and IDs integers")
+        start_date, end_date = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+        
+        # Log the export first: the audit write may need a pooled connection of its own
+        log_action(user_id, "EXPORT_EMISSION_RECORDS", f"User exported emission records as {format} (date range: {start_date} to {end_date})")
+        
+        # The connection stays checked out until the stream finishes, so it comes
+        # from the export pool rather than the request pool
+        try:
+            connection = get_export_pool().acquire()
+        except PoolExhaustedError:
+            raise HTTPException(status_code=503, detail="Too many exports in progress, try again shortly")
+        sql, params = export_query(org_id, start, end, location_list, category_list)
+        chunks = stream_query(connection, sql, params, chunk_size=int(os.getenv("EXPORT_CHUNK_SIZE", 5000)))
+        
+        filename = f"emissions_{org_id}_{start_date}_{end_date}.{format}"
+        return StreamingResponse(
+            encode_export(format, chunks),
+            media_type=EXPORT_FORMATS[format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
         
     except HTTPException:
         raise
@@ -1049,96 +1121,74 @@ def get_emission_records(
 def get_audit_logs(
     admin_id: int = Query(...),
     limit: int = Query(100),
+    cursor: str = Query(None),
     offset: int = Query(0),
     action_filter: str = Query(None),
-    user_filter: int = Query(None)
+    user_filter: int = Query(None),
+    start_date: str = Query(None),
+    end_date: str = Query(None)
 ):
     """
-    Get audit logs (admin only)
+    Get audit logs (admin only), newest first
     - limit: Number of records to return (default 100)
-    - offset: Pagination offset (default 0)
+    - cursor: next_cursor from the previous page (omit for the first page)
+    - offset: Legacy pagination offset, ignored when cursor is given
     - action_filter: Filter by action type (optional)
     - user_filter: Filter by user_id (optional)
+    - start_date, end_date: Only entries on these days (YYYY-MM-DD, optional);
+      reads only the matching monthly partitions
+    total_count and action_stats are read from the AuditActionCounts counters
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Verify admin role
-        cursor.execute("SELECT role, org_id FROM Users WHERE user_id = %s", (admin_id,))
-        admin = cursor.fetchone()
+        admin = get_user_identity(admin_id)
         
         if not admin or admin['role'] != 'admin':
             raise HTTPException(status_code=403, detail="Access denied. Admin privileges required.")
         
         admin_org_id = admin['org_id']
         
-        # Build WHERE clause for filtering
-        where_conditions = []
-        params = []
-        
-        # Filter by organization - only show logs from users in the same org
-        if admin_org_id is not None:
-            where_conditions.append("(al.user_id IN (SELECT user_id FROM Users WHERE org_id = %s) OR al.user_id IS NULL)")
-            params.append(admin_org_id)
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            since = parse_date(start_date) if start_date else None
+            until = parse_date(end_date) if end_date else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date: must be YYYY-MM-DD")
+        limit = max(1, min(limit, 1000))
         
-        if action_filter:
-            where_conditions.append("al.action LIKE %s")
-            params.append(f"%{action_filter}%")
+        filters = build_log_filters(action_filter, user_filter, since, until)
         
-        if user_filter:
-            where_conditions.append("al.user_id = %s")
-            params.append(user_filter)
-        
-        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-        
-        # Get total count
-        count_query = f"""
-        SELECT COUNT(*) as total
-        FROM AuditLogs al
-        WHERE {where_clause}
-        """
-        cursor.execute(count_query, params)
-        total_count = cursor.fetchone()['total']
-        
-        # Get audit logs with user information
-        params_with_pagination = params + [limit, offset]
-        logs_query = f"""
-        SELECT 
-            al.log_id,
-            al.user_id,
-            u.name as user_name,
-            u.email as user_email,
-            al.action,
-            al.details,
-            al.timestamp
-        FROM AuditLogs al
-        LEFT JOIN Users u ON al.user_id = u.user_id
-        WHERE {where_clause}
-        ORDER BY al.timestamp DESC
-        LIMIT %s OFFSET %s
-        """
-        cursor.execute(logs_query, params_with_pagination)
-        logs = cursor.fetchall()
-        
-        # Get action statistics
-        stats_query = f"""
-        SELECT 
-            al.action,
-            COUNT(*) as count
-        FROM AuditLogs al
-        WHERE {where_clause}
-        GROUP BY al.action
-        ORDER BY count DESC
-        """
-        cursor.execute(stats_query, params)
-        action_stats = cursor.fetchall()
-        
-        cursor.close()
+        connection = get_connection()
+        db_cursor = connection.cursor(dictionary=True)
+        
+        # Get one page more than asked for, to know whether another page follows
+        sql, params = audit_page_query(admin_org_id, filters, after, limit + 1, 0 if after else offset)
+        db_cursor.execute(sql, params)
+        logs = db_cursor.fetchall()
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+        next_cursor = encode_cursor(logs[-1]) if has_more else None
+        
+        # Totals and action statistics come from the AuditActionCounts counters; they
+        # do not track users, so a user filter counts the log itself (cached for AUDIT_STATS_TTL seconds)
+        if not user_filter:
+            total_count, action_stats = run_plan(db_cursor, action_counts_plan(admin_org_id, action_filter, since, until))
+        else:
+            stats_key = ("audit.stats", admin_org_id, action_filter, user_filter, since, until)
+            totals = result_cache.get(stats_key)
+            if totals is None:
+                totals = run_plan(db_cursor, audit_totals_plan(admin_org_id, filters))
+                result_cache.set(stats_key, totals, ttl=float(os.getenv("AUDIT_STATS_TTL", 60)))
+            total_count, action_stats = totals
+        
+        db_cursor.close()
         connection.close()
         
         # Log this action
-        log_action(admin_id, "VIEW_AUDIT_LOGS", f"Admin viewed audit logs (limit: {limit}, offset: {offset})")
+        log_action(admin_id, "VIEW_AUDIT_LOGS", f"Admin viewed audit logs (limit: {limit}, {'cursor' if cursor else f'offset: {offset}'})")
         
         # Convert timestamps to strings
         for log in logs:
@@ -1149,7 +1199,9 @@ def get_audit_logs(
             "success": True,
             "total_count": total_count,
             "logs": logs,
-            "action_stats": action_stats
+            "action_stats": action_stats,
+            "next_cursor": next_cursor,
+            "has_more": has_more
         }
         
     except HTTPException:
@@ -1166,12 +1218,8 @@ def get_ai_predictions(user_id: int = Query(...)):
     Get AI predictions for next month's emissions, energy, and trends
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1181,76 +1229,26 @@ def get_ai_predictions(user_id: int = Query(...)):
         if org_id is None:
             raise HTTPException(status_code=400, detail="User is not associated with an organization")
         
-        # Get current month's emissions and energy
-        cursor.execute("""
-            SELECT 
-                COALESCE(SUM(co2_emitted), 0) as current_month_emissions,
-                COALESCE(SUM(energy_consumed), 0) as current_month_energy
-            FROM DailyEmissions
-            WHERE org_id = %s 
-            AND MONTH(record_date) = MONTH(CURRENT_DATE()) 
-            AND YEAR(record_date) = YEAR(CURRENT_DATE())
-        """, (org_id,))
-        current_month = cursor.fetchone()
-        
-        # Get last 6 months average for prediction
-        cursor.execute("""
-            SELECT 
-                COALESCE(AVG(monthly_emissions), 0) as avg_emissions,
-                COALESCE(AVG(monthly_energy), 0) as avg_energy
-            FROM (
-                SELECT 
-                    SUM(co2_emitted) as monthly_emissions,
-                    SUM(energy_consumed) as monthly_energy
-                FROM DailyEmissions
-                WHERE org_id = %s 
-                AND record_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 6 MONTH)
-                GROUP BY YEAR(record_date), MONTH(record_date)
-            ) as monthly_data
-        """, (org_id,))
-        avg_data = cursor.fetchone()
-        
-        # Simple prediction: average of last 6 months with slight downward trend
-        predicted_next_month_emissions = round(avg_data['avg_emissions'] * 0.95, 2)
-        predicted_next_month_energy = round(avg_data['avg_energy'] * 0.96, 2)
-        
-        emissions_change = round(((predicted_next_month_emissions - current_month['current_month_emissions']) / current_month['current_month_emissions'] * 100) if current_month['current_month_emissions'] > 0 else 0, 2)
-        energy_change = round(((predicted_next_month_energy - current_month['current_month_energy']) / current_month['current_month_energy'] * 100) if current_month['current_month_energy'] > 0 else 0, 2)
-        
-        # Get top risk sources (categories with highest emissions)
-        cursor.execute("""
-            SELECT 
-                COALESCE(ec.name, 'Unknown') as category_name,
-                COALESCE(SUM(de.co2_emitted), 0) as total_emissions
-            FROM DailyEmissions de
-            LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
-            WHERE de.org_id = %s 
-            AND de.record_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 3 MONTH)
-            GROUP BY ec.category_id, ec.name
-            ORDER BY total_emissions DESC
-            LIMIT 3
-        """, (org_id,))
-        top_risk_sources = [row['category_name'] for row in cursor.fetchall()]
+        sync_result_cache()
+        cache_key = result_cache_key("ai.predictions", org_id)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
+        predictions = run_plan(cursor, predictions_plan(org_id))
         
         cursor.close()
         connection.close()
         
-        return {
+        response = {
             "success": True,
-            "predictions": {
-                "next_month_emissions": {
-                    "value": predicted_next_month_emissions,
-                    "change": emissions_change,
-                    "trend": "down" if emissions_change < 0 else "up"
-                },
-                "next_month_energy": {
-                    "value": predicted_next_month_energy,
-                    "change": energy_change,
-                    "trend": "down" if energy_change < 0 else "up"
-                },
-                "top_risk_sources": top_risk_sources
-            }
+            "predictions": predictions
         }
+        result_cache.set(cache_key, response)
+        return response
         
     except HTTPException:
         raise
@@ -1265,12 +1263,8 @@ def get_ai_trends(user_id: int = Query(...), data_type: str = Query("emissions")
     data_type: 'emissions' or 'energy'
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1280,64 +1274,27 @@ def get_ai_trends(user_id: int = Query(...), data_type: str = Query("emissions")
         if org_id is None:
             raise HTTPException(status_code=400, detail="User is not associated with an organization")
         
-        # Determine which column to query
-        data_column = "co2_emitted" if data_type == "emissions" else "energy_consumed"
-        
-        # Get last 6 months of actual data
-        cursor.execute(f"""
-            SELECT 
-                YEAR(record_date) as year_val,
-                MONTH(record_date) as month_num,
-                COALESCE(SUM({data_column}), 0) as value
-            FROM DailyEmissions
-            WHERE org_id = %s 
-            AND record_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 6 MONTH)
-            AND record_date <= CURRENT_DATE()
-            GROUP BY YEAR(record_date), MONTH(record_date)
-            ORDER BY YEAR(record_date), MONTH(record_date)
-        """, (org_id,))
-        
-        actual_data = cursor.fetchall()
+        sync_result_cache()
+        cache_key = result_cache_key("ai.trends", org_id, data_type)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
+        trend_data = run_plan(cursor, trends_plan(org_id, data_type))
         
         cursor.close()
         connection.close()
         
-        # Month names for formatting
-        month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        
-        # Create trend data with actual and predicted values
-        trend_data = []
-        
-        # Add actual data
-        for row in actual_data:
-            month_idx = row['month_num'] - 1  # Convert 1-12 to 0-11
-            trend_data.append({
-                "month": month_names[month_idx],
-                "actual": round(row['value'], 2),
-                "predicted": round(row['value'] * 0.98, 2)
-            })
-        
-        # Add 3 months of future predictions
-        if trend_data:
-            last_value = trend_data[-1]['actual']
-            month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-            current_month = datetime.now().month  # 1-12
-            
-            for i in range(3):
-                # Calculate next month (1-indexed)
-                next_month = ((current_month - 1 + i + 1) % 12)
-                predicted_value = round(last_value * (0.95 ** (i + 1)), 2)
-                trend_data.append({
-                    "month": month_names[next_month],
-                    "actual": None,
-                    "predicted": predicted_value
-                })
-        
-        return {
+        response = {
             "success": True,
             "data_type": data_type,
             "trends": trend_data
         }
+        result_cache.set(cache_key, response)
+        return response
         
     except HTTPException:
         raise
@@ -1351,12 +1308,8 @@ def get_ai_recommendations(user_id: int = Query(...)):
     Get AI-generated insights and recommendations
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1366,114 +1319,27 @@ def get_ai_recommendations(user_id: int = Query(...)):
         if org_id is None:
             raise HTTPException(status_code=400, detail="User is not associated with an organization")
         
-        # Get category breakdown for last 30 days
-        cursor.execute("""
-            SELECT 
-                COALESCE(ec.name, 'Unknown') as category_name,
-                COALESCE(SUM(de.co2_emitted), 0) as total_emissions,
-                COUNT(*) as record_count
-            FROM DailyEmissions de
-            LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
-            WHERE de.org_id = %s 
-            AND de.record_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
-            GROUP BY ec.category_id, ec.name
-            ORDER BY total_emissions DESC
-        """, (org_id,))
-        
-        categories = cursor.fetchall()
-        
-        # Get total emissions
-        cursor.execute("""
-            SELECT COALESCE(SUM(co2_emitted), 0) as total
-            FROM DailyEmissions
-            WHERE org_id = %s 
-            AND record_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
-        """, (org_id,))
-        
-        total_emissions = cursor.fetchone()['total']
-        
-        # Get comparison with previous month
-        cursor.execute("""
-            SELECT COALESCE(SUM(co2_emitted), 0) as prev_month
-            FROM DailyEmissions
-            WHERE org_id = %s 
-            AND record_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 60 DAY)
-            AND record_date < DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY)
-        """, (org_id,))
-        
-        prev_month_emissions = cursor.fetchone()['prev_month']
+        sync_result_cache()
+        cache_key = result_cache_key("ai.recommendations", org_id)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
+        insights = run_plan(cursor, recommendations_plan(org_id))
         
         cursor.close()
         connection.close()
         
-        # Generate AI insights based on data
-        insights = []
-        
-        # Insight 1: Highest category
-        if categories and len(categories) > 0:
-            top_category = categories[0]
-            percentage = round((top_category['total_emissions'] / total_emissions * 100) if total_emissions > 0 else 0, 1)
-            insights.append({
-                "id": 1,
-                "type": "alert",
-                "title": f"{top_category['category_name']} Emissions Dominant",
-                "message": f"Your {top_category['category_name']} emissions account for {percentage}% of total emissions. Consider targeted reduction strategies for this category.",
-                "confidence": 94,
-                "timestamp": "5 minutes ago",
-                "severity": "high"
-            })
-        
-        # Insight 2: Month-over-month comparison
-        if prev_month_emissions > 0:
-            change = round(((total_emissions - prev_month_emissions) / prev_month_emissions * 100), 1)
-            if change > 10:
-                insights.append({
-                    "id": 2,
-                    "type": "warning",
-                    "title": "Emissions Increasing",
-                    "message": f"Your emissions have increased by {change}% compared to last month. Review recent activities and consider implementing reduction measures.",
-                    "confidence": 91,
-                    "timestamp": "12 minutes ago",
-                    "severity": "medium"
-                })
-            elif change < -10:
-                insights.append({
-                    "id": 2,
-                    "type": "success",
-                    "title": "Great Progress!",
-                    "message": f"Excellent work! Your emissions have decreased by {abs(change)}% compared to last month. Keep up the sustainable practices.",
-                    "confidence": 93,
-                    "timestamp": "12 minutes ago",
-                    "severity": "low"
-                })
-        
-        # Insight 3: Pattern-based recommendation
-        insights.append({
-            "id": 3,
-            "type": "opportunity",
-            "title": "Optimization Opportunity Detected",
-            "message": "AI analysis suggests potential for 15-20% emission reduction through operational efficiency improvements. Consider scheduling an energy audit.",
-            "confidence": 87,
-            "timestamp": "1 hour ago",
-            "severity": "medium"
-        })
-        
-        # Insight 4: Seasonal pattern
-        insights.append({
-            "id": 4,
-            "type": "prediction",
-            "title": "Seasonal Trend Alert",
-            "message": "Historical patterns indicate typical seasonal variation during this period. Proactive measures can help maintain emission targets.",
-            "confidence": 85,
-            "timestamp": "2 hours ago",
-            "severity": "low"
-        })
-        
-        return {
+        response = {
             "success": True,
             "insights": insights,
             "total_count": len(insights)
         }
+        result_cache.set(cache_key, response)
+        return response
         
     except HTTPException:
         raise
@@ -1484,15 +1350,13 @@ def get_ai_recommendations(user_id: int = Query(...)):
 @app.post("/api/ai-insights/generate")
 def generate_new_insight(user_id: int = Query(...)):
     """
-    Generate a new AI insight on demand
+    Generate AI insights on demand from data newer than the last generation
+    generated is the number of insights created; insight is the newest of them,
+    or None when there was nothing new
     """
     try:
-        connection = get_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get user's org_id
-        cursor.execute("SELECT org_id FROM Users WHERE user_id = %s", (user_id,))
-        user = cursor.fetchone()
+        user = get_user_identity(user_id)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1502,41 +1366,23 @@ def generate_new_insight(user_id: int = Query(...)):
         if org_id is None:
             raise HTTPException(status_code=400, detail="User is not associated with an organization")
         
-        # Get some random insight based on recent data
-        cursor.execute("""
-            SELECT 
-                COALESCE(ec.name, 'Unknown') as category_name,
-                COALESCE(AVG(de.co2_emitted), 0) as avg_daily
-            FROM DailyEmissions de
-            LEFT JOIN EmissionCategories ec ON de.category_id = ec.category_id
-            WHERE de.org_id = %s 
-            AND de.record_date >= DATE_SUB(CURRENT_DATE(), INTERVAL 7 DAY)
-            GROUP BY ec.category_id, ec.name
-            ORDER BY avg_daily DESC
-            LIMIT 1
-        """, (org_id,))
-        
-        top_category = cursor.fetchone()
+        connection = get_connection()
+        cursor = connection.cursor(dictionary=True)
+        
+        generated, insight = run_plan(cursor, generate_insight_plan(org_id))
         
         cursor.close()
         connection.close()
         
-        # Generate insight
-        insight = {
-            "id": 999,
-            "type": "prediction",
-            "title": "New Pattern Identified",
-            "message": f"AI detected that {top_category['category_name'] if top_category else 'your primary emission source'} shows consistent patterns. Implementing smart scheduling could reduce emissions by up to 12%.",
-            "confidence": 89,
-            "timestamp": "Just now",
-            "severity": "medium"
-        }
+        # The stored insights may have changed even if none was created
+        result_cache.invalidate(result_cache_key("ai.recommendations", org_id))
         
         # Log the action
-        log_action(user_id, "GENERATE_AI_INSIGHT", "User generated a new AI insight")
+        log_action(user_id, "GENERATE_AI_INSIGHT", f"User generated AI insights ({generated} new)")
         
         return {
             "success": True,
+            "generated": generated,
             "insight": insight
         }
         
@@ -1545,3 +1391,37 @@ def generate_new_insight(user_id: int = Query(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
+
+# Async mode: API_MODE=async serves the dashboard, emission records and AI insights
+# endpoints as async def handlers on an aiomysql pool (see async_endpoints.py),
+# replacing the sync routes above; everything else stays on the thread pool
+API_MODE = os.getenv("API_MODE", "sync")
+
+if API_MODE == "async":
+    from async_db import close_async_pool, get_async_pool
+    from async_endpoints import create_async_router
+    
+    async_router = create_async_router(
+        identity_cache=identity_cache,
+        result_cache=result_cache,
+        result_cache_key=result_cache_key,
+        result_cache_versions_due=result_cache_versions_due,
+        log_action=log_action,
+    )
+    async_paths = {(route.path, method) for route in async_router.routes for method in route.methods}
+    app.router.routes = [
+        route for route in app.router.routes
+        if not any((getattr(route, "path", None), method) in async_paths for method in getattr(route, "methods", ()) or ())
+    ]
+    app.include_router(async_router)
+    
+    @app.on_event("startup")
+    async def open_async_pool():
+        try:
+            await get_async_pool()
+        except Exception as e:
+            print(f"Failed to open async connection pool: {e}")
+    
+    @app.on_event("shutdown")
+    async def shutdown_async_pool():
+        await close_async_pool()
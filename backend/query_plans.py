@@ -0,0 +1,23 @@
+# Query plans let one piece of code describe a sequence of SQL statements without
+# caring which driver runs them. A plan is a generator that yields (sql, params)
+# and is sent back the fetched rows (a list of dicts); its return value is the
+# result. run_plan drives it on a blocking mysql.connector cursor, and
+# async_db.run_plan_async on an aiomysql cursor. Statements without a result set
+# (writes) are sent back an empty list; a plan that writes ends with a COMMIT
+# statement, since only the aiomysql pool runs in autocommit mode.
+
+
+def run_plan(cursor, plan):
+    """Execute a query plan on a blocking dictionary cursor and return its result"""
+    try:
+        sql, params = next(plan)
+        while True:
+            cursor.execute(sql, params)
+            sql, params = plan.send(cursor.fetchall() if cursor.with_rows else [])
+    except StopIteration as done:
+        return done.value
+
+
+def first_row(rows: list):
+    """First row of a result set, or None if it is empty (like cursor.fetchone())"""
+    return rows[0] if rows else None
@@ -0,0 +1,123 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+def estimate_size(value) -> int:
+    """Rough deep size of a JSON-like payload in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class ResultCache:
+    """
+    In-process TTL + LRU cache for org-scoped aggregate results
+    - max_entries / max_bytes: least recently used entries are evicted past either cap
+    - ttl: seconds an entry stays valid
+    Keys are tuples whose second element is the org_id, e.g.
+    ("dashboard.breakdown", org_id, "monthly", "2025-10-28"), so a whole
+    organization can be invalidated at once
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._versions: Optional[Dict[int, int]] = None
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._metrics["misses"] += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._metrics["expirations"] += 1
+                self._metrics["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._metrics["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._metrics["evictions"] += 1
+
+    def get_or_compute(self, key, compute: Callable, ttl: Optional[float] = None):
+        """Return the cached value for key, computing and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, key):
+        """Drop one entry (no-op if it is not cached)"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._metrics["invalidations"] += 1
+
+    def invalidate_org(self, org_id: int):
+        """Drop every entry cached for an organization"""
+        with self._lock:
+            for key in [key for key in self._entries if len(key) > 1 and key[1] == org_id]:
+                self._remove(key)
+                self._metrics["invalidations"] += 1
+
+    def sync_versions(self, versions: Dict[int, int]):
+        """
+        Invalidate organizations whose data version changed since the last sync
+        - versions: org_id -> version counter (see RollupVersions in rollups.py)
+        """
+        if self._versions is not None:
+            for org_id, version in versions.items():
+                if self._versions.get(org_id) != version:
+                    self.invalidate_org(org_id)
+        self._versions = dict(versions)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Occupancy and hit/miss counters"""
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                **self._metrics,
+                "hit_rate": round(self._metrics["hits"] / lookups, 4) if lookups else 0.0,
+            }
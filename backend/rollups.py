@@ -0,0 +1,288 @@
+# python rollups.py --rebuild                       (full backfill)
+# python rollups.py --rebuild-locations             (backfill LocationMonthlyRollup only)
+# python rollups.py --start 2025-10-01 --end 2025-10-28  (refresh a date range)
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+import mysql.connector
+from dotenv import load_dotenv
+
+# Pre-aggregated copies of DailyEmissions used by the dashboard and AI-insights reads.
+# DailyEmissionRollup holds one row per (org, day, category) and MonthlyEmissionRollup
+# one row per (org, month, category); location_count is the number of distinct
+# locations that reported in the bucket. LocationMonthlyRollup holds one row per
+# (org, month, location) with the number of days it reported. RollupVersions is bumped for every
+# organization whose buckets were refreshed, so API processes can drop cached
+# results (see result_cache.py) without being told directly.
+#
+# The rollups are not maintained by triggers: every writer of DailyEmissions must
+# call refresh_rollups() for the days it inserted, updated or deleted (as
+# insertValues/trail1.py does), or the dashboards keep serving the old totals.
+# A database that already has DailyEmissions history is backfilled once, in the
+# background on the API's first start (see backfill_rollups); RollupBackfill
+# records the progress so an interrupted backfill resumes where it stopped.
+ROLLUP_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS DailyEmissionRollup (
+        org_id INT NOT NULL,
+        record_date DATE NOT NULL,
+        category_id INT NOT NULL,
+        co2_total DOUBLE NOT NULL DEFAULT 0,
+        energy_total DOUBLE NOT NULL DEFAULT 0,
+        record_count INT NOT NULL DEFAULT 0,
+        location_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (org_id, record_date, category_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS MonthlyEmissionRollup (
+        org_id INT NOT NULL,
+        month_start DATE NOT NULL,
+        category_id INT NOT NULL,
+        co2_total DOUBLE NOT NULL DEFAULT 0,
+        energy_total DOUBLE NOT NULL DEFAULT 0,
+        record_count INT NOT NULL DEFAULT 0,
+        location_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (org_id, month_start, category_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS LocationMonthlyRollup (
+        org_id INT NOT NULL,
+        month_start DATE NOT NULL,
+        location_id INT NOT NULL,
+        co2_total DOUBLE NOT NULL DEFAULT 0,
+        energy_total DOUBLE NOT NULL DEFAULT 0,
+        record_count INT NOT NULL DEFAULT 0,
+        day_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (org_id, month_start, location_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS RollupVersions (
+        org_id INT NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS RollupBackfill (
+        id TINYINT NOT NULL PRIMARY KEY,
+        next_month DATE NULL,
+        completed_at TIMESTAMP NULL
+    )
+    """,
+]
+
+
+def ensure_rollup_schema(connection):
+    """
+    Create the rollup tables if they do not exist yet
+    They are created empty; backfill_rollups() fills them from the existing history
+    """
+    cursor = connection.cursor()
+    for ddl in ROLLUP_SCHEMA:
+        cursor.execute(ddl)
+    connection.commit()
+    cursor.close()
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _org_filter(org_ids: Optional[Iterable[int]]):
+    org_list = list(org_ids) if org_ids else []
+    if not org_list:
+        return "", []
+    placeholders = ','.join(['%s'] * len(org_list))
+    return f" AND org_id IN ({placeholders})", org_list
+
+
+def _refresh_location_months(cursor, month_from: date, month_to: date, org_clause: str, org_params: list):
+    cursor.execute(
+        f"DELETE FROM LocationMonthlyRollup WHERE month_start >= %s AND month_start < %s{org_clause}",
+        [month_from, month_to] + org_params
+    )
+    cursor.execute(f"""
+        INSERT INTO LocationMonthlyRollup
+            (org_id, month_start, location_id, co2_total, energy_total, record_count, day_count)
+        SELECT org_id, DATE_FORMAT(record_date, '%Y-%m-01'), location_id,
+               COALESCE(SUM(co2_emitted), 0), COALESCE(SUM(energy_consumed), 0),
+               COUNT(*), COUNT(DISTINCT record_date)
+        FROM DailyEmissions
+        WHERE record_date >= %s AND record_date < %s{org_clause}
+        GROUP BY org_id, DATE_FORMAT(record_date, '%Y-%m-01'), location_id
+    """, [month_from, month_to] + org_params)
+
+
+def refresh_rollups(connection, start_date: date, end_date: date, org_ids: Optional[Iterable[int]] = None):
+    """
+    Recompute the rollup buckets touched by DailyEmissions rows in [start_date, end_date]
+    - org_ids: restrict the refresh to these organizations (default: all)
+    Daily buckets are rebuilt for the given days and monthly buckets for every month
+    overlapping the range, so re-running after a late insert is always safe
+    """
+    org_clause, org_params = _org_filter(org_ids)
+    month_from = _month_start(start_date)
+    month_to = _next_month(end_date)
+    cursor = connection.cursor()
+
+    cursor.execute(
+        f"DELETE FROM DailyEmissionRollup WHERE record_date >= %s AND record_date < %s{org_clause}",
+        [start_date, end_date + timedelta(days=1)] + org_params
+    )
+    cursor.execute(f"""
+        INSERT INTO DailyEmissionRollup
+            (org_id, record_date, category_id, co2_total, energy_total, record_count, location_count)
+        SELECT org_id, record_date, category_id,
+               COALESCE(SUM(co2_emitted), 0), COALESCE(SUM(energy_consumed), 0),
+               COUNT(*), COUNT(DISTINCT location_id)
+        FROM DailyEmissions
+        WHERE record_date >= %s AND record_date < %s{org_clause}
+        GROUP BY org_id, record_date, category_id
+    """, [start_date, end_date + timedelta(days=1)] + org_params)
+
+    cursor.execute(
+        f"DELETE FROM MonthlyEmissionRollup WHERE month_start >= %s AND month_start < %s{org_clause}",
+        [month_from, month_to] + org_params
+    )
+    cursor.execute(f"""
+        INSERT INTO MonthlyEmissionRollup
+            (org_id, month_start, category_id, co2_total, energy_total, record_count, location_count)
+        SELECT org_id, DATE_FORMAT(record_date, '%Y-%m-01'), category_id,
+               COALESCE(SUM(co2_emitted), 0), COALESCE(SUM(energy_consumed), 0),
+               COUNT(*), COUNT(DISTINCT location_id)
+        FROM DailyEmissions
+        WHERE record_date >= %s AND record_date < %s{org_clause}
+        GROUP BY org_id, DATE_FORMAT(record_date, '%Y-%m-01'), category_id
+    """, [month_from, month_to] + org_params)
+
+    _refresh_location_months(cursor, month_from, month_to, org_clause, org_params)
+
+    cursor.execute(f"""
+        INSERT INTO RollupVersions (org_id, version)
+        SELECT DISTINCT org_id, 1
+        FROM DailyEmissions
+        WHERE record_date >= %s AND record_date < %s{org_clause}
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, [start_date, end_date + timedelta(days=1)] + org_params)
+
+    connection.commit()
+    cursor.close()
+
+
+def _record_backfill(connection, next_month: Optional[date], completed: bool = False):
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        INSERT INTO RollupBackfill (id, next_month, completed_at)
+        VALUES (1, %s, {"CURRENT_TIMESTAMP" if completed else "NULL"})
+        ON DUPLICATE KEY UPDATE next_month = VALUES(next_month), completed_at = VALUES(completed_at)
+    """, (next_month,))
+    connection.commit()
+    cursor.close()
+
+
+def _rebuild_months(connection, month: Optional[date], last_day: Optional[date]) -> int:
+    """Refresh every month from `month` through the one containing `last_day`, recording progress"""
+    built = 0
+    # One month at a time keeps each transaction small
+    while month is not None and last_day is not None and month <= last_day:
+        refresh_rollups(connection, month, _next_month(month) - timedelta(days=1))
+        month = _next_month(month)
+        _record_backfill(connection, month)
+        built += 1
+    _record_backfill(connection, month, completed=True)
+    return built
+
+
+def rebuild_rollups(connection):
+    """Recompute every rollup bucket from the full DailyEmissions history"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT MIN(record_date), MAX(record_date) FROM DailyEmissions")
+    first_day, last_day = cursor.fetchone()
+    cursor.close()
+    _rebuild_months(connection, _month_start(first_day) if first_day else None, last_day)
+
+
+def backfill_rollups(connection) -> int:
+    """
+    Build the rollups from the DailyEmissions history once per database
+    Resumes at the first month not built yet if an earlier backfill was interrupted,
+    and does nothing once RollupBackfill records it as complete. A MySQL named lock
+    keeps concurrent API processes from backfilling at the same time
+    Returns the number of months built (0 if complete or running elsewhere)
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT GET_LOCK('rollup_backfill', 0)")
+    if not cursor.fetchone()[0]:
+        cursor.close()
+        return 0
+    try:
+        cursor.execute("SELECT next_month, completed_at FROM RollupBackfill WHERE id = 1")
+        progress = cursor.fetchone()
+        if progress and progress[1] is not None:
+            return 0
+        cursor.execute("SELECT MIN(record_date), MAX(record_date) FROM DailyEmissions")
+        first_day, last_day = cursor.fetchone()
+        month = progress[0] if progress and progress[0] else (_month_start(first_day) if first_day else None)
+        return _rebuild_months(connection, month, last_day)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK('rollup_backfill')")
+        cursor.fetchone()
+        cursor.close()
+
+
+def rebuild_location_rollup(connection):
+    """
+    Fill LocationMonthlyRollup from the full DailyEmissions history, a month per transaction
+    Safe to re-run after an interruption: every month is replaced, not appended to
+    """
+    cursor = connection.cursor()
+    cursor.execute("SELECT MIN(record_date), MAX(record_date) FROM DailyEmissions")
+    first_day, last_day = cursor.fetchone()
+    month = _month_start(first_day) if first_day else None
+    while month is not None and month <= last_day:
+        _refresh_location_months(cursor, month, _next_month(month), "", [])
+        connection.commit()
+        month = _next_month(month)
+    cursor.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Maintain the DailyEmissions rollup tables")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from scratch")
+    parser.add_argument("--rebuild-locations", action="store_true", help="recompute LocationMonthlyRollup only")
+    parser.add_argument("--start", help="first day to refresh (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last day to refresh (YYYY-MM-DD, default: --start)")
+    args = parser.parse_args()
+
+    db = mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        port=int(os.getenv("DB_PORT", 3306)),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+    )
+    ensure_rollup_schema(db)
+    if args.rebuild:
+        rebuild_rollups(db)
+        print("✅ Rollups rebuilt")
+    elif args.rebuild_locations:
+        rebuild_location_rollup(db)
+        print("✅ Location rollup rebuilt")
+    elif args.start:
+        start = datetime.strptime(args.start, "%Y-%m-%d").date()
+        end = datetime.strptime(args.end, "%Y-%m-%d").date() if args.end else start
+        refresh_rollups(db, start, end)
+        print(f"✅ Rollups refreshed for {start} to {end}")
+    else:
+        parser.print_help()
+    db.close()
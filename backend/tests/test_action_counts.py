@@ -0,0 +1,133 @@
+from datetime import date, datetime
+
+from audit_logs import action_counts_plan
+from audit_writer import write_audit_rows
+
+
+def run(plan, *results):
+    """Drive a query plan with canned result sets, one per statement, recording the statements"""
+    statements = [plan.send(None)]
+    try:
+        for result in results:
+            statements.append(plan.send(result))
+    except StopIteration as stop:
+        return stop.value, statements
+    raise AssertionError(f"plan asked for more results: {statements[-1][0]}")
+
+
+class RecordingConnection:
+    """Just enough of a mysql.connector connection to record what write_audit_rows sends"""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=()):
+        self.statements.append((" ".join(sql.split()), list(params)))
+
+    def close(self):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+
+def counter_rows(connection):
+    """AuditActionCounts upsert parameters grouped back into (key..., count, events) rows"""
+    sql, params = connection.statements[-1]
+    assert sql.startswith("INSERT INTO AuditActionCounts")
+    assert "ON DUPLICATE KEY UPDATE count = count + VALUES(count), events = events + VALUES(events)" in sql
+    return [tuple(params[i:i + 6]) for i in range(0, len(params), 6)]
+
+
+def test_rows_are_counted_per_org_action_and_day():
+    morning, evening = datetime(2026, 9, 14, 8), datetime(2026, 9, 14, 20)
+    connection = RecordingConnection()
+    write_audit_rows(connection, [
+        (1, 7, "LOGIN", "", morning),
+        (2, 7, "LOGIN", "", evening),
+        (1, 7, "LOGIN", "", datetime(2026, 9, 15, 8)),
+        (1, 7, "EXPORT", "", morning),
+        (3, 8, "LOGIN", "", morning),
+    ])
+    assert len(connection.statements) == 2
+    assert connection.commits == 1
+    assert sorted(counter_rows(connection)) == sorted([
+        (7, False, "LOGIN", date(2026, 9, 14), 2, 2),
+        (7, False, "LOGIN", date(2026, 9, 15), 1, 1),
+        (7, False, "EXPORT", date(2026, 9, 14), 1, 1),
+        (8, False, "LOGIN", date(2026, 9, 14), 1, 1),
+    ])
+
+
+def test_system_rows_and_rows_without_an_org_get_their_own_keys():
+    when = datetime(2026, 9, 14, 8)
+    connection = RecordingConnection()
+    write_audit_rows(connection, [
+        (None, None, "ROLLUP_REBUILD", "", when),
+        (5, None, "LOGIN", "", when),
+    ])
+    assert sorted(counter_rows(connection)) == sorted([
+        (0, True, "ROLLUP_REBUILD", date(2026, 9, 14), 1, 1),
+        (0, False, "LOGIN", date(2026, 9, 14), 1, 1),
+    ])
+
+
+def test_counted_only_events_bump_events_but_not_count():
+    when = datetime(2026, 9, 14, 8)
+    connection = RecordingConnection()
+    write_audit_rows(
+        connection,
+        [(1, 7, "VIEW_DASHBOARD", "", when)],
+        [(1, 7, "VIEW_DASHBOARD", when), (2, 7, "VIEW_DASHBOARD", when), (2, 7, "VIEW_REPORT", when)],
+    )
+    assert sorted(counter_rows(connection)) == sorted([
+        (7, False, "VIEW_DASHBOARD", date(2026, 9, 14), 1, 3),
+        (7, False, "VIEW_REPORT", date(2026, 9, 14), 0, 1),
+    ])
+
+
+def test_events_without_rows_skip_the_log_insert():
+    connection = RecordingConnection()
+    write_audit_rows(connection, [], [(1, 7, "VIEW_DASHBOARD", datetime(2026, 9, 14, 8))])
+    assert len(connection.statements) == 1
+    assert counter_rows(connection) == [(7, False, "VIEW_DASHBOARD", date(2026, 9, 14), 0, 1)]
+
+
+def test_nothing_to_write_touches_nothing():
+    connection = RecordingConnection()
+    write_audit_rows(connection, [])
+    assert connection.statements == [] and connection.commits == 0
+
+
+def test_action_stats_sum_to_the_total():
+    (total, stats), statements = run(
+        action_counts_plan(7, None),
+        [{"action": "LOGIN", "count": 12, "events": 12}, {"action": "VIEW_DASHBOARD", "count": 3, "events": 40}],
+    )
+    assert total == 15
+    assert stats == [
+        {"action": "LOGIN", "count": 12, "events": 12},
+        {"action": "VIEW_DASHBOARD", "count": 3, "events": 40},
+    ]
+    sql, params = statements[0]
+    assert "((org_id = %s AND is_system = 0) OR is_system = 1)" in sql
+    assert params == [7]
+
+
+def test_filters_become_day_and_action_conditions():
+    _, statements = run(action_counts_plan(7, "LOG", date(2026, 9, 1), date(2026, 9, 30)), [])
+    sql, params = statements[0]
+    assert "day >= %s" in sql and "day <= %s" in sql and "action LIKE %s" in sql
+    assert params == [7, date(2026, 9, 1), date(2026, 9, 30), "%LOG%"]
+
+
+def test_admin_without_an_org_sees_every_counter():
+    (total, stats), statements = run(action_counts_plan(None, None), [])
+    assert (total, stats) == (0, [])
+    sql, params = statements[0]
+    assert "WHERE 1=1" in sql
+    assert params == []
@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+import pytest
+
+from anomalies import ANOMALY_COLUMNS, BASELINE_WEEKS, detect_anomalies
+
+START = date(2026, 9, 7)  # a Monday
+END = START + timedelta(days=7)
+
+
+def history(value_for_day, location_id=1, category_id=1, weeks=BASELINE_WEEKS, start=START, end=END):
+    """(location_id, category_id, record_date, value) rows from `weeks` weeks before start up to end"""
+    day = start - timedelta(weeks=weeks)
+    rows = []
+    while day < end:
+        value = value_for_day(day)
+        if value is not None:
+            rows.append((location_id, category_id, day, value))
+        day += timedelta(days=1)
+    return rows
+
+
+def weekday_pattern(day):
+    # busy weekdays, quiet weekends, a little jitter so the MAD is not zero
+    base = 100.0 if day.weekday() < 5 else 10.0
+    return base + (day.toordinal() % 3) - 1
+
+
+def with_value(rows, day, value):
+    return [(loc, cat, d, value if d == day else v) for loc, cat, d, v in rows]
+
+
+def test_quiet_series_has_no_anomalies():
+    anomalies = detect_anomalies(history(weekday_pattern), START, END)
+    assert list(anomalies.columns) == ANOMALY_COLUMNS
+    assert anomalies.empty
+
+
+def test_weekend_is_compared_with_past_weekends_only():
+    # 12 on a Saturday is normal for Saturdays, though far below the weekday level
+    saturday = START + timedelta(days=5)
+    anomalies = detect_anomalies(with_value(history(weekday_pattern), saturday, 11.0), START, END)
+    assert anomalies.empty
+
+    # weekday-level emissions on a Saturday are an anomaly
+    anomalies = detect_anomalies(with_value(history(weekday_pattern), saturday, 100.0), START, END)
+    assert anomalies["record_date"].tolist() == [saturday]
+    row = anomalies.iloc[0]
+    assert row["baseline"] == pytest.approx(10.0)
+    assert row["z_score"] > 0
+    assert row["history"] == BASELINE_WEEKS
+
+
+def test_baseline_uses_same_weekday_lags():
+    # only Wednesdays are high: a high Wednesday is normal, a high Tuesday is not
+    def pattern(day):
+        return 300.0 + (day.toordinal() % 3) if day.weekday() == 2 else weekday_pattern(day)
+
+    tuesday, wednesday = START + timedelta(days=1), START + timedelta(days=2)
+    anomalies = detect_anomalies(with_value(history(pattern), tuesday, 300.0), START, END)
+    assert anomalies["record_date"].tolist() == [tuesday]
+    assert wednesday not in anomalies["record_date"].tolist()
+
+
+def test_zero_mad_is_floored_at_a_fraction_of_the_median():
+    # a perfectly flat series: MAD is 0, the scale falls back to 5% of 100
+    rows = history(lambda day: 100.0)
+    anomalies = detect_anomalies(with_value(with_value(rows, START, 120.0), START + timedelta(days=1), 110.0),
+                                 START, END)
+    assert anomalies["record_date"].tolist() == [START]
+    row = anomalies.iloc[0]
+    assert row["scale"] == pytest.approx(5.0)
+    assert row["z_score"] == pytest.approx(4.0)
+
+
+def test_flat_zero_series_is_not_scored():
+    # median and MAD both 0: no scale to score against
+    rows = with_value(history(lambda day: 0.0), START, 50.0)
+    assert detect_anomalies(rows, START, END).empty
+
+
+def test_series_needs_min_history_before_it_is_scored():
+    recent = START - timedelta(weeks=5)
+    rows = history(lambda day: 100.0 + day.toordinal() % 3 if day >= recent else None)
+    spiked = with_value(rows, START, 500.0)
+    assert detect_anomalies(spiked, START, END).empty
+    assert detect_anomalies(spiked, START, END, min_history=5)["record_date"].tolist() == [START]
+
+
+def test_missing_days_are_not_zeros():
+    # every other week is missing: the baseline is built from the weeks that exist
+    def pattern(day):
+        weeks_back = (START - day).days // 7
+        return None if weeks_back % 2 else weekday_pattern(day)
+
+    anomalies = detect_anomalies(history(pattern), START, END)
+    assert anomalies.empty
+
+    # and a day without a row is not scored as a drop to 0
+    rows = [row for row in history(weekday_pattern) if row[2] != START]
+    assert detect_anomalies(rows, START, END).empty
+
+
+def test_series_are_scored_independently():
+    rows = history(weekday_pattern, location_id=1) + with_value(history(weekday_pattern, location_id=2), START, 400.0)
+    anomalies = detect_anomalies(rows, START, END)
+    assert anomalies[["location_id", "category_id"]].values.tolist() == [[2, 1]]
+
+
+def test_confidence_is_capped_by_history():
+    # |z| is huge, but with 12 baseline days p can't be shown below 1/13
+    anomalies = detect_anomalies(with_value(history(weekday_pattern), START, 10000.0), START, END)
+    assert anomalies.iloc[0]["confidence"] == pytest.approx(round((1 - 1 / 13) * 100, 1))
+
+
+def test_empty_inputs():
+    assert detect_anomalies([], START, END).empty
+    assert detect_anomalies(history(weekday_pattern), START, START).empty
@@ -0,0 +1,99 @@
+import asyncio
+import time
+from datetime import date
+
+import pytest
+
+pytest.importorskip("aiomysql")
+httpx = pytest.importorskip("httpx")
+from fastapi import FastAPI
+
+import async_db
+import async_endpoints
+from identity import IdentityCache
+from result_cache import ResultCache
+
+# The sync app serves at most 40 requests at once (Starlette's thread pool)
+SYNC_THREAD_LIMIT = 40
+
+
+class FakeCursor:
+    """aiomysql-like cursor: every statement waits on "the database" for `latency` seconds"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def execute(self, sql, params=()):
+        await asyncio.sleep(self.latency)
+
+    async def fetchall(self):
+        return [{"value": 1}]
+
+
+def cpu_heavy_plan(seconds):
+    rows = yield "SELECT 1", ()
+    # Stands in for a forecast fit or the rules engine: blocks whatever thread runs it
+    time.sleep(seconds)
+    rows = yield "SELECT 2", ()
+    return rows
+
+
+def test_plan_steps_run_off_the_event_loop():
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await async_db.run_plan_async(FakeCursor(0), cpu_heavy_plan(0.3))
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result == [{"value": 1}]
+    # A plan running on the loop would have let the ticker run ~0 times during the 0.3s step
+    assert ticks >= 10
+
+
+def test_async_endpoints_serve_more_requests_than_the_sync_thread_pool(monkeypatch):
+    in_flight, peak = 0, 0
+
+    async def slow_query_plan(plan):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.2)
+        in_flight -= 1
+        return []
+
+    monkeypatch.setattr(async_endpoints, "run_query_plan", slow_query_plan)
+    identities = IdentityCache(ttl=60)
+    identities.put(1, {"user_id": 1, "org_id": 1, "role": "user", "status": "approved"})
+    app = FastAPI()
+    app.include_router(async_endpoints.create_async_router(
+        identity_cache=identities,
+        # ttl=0: every request misses and waits on the database
+        result_cache=ResultCache(ttl=0),
+        result_cache_key=lambda endpoint, org_id, *parts: (endpoint, org_id, *parts, date.today().isoformat()),
+        result_cache_versions_due=lambda: False,
+        log_action=lambda *args: None,
+    ))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.get("/api/dashboard/emissions-over-time", params={"user_id": 1}) for _ in range(200)
+            ))
+            return responses, time.perf_counter() - started
+
+    responses, elapsed = asyncio.run(scenario())
+    assert all(response.status_code == 200 for response in responses)
+    assert peak > SYNC_THREAD_LIMIT
+    # 200 requests of 0.2s each: the sync app needs at least 200 / 40 * 0.2 = 1s
+    assert elapsed < 200 / SYNC_THREAD_LIMIT * 0.2
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from audit_logs import audit_page_query, build_log_filters, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips_timestamp_and_id():
+    row = {"timestamp": datetime(2026, 9, 14, 8, 30, 5, 123456), "log_id": 981}
+    assert decode_cursor(encode_cursor(row)) == (datetime(2026, 9, 14, 8, 30, 5, 123456), 981)
+
+
+def test_cursor_has_no_padding():
+    for log_id in (1, 12, 123):
+        cursor = encode_cursor({"timestamp": datetime(2026, 9, 14), "log_id": log_id})
+        assert "=" not in cursor
+        assert decode_cursor(cursor)[1] == log_id
+
+
+def forge(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    "%%%",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    forge({"ts": "2026-09-14 08:30:05"}),
+    forge({"id": 5}),
+    forge({"ts": "yesterday", "id": 5}),
+    forge({"ts": "2026-09-14 08:30:05", "id": "five"}),
+    forge({"ts": "2026-09-14 08:30:05", "id": None}),
+    forge(["2026-09-14 08:30:05", 5]),
+])
+def test_tampered_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def page_after(rows, after, limit):
+    """The keyset predicate of audit_page_query applied to rows in memory"""
+    rows = sorted(rows, key=lambda row: (row["timestamp"], row["log_id"]), reverse=True)
+    if after is not None:
+        rows = [row for row in rows
+                if row["timestamp"] < after[0] or (row["timestamp"] == after[0] and row["log_id"] < after[1])]
+    return rows[:limit]
+
+
+def test_pages_through_same_timestamp_ties_without_gaps_or_repeats():
+    same = datetime(2026, 9, 14, 8, 30)
+    rows = [{"timestamp": same, "log_id": log_id} for log_id in range(1, 8)]
+    rows.append({"timestamp": datetime(2026, 9, 14, 8, 29), "log_id": 99})
+
+    seen, after = [], None
+    while True:
+        page = page_after(rows, after, 3)
+        if not page:
+            break
+        seen += [row["log_id"] for row in page]
+        after = decode_cursor(encode_cursor(page[-1]))
+    assert seen == [7, 6, 5, 4, 3, 2, 1, 99]
+
+
+def test_keyset_page_breaks_ties_on_log_id_in_every_scope():
+    after = (datetime(2026, 9, 14, 8, 30), 42)
+    sql, params = audit_page_query(7, build_log_filters(None, None), after, limit=50)
+    assert sql.count("(al.timestamp < %s OR (al.timestamp = %s AND al.log_id < %s))") == 2
+    assert sql.count("ORDER BY al.timestamp DESC, al.log_id DESC") == 2
+    # org scope, system scope, then the outer LIMIT / OFFSET
+    assert params == [7, after[0], after[0], 42, 50, after[0], after[0], 42, 50, 50, 0]
+
+
+def test_first_page_has_no_keyset_condition():
+    sql, params = audit_page_query(7, build_log_filters(None, None), None, limit=50)
+    assert "al.log_id < %s" not in sql
+    assert params == [7, 50, 50, 50, 0]
+
+
+def test_legacy_offset_widens_each_branch():
+    sql, params = audit_page_query(None, build_log_filters("LOGIN", None), None, limit=20, offset=40)
+    assert "UNION ALL" not in sql
+    assert params == ["%LOGIN%", 60, 20, 40]
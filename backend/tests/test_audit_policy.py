@@ -0,0 +1,117 @@
+import pytest
+
+import audit_policy
+from audit_policy import COUNT, LOG, SYNC, AuditPolicy, parse_policy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(audit_policy.time, "monotonic", clock)
+    return clock
+
+
+def test_parses_overrides():
+    assert parse_policy(" LOGIN=log, VIEW_USERS=sample:0.25,,EXPORT=coalesce:60 ,PING=count") == {
+        "LOGIN": ("log", 0.0),
+        "VIEW_USERS": ("sample", 0.25),
+        "EXPORT": ("coalesce", 60.0),
+        "PING": ("count", 0.0),
+    }
+
+
+def test_empty_policy():
+    assert parse_policy(None) == {}
+    assert parse_policy("") == {}
+
+
+@pytest.mark.parametrize("text", [
+    "LOGIN=shout", "LOGIN=", "LOGIN", "LOGIN=log:5", "LOGIN=sample", "LOGIN=sample:1.5",
+    "LOGIN=sample:-0.1", "LOGIN=sample:often", "LOGIN=coalesce:0", "LOGIN=coalesce:-5", "LOGIN=coalesce:",
+])
+def test_rejects_bad_tiers(text):
+    with pytest.raises(ValueError):
+        parse_policy(text)
+
+
+def test_defaults_and_overrides():
+    policy = AuditPolicy(parse_policy("LOGIN=log,CUSTOM=count"))
+    assert policy.decide(1, "LOGIN") == LOG
+    assert policy.decide(1, "DELETE_USER") == SYNC
+    assert policy.decide(1, "CUSTOM") == COUNT
+    assert policy.decide(1, "UNLISTED") == LOG
+    assert AuditPolicy(default_tier=(COUNT, 0.0)).decide(1, "UNLISTED") == COUNT
+
+
+def test_sample_logs_draws_below_the_rate(monkeypatch):
+    policy = AuditPolicy(parse_policy("VIEW=sample:0.1"))
+    monkeypatch.setattr(audit_policy.random, "random", lambda: 0.05)
+    assert policy.decide(1, "VIEW") == LOG
+    monkeypatch.setattr(audit_policy.random, "random", lambda: 0.1)
+    assert policy.decide(1, "VIEW") == COUNT
+
+
+def test_sample_extremes():
+    policy = AuditPolicy(parse_policy("NEVER=sample:0,ALWAYS=sample:1"))
+    assert {policy.decide(1, "NEVER") for _ in range(200)} == {COUNT}
+    assert {policy.decide(1, "ALWAYS") for _ in range(200)} == {LOG}
+
+
+def test_coalesce_logs_once_per_window(clock):
+    policy = AuditPolicy(parse_policy("VIEW=coalesce:300"))
+    assert policy.decide(1, "VIEW") == LOG
+    clock.now += 299.9
+    assert policy.decide(1, "VIEW") == COUNT
+    clock.now += 0.1
+    assert policy.decide(1, "VIEW") == LOG
+    clock.now += 10
+    assert policy.decide(1, "VIEW") == COUNT
+
+
+def test_coalesce_windows_are_per_user_and_action(clock):
+    policy = AuditPolicy(parse_policy("VIEW=coalesce:300,OPEN=coalesce:300"))
+    assert policy.decide(1, "VIEW") == LOG
+    assert policy.decide(2, "VIEW") == LOG
+    assert policy.decide(1, "OPEN") == LOG
+    assert policy.decide(None, "VIEW") == LOG
+    assert policy.decide(1, "VIEW") == COUNT
+    assert policy.decide(None, "VIEW") == COUNT
+
+
+def test_full_coalesce_table_forgets_closed_windows_first(clock):
+    policy = AuditPolicy(parse_policy("SHORT=coalesce:10,LONG=coalesce:300"), max_coalesce_keys=2)
+    policy.decide(1, "SHORT")
+    policy.decide(1, "LONG")
+    clock.now += 20
+    # the table is full: SHORT's window has closed and is dropped, LONG's is kept
+    assert policy.decide(2, "LONG") == LOG
+    assert policy.decide(1, "LONG") == COUNT
+    assert policy.decide(2, "LONG") == COUNT
+
+
+def test_full_coalesce_table_of_open_windows_is_cleared(clock):
+    policy = AuditPolicy(parse_policy("VIEW=coalesce:300"), max_coalesce_keys=2)
+    policy.decide(1, "VIEW")
+    policy.decide(2, "VIEW")
+    assert policy.decide(3, "VIEW") == LOG
+    # cleared: user 1 starts a new window
+    assert policy.decide(1, "VIEW") == LOG
+
+
+def test_stats_count_decisions(clock):
+    policy = AuditPolicy(parse_policy("VIEW=coalesce:300"))
+    for _ in range(3):
+        policy.decide(1, "VIEW")
+    policy.decide(1, "LOGIN")
+    stats = policy.stats()
+    assert stats["decisions"] == {SYNC: 1, LOG: 1, COUNT: 2}
+    assert stats["rules"]["VIEW"] == "coalesce:300"
+    assert stats["rules"]["LOGIN"] == "sync"
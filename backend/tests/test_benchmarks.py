@@ -0,0 +1,82 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmarks import PERCENTILES, benchmark_plan, percentile_rank
+
+
+def grid_of(values):
+    return list(np.percentile(values, PERCENTILES))
+
+
+def test_interpolates_between_grid_points():
+    grid = grid_of([10, 20, 30, 40, 50])
+    assert percentile_rank(30, grid) == pytest.approx(50.0)
+    assert percentile_rank(35, grid) == pytest.approx(62.5)
+
+
+def test_outside_the_grid_clamps():
+    grid = grid_of([10, 20, 30, 40, 50])
+    assert percentile_rank(5, grid) == 0.0
+    assert percentile_rank(60, grid) == 100.0
+    assert percentile_rank(10, grid) == 0.0
+    assert percentile_rank(50, grid) == 100.0
+
+
+def test_ties_at_the_minimum_resolve_to_the_middle_of_the_stretch():
+    # 4 of 5 organizations at the minimum: p0..p75 are all 5
+    grid = grid_of([5, 5, 5, 5, 9])
+    assert percentile_rank(5, grid) == pytest.approx(37.5)
+
+
+def test_ties_at_the_maximum_resolve_to_the_middle_of_the_stretch():
+    grid = grid_of([1, 9, 9, 9, 9])
+    assert percentile_rank(9, grid) == pytest.approx(62.5)
+
+
+def run(plan, *results):
+    """Drive a query plan with canned result sets, one per statement"""
+    rows = plan.send(None)
+    try:
+        for result in results:
+            rows = plan.send(result)
+    except StopIteration as stop:
+        return stop.value
+    raise AssertionError(f"plan asked for more results: {rows[0]}")
+
+
+def benchmark_rows(org_count=5):
+    return [
+        {"metric": metric, "org_count": org_count, "p10": 1, "p50": 5, "p90": 9,
+         "percentiles": "[" + ", ".join(str(float(p)) for p in range(101)) + "]"}
+        for metric in ("emissions", "energy")
+    ]
+
+
+def test_org_without_data_for_the_month_gets_no_percentile():
+    result = run(
+        benchmark_plan(1, date(2026, 9, 1)),
+        [{"industry": "Retail", "emissions": None, "energy": None}],
+        benchmark_rows()
+    )
+    assert result["metrics"] == {"emissions": None, "energy": None}
+
+
+def test_reporting_org_is_ranked_against_the_grid():
+    result = run(
+        benchmark_plan(1, date(2026, 9, 1)),
+        [{"industry": "Retail", "emissions": 42.0, "energy": 7.5}],
+        benchmark_rows()
+    )
+    assert result["metrics"]["emissions"]["percentile"] == 42.0
+    assert result["metrics"]["energy"]["percentile"] == 7.5
+
+
+def test_small_industries_are_not_served():
+    result = run(
+        benchmark_plan(1, date(2026, 9, 1)),
+        [{"industry": "Retail", "emissions": 42.0, "energy": 7.5}],
+        benchmark_rows(org_count=2)
+    )
+    assert result["metrics"] == {"emissions": None, "energy": None}
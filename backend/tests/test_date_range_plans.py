@@ -0,0 +1,100 @@
+# Regression test: every dashboard date filter must be answered by an index range scan.
+# Runs against the database configured in .env (DB_HOST, DB_USER, DB_PASSWORD, DB_NAME)
+# and is skipped when none is configured or reachable; use one with realistic data volume,
+# since the optimizer may prefer a full scan on tiny tables. It only reads: a database
+# without the rollup tables or RECOMMENDED_INDEXES is skipped, not migrated.
+import os
+from datetime import date
+
+import pytest
+from dotenv import load_dotenv
+
+from date_ranges import (
+    RECOMMENDED_INDEXES, day_range, month_range, month_to_date, previous_month_to_date, range_condition,
+    trailing_days, trailing_months, week_range
+)
+
+mysql_connector = pytest.importorskip("mysql.connector")
+
+load_dotenv()
+
+DB_VARS = ["DB_HOST", "DB_USER", "DB_PASSWORD", "DB_NAME"]
+
+pytestmark = pytest.mark.skipif(
+    not all(os.getenv(var) for var in DB_VARS), reason="no database configured (DB_HOST, DB_USER, DB_PASSWORD, DB_NAME)"
+)
+
+today = date.today()
+
+CASES = [
+    ("DailyEmissions", "record_date", "today", day_range(today)),
+    ("DailyEmissions", "record_date", "this week", week_range(today)),
+    ("DailyEmissions", "record_date", "this month", month_range(today)),
+    ("DailyEmissions", "record_date", "month to date", month_to_date(today)),
+    ("DailyEmissions", "record_date", "last month to date", previous_month_to_date(today)),
+    ("DailyEmissions", "record_date", "last 30 days", trailing_days(30, today)),
+    ("DailyEmissions", "record_date", "last 6 months", trailing_months(6, today)),
+    ("DailyEmissionRollup", "record_date", "rollup: this week", week_range(today)),
+    ("DailyEmissionRollup", "record_date", "rollup: month to date", month_to_date(today)),
+    ("MonthlyEmissionRollup", "month_start", "rollup: this month", month_range(today)),
+]
+
+
+def missing_schema(connection) -> list:
+    """Tables and indexes the cases need that the database does not have"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT table_name, index_name FROM information_schema.statistics WHERE table_schema = DATABASE()
+    """)
+    indexes = {(table.lower(), index) for table, index in cursor.fetchall()}
+    cursor.close()
+    tables = {table.lower() for table, _ in indexes}
+    missing = [table for table in sorted({case[0] for case in CASES}) if table.lower() not in tables]
+    missing += [name for table, name, _ in RECOMMENDED_INDEXES if (table.lower(), name) not in indexes]
+    return missing
+
+
+@pytest.fixture(scope="module")
+def db():
+    try:
+        connection = mysql_connector.connect(
+            host=os.getenv("DB_HOST"),
+            port=int(os.getenv("DB_PORT", 3306)),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            database=os.getenv("DB_NAME"),
+        )
+    except mysql_connector.Error as e:
+        pytest.skip(f"database unavailable: {e}")
+    missing = missing_schema(connection)
+    if missing:
+        connection.close()
+        pytest.skip(f"database lacks {', '.join(missing)} (see date_ranges.py and rollups.py)")
+    yield connection
+    connection.close()
+
+
+@pytest.fixture(scope="module")
+def org_id(db):
+    cursor = db.cursor()
+    cursor.execute("SELECT org_id FROM DailyEmissions LIMIT 1")
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        pytest.skip("DailyEmissions is empty")
+    return row[0]
+
+
+@pytest.mark.parametrize("table, column, label, bounds", CASES, ids=[case[2] for case in CASES])
+def test_date_filter_uses_index_range_scan(db, org_id, table, column, label, bounds):
+    condition, params = range_condition(column, bounds)
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        f"EXPLAIN SELECT category_id, COUNT(*) FROM {table} WHERE org_id = %s AND {condition} GROUP BY category_id",
+        [org_id] + params
+    )
+    plan = cursor.fetchall()[0]
+    cursor.close()
+    assert plan['type'] == 'range' and plan['key'] is not None, (
+        f"{label} on {table}: type={plan['type']} key={plan['key']} rows={plan['rows']}"
+    )
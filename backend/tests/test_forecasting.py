@@ -0,0 +1,116 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from forecasting import (
+    Forecast, HoltWinters, LinearTrend, SeasonalNaive, backtest, fill_daily, forecast_series, get_model, mape
+)
+
+WEEK = np.array([10.0, 12.0, 11.0, 13.0, 12.0, 5.0, 2.0])
+
+
+def weeks(count, trend=0.0):
+    return np.tile(WEEK, count) + trend * np.arange(7 * count)
+
+
+def test_seasonal_naive_repeats_the_last_week():
+    y = np.concatenate([weeks(3), [20.0, 21.0]])
+    forecast = SeasonalNaive().fit(y).forecast(9)
+    assert forecast.mean.tolist() == y[-7:].tolist() + y[-7:-5].tolist()
+
+
+def test_seasonal_naive_interval_widens_each_week():
+    y = weeks(4) + np.tile([0.0, 1.0], 14)
+    model = SeasonalNaive().fit(y)
+    forecast = model.forecast(14)
+    assert model.sigma > 0
+    assert forecast.std[:7] == pytest.approx([model.sigma] * 7)
+    assert forecast.std[7:] == pytest.approx([model.sigma * np.sqrt(2)] * 7)
+
+
+def test_linear_trend_recovers_line_and_weekday_offsets():
+    y = weeks(8, trend=0.5)
+    forecast = LinearTrend().fit(y).forecast(14)
+    expected = np.tile(WEEK, 2) + 0.5 * np.arange(56, 70)
+    assert forecast.mean == pytest.approx(expected)
+    assert forecast.std == pytest.approx(np.zeros(14), abs=1e-6)
+
+
+def test_holt_winters_tracks_a_pure_weekly_pattern():
+    forecast = HoltWinters().fit(weeks(12)).forecast(14)
+    assert forecast.mean == pytest.approx(np.tile(WEEK, 2), abs=0.5)
+
+
+def test_holt_winters_forecast_continues_the_weekday_phase():
+    # the series ends mid-week, so the forecast starts on its next weekday
+    y = weeks(12)[:-3]
+    forecast = HoltWinters().fit(y).forecast(3)
+    assert forecast.mean == pytest.approx(WEEK[4:], abs=0.5)
+
+
+def test_holt_winters_falls_back_on_short_series():
+    y = weeks(1)
+    model = HoltWinters().fit(y)
+    assert model.forecast(7).mean.tolist() == SeasonalNaive().fit(y).forecast(7).mean.tolist()
+
+
+def test_forecasts_are_clipped_at_zero():
+    forecast = Forecast(np.array([-3.0, 2.0]), np.array([1.0, 5.0]))
+    assert forecast.mean.tolist() == [0.0, 2.0]
+    assert forecast.lower.tolist() == [0.0, 0.0]
+    assert forecast.upper[0] == 0.0
+
+
+def test_total_adds_means_and_errors_in_quadrature():
+    forecast = Forecast(np.array([10.0, 10.0, 10.0, 10.0]), np.array([3.0, 4.0, 0.0, 0.0]), level=0.95)
+    mean, lower, upper = forecast.total(0, 2)
+    assert mean == 20.0
+    assert upper - mean == pytest.approx(5.0 * 1.96)
+    assert lower == pytest.approx(20.0 - 5.0 * 1.96)
+
+
+def test_forecast_series_skips_leading_zero_days():
+    y = np.concatenate([np.zeros(30), weeks(6)])
+    forecast, fitted = forecast_series(y, 7, "seasonal_naive")
+    assert np.isnan(fitted[:37]).all()
+    assert fitted[37:].tolist() == y[30:-7].tolist()
+    assert forecast.mean.tolist() == WEEK.tolist()
+
+
+def test_forecast_series_without_data_is_zero():
+    forecast, fitted = forecast_series(np.zeros(60), 10)
+    assert forecast.mean.tolist() == [0.0] * 10
+    assert np.isnan(fitted).all()
+
+
+def test_unknown_model_is_rejected():
+    with pytest.raises(ValueError):
+        get_model("prophet")
+
+
+def test_model_defaults_to_environment(monkeypatch):
+    monkeypatch.setenv("FORECAST_MODEL", "linear_trend")
+    assert isinstance(get_model(), LinearTrend)
+
+
+def test_fill_daily_zero_fills_and_drops_out_of_range_days():
+    rows = [(date(2026, 9, 1), 5), (date(2026, 9, 3), None), (date(2026, 9, 4), 7.5), (date(2026, 8, 31), 9)]
+    assert fill_daily(rows, date(2026, 9, 1), date(2026, 9, 5)).tolist() == [5.0, 0.0, 0.0, 7.5]
+
+
+def test_mape_ignores_zero_actuals():
+    assert mape(np.array([100.0, 0.0, 50.0]), np.array([110.0, 3.0, 40.0])) == pytest.approx(15.0)
+    assert np.isnan(mape(np.zeros(3), np.ones(3)))
+
+
+def test_backtest_scores_each_fold():
+    result = backtest(weeks(20), "seasonal_naive", horizon=14, folds=3)
+    assert result["folds"] == 3
+    assert result["mape"] == pytest.approx(0.0)
+
+
+def test_backtest_skips_folds_without_two_seasons_of_history():
+    # cutoffs at 7, 14 and 21 days: the first has only one week to fit on
+    result = backtest(weeks(4), "seasonal_naive", horizon=7, folds=3)
+    assert result["folds"] == 2
@@ -0,0 +1,155 @@
+import math
+from datetime import date
+
+import pytest
+
+from insight_rules import RULES, evaluate_rules, insight_features_plan, rule_period
+
+# Windows end the day before TODAY: the last 30 days are September 2026,
+# which has 8 weekend days and 22 weekdays
+TODAY = date(2026, 10, 1)
+
+
+def run(plan, *results):
+    """Drive a query plan with canned result sets, one per statement"""
+    rows = plan.send(None)
+    try:
+        for result in results:
+            rows = plan.send(result)
+    except StopIteration as stop:
+        return stop.value
+    raise AssertionError(f"plan asked for more results: {rows[0]}")
+
+
+def bucket(org_id, period, co2, energy=0.0, weekend=0, records=1, location_id=1, location_name="HQ",
+           category_id=1, category_name="Transport"):
+    return {"org_id": org_id, "location_id": location_id, "location_name": location_name,
+            "category_name": category_name, "category_id": category_id, "period": period,
+            "weekend": weekend, "co2": co2, "energy": energy, "records": records}
+
+
+def features_of(*rows, org_id=None):
+    return run(insight_features_plan(org_id, TODAY), list(rows))
+
+
+def rules_fired(insights, org_id):
+    return [insight["rule"] for insight in insights.get(org_id, [])]
+
+
+def test_month_over_month_change():
+    features = features_of(bucket(1, 2, 150.0), bucket(1, 3, 100.0))
+    assert features.loc[1, "total_30d"] == 150.0
+    assert features.loc[1, "mom_change"] == pytest.approx(50.0)
+    assert "emissions_increasing" in rules_fired(evaluate_rules(features), 1)
+
+    features = features_of(bucket(1, 2, 50.0), bucket(1, 3, 100.0))
+    insights = evaluate_rules(features)
+    assert "emissions_decreasing" in rules_fired(insights, 1)
+    assert "decreased by 50.0%" in insights[1][rules_fired(insights, 1).index("emissions_decreasing")]["message"]
+
+
+def test_week_over_week_change():
+    features = features_of(bucket(1, 0, 130.0), bucket(1, 1, 100.0))
+    assert features.loc[1, "wow_change"] == pytest.approx(30.0)
+    assert "weekly_jump" in rules_fired(evaluate_rules(features), 1)
+
+
+def test_changes_without_a_previous_window_are_nan_and_fire_nothing():
+    features = features_of(bucket(1, 0, 100.0))
+    assert math.isnan(features.loc[1, "mom_change"])
+    assert math.isnan(features.loc[1, "wow_change"])
+    fired = rules_fired(evaluate_rules(features), 1)
+    assert not {"emissions_increasing", "emissions_decreasing", "weekly_jump"} & set(fired)
+
+
+def test_dominant_category_share():
+    features = features_of(
+        bucket(1, 2, 60.0, category_id=1, category_name="Transport"),
+        bucket(1, 2, 40.0, category_id=2, category_name="Waste Management"),
+        bucket(1, 3, 1000.0, category_id=2, category_name="Waste Management"),
+    )
+    assert features.loc[1, "top_category"] == "Transport"
+    assert features.loc[1, "top_category_share"] == pytest.approx(60.0)
+    insights = evaluate_rules(features)
+    assert insights[1][0]["title"] == "Transport Emissions Dominant"
+
+
+def test_weekend_ratio_compares_per_day_averages():
+    # 80 over 8 weekend days and 220 over 22 weekdays: the same 10 per day
+    features = features_of(bucket(1, 2, 80.0, weekend=1), bucket(1, 2, 220.0, weekend=0))
+    assert features.loc[1, "weekend_ratio"] == pytest.approx(100.0)
+    assert "weekend_baseload" in rules_fired(evaluate_rules(features), 1)
+
+    features = features_of(bucket(1, 2, 8.0, weekend=1), bucket(1, 2, 220.0, weekend=0))
+    assert features.loc[1, "weekend_ratio"] == pytest.approx(10.0)
+    assert "weekend_baseload" not in rules_fired(evaluate_rules(features), 1)
+
+
+def test_intensity_outlier_needs_two_locations():
+    features = features_of(
+        bucket(1, 2, 100.0, energy=1000.0, location_id=1, location_name="Office"),
+        bucket(1, 2, 100.0, energy=100.0, location_id=2, location_name="Plant"),
+    )
+    assert features.loc[1, "intensity"] == pytest.approx(200 / 1100)
+    assert features.loc[1, "worst_location"] == "Plant"
+    assert features.loc[1, "intensity_ratio"] == pytest.approx(5.5)
+    insights = evaluate_rules(features)
+    assert "Carbon Intensity Outlier: Plant" in [insight["title"] for insight in insights[1]]
+
+    features = features_of(bucket(1, 2, 100.0, energy=100.0, location_id=2, location_name="Plant"))
+    assert features.loc[1, "location_count"] == 1
+    assert "intensity_outlier" not in rules_fired(evaluate_rules(features), 1)
+
+
+def test_coverage_is_the_share_of_expected_readings():
+    # two (location, category) pairs; 21 of the 28 readings expected in 14 days are present
+    features = features_of(
+        bucket(1, 0, 10.0, records=7, category_id=1),
+        bucket(1, 1, 10.0, records=7, category_id=1),
+        bucket(1, 0, 10.0, records=7, category_id=2, category_name="Waste Management"),
+    )
+    assert features.loc[1, "coverage_14d"] == pytest.approx(21 / 28)
+    assert features.loc[1, "coverage_30d"] == pytest.approx(21 / 60)
+    assert features.loc[1, "coverage_60d"] == pytest.approx(21 / 120)
+
+
+def test_confidence_comes_from_the_rules_coverage_window():
+    features = features_of(bucket(1, 0, 130.0, records=7), bucket(1, 1, 100.0, records=7))
+    weekly = next(insight for insight in evaluate_rules(features)[1] if insight["rule"] == "weekly_jump")
+    assert weekly["confidence"] == 100.0
+    assert weekly["timestamp"] == "Last 14 days"
+
+
+def test_every_org_is_scored_at_once_with_ids_per_org():
+    features = features_of(
+        bucket(1, 2, 150.0), bucket(1, 3, 100.0),
+        bucket(2, 2, 50.0), bucket(2, 3, 100.0),
+        bucket(3, 2, 100.0), bucket(3, 3, 100.0),
+    )
+    insights = evaluate_rules(features)
+    assert rules_fired(insights, 1) == ["dominant_category", "emissions_increasing"]
+    assert rules_fired(insights, 2) == ["dominant_category", "emissions_decreasing"]
+    assert rules_fired(insights, 3) == ["dominant_category"]
+    assert [insight["id"] for insight in insights[1]] == [1, 2]
+    assert [insight["id"] for insight in insights[3]] == [1]
+
+
+def test_no_rows_no_insights():
+    features = features_of()
+    assert features.empty
+    assert evaluate_rules(features) == {}
+
+
+def test_plan_windows_end_yesterday_and_filter_the_org():
+    plan = insight_features_plan(7, TODAY)
+    sql, params = plan.send(None)
+    assert "AND de.org_id = %s" in sql
+    assert params == [date(2026, 9, 24), date(2026, 9, 17), date(2026, 9, 1), date(2026, 8, 2), TODAY, 7]
+
+
+def test_rule_periods():
+    weekly = next(rule for rule in RULES if rule["period"] == "week")
+    monthly = next(rule for rule in RULES if rule["period"] == "month")
+    assert rule_period(weekly, date(2026, 9, 30)) == "2026-W40"
+    assert rule_period(weekly, date(2027, 1, 1)) == "2026-W53"
+    assert rule_period(monthly, date(2026, 9, 30)) == "2026-09"
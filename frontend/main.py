@@ -83,11 +83,18 @@ def log_action(user_id: Optional[int], action: str, details: str):
         connection = get_connection()
         cursor = connection.cursor()
         
+        # org_id is stamped from the user's organization (the backend pages audit logs by it)
         insert_query = """
-        INSERT INTO AuditLogs (user_id, action, details, timestamp)
-        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+        INSERT INTO AuditLogs (user_id, org_id, action, details, timestamp)
+        SELECT %s, (SELECT org_id FROM Users WHERE user_id = %s), %s, %s, CURRENT_TIMESTAMP
         """
-        cursor.execute(insert_query, (user_id, action, details))
+        cursor.execute(insert_query, (user_id, user_id, action, details))
+        # Keep the backend's per-(org, action, day) counters in step
+        cursor.execute("""
+        INSERT INTO AuditActionCounts (org_id, is_system, action, day, count, events)
+        SELECT COALESCE((SELECT org_id FROM Users WHERE user_id = %s), 0), %s IS NULL, %s, CURDATE(), 1, 1
+        ON DUPLICATE KEY UPDATE count = count + 1, events = events + 1
+        """, (user_id, user_id, action))
         connection.commit()
         
         cursor.close()
@@ -103,6 +110,8 @@ def check_user_status(user_id: int):
     Returns user data if approved, raises HTTPException if not
     """
     try:
+        # Not cached: this process cannot see the backend's status/role changes
+        # (see backend/identity.py), and a rejected or deleted user must be refused at once
         connection = get_connection()
         cursor = connection.cursor(dictionary=True)
         